@@ -0,0 +1,163 @@
+"""
+仓库获取层：按需克隆或增量更新仓库，支持多种克隆模式，并用 asyncio 并发获取多个仓库
+用法: python acquire.py https://github.com/owner/a.git https://github.com/owner/b.git --workdir repos --mode partial
+
+克隆模式:
+- full:    普通克隆，带工作区(与原先的 git.Repo.clone_from 相同)
+- bare:    裸仓库，只保存分支与标签，不检出工作区
+- mirror:  镜像克隆，同步远端的全部引用，分析只读取历史时推荐使用
+- partial: 镜像 + --filter=blob:none，只下载提交与目录树，适合不需要 diff 的元数据分析；
+           需要 numstat 的图表会让 git 按需补取文件内容
+depth 不为空时为浅克隆，只获取每个分支最近 depth 个提交
+目标目录已存在时不会重新克隆，而是从其 origin 执行一次增量 fetch(带 --prune，远端删除的分支同步删除)；
+没有 origin 或 fetch 失败(例如离线)时给出警告并继续使用本地已有的数据
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+
+CLONE_MODES = ("full", "bare", "mirror", "partial")
+
+
+class AcquireResult:
+    """一个仓库的获取结果，action 为 clone / fetch / local(未更新，使用本地数据)，失败时 error 为异常对象"""
+
+    def __init__(self, url, path, mode, action=None, seconds=0.0, error=None):
+        self.url = url
+        self.path = path
+        self.mode = mode
+        self.action = action
+        self.seconds = seconds
+        self.error = error
+
+    def __repr__(self):
+        status = f"error={self.error!r}" if self.error else f"{self.action} {self.seconds:.2f}s"
+        return f"AcquireResult({self.path}, {self.mode}, {status})"
+
+
+def clone_args(url, path, mode="mirror", depth=None):
+    """构造 git clone 的参数列表"""
+    if mode not in CLONE_MODES:
+        raise ValueError(f"未知的克隆模式: {mode}")
+    args = ['clone', '--quiet']
+    if mode == 'bare':
+        args.append('--bare')
+    elif mode in ('mirror', 'partial'):
+        args.append('--mirror')
+    if mode == 'partial':
+        args.append('--filter=blob:none')
+    if depth is not None:
+        # 浅克隆默认只取单个分支，分析需要全部分支
+        args += [f'--depth={depth}', '--no-single-branch']
+    return args + [url, path]
+
+
+def fetch_args(depth=None):
+    args = ['fetch', '--quiet', '--prune', '--tags', 'origin']
+    if depth is not None:
+        args.insert(1, f'--depth={depth}')
+    return args
+
+
+async def _git(*args, cwd=None):
+    """异步执行一条 git 命令，失败时抛出 CalledProcessError(stderr 中带有 git 的错误信息)"""
+    cmd = ['git', *args] if cwd is None else ['git', '-C', cwd, *args]
+    proc = await asyncio.create_subprocess_exec(*cmd, stdout=asyncio.subprocess.DEVNULL,
+                                                stderr=asyncio.subprocess.PIPE)
+    _, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=stderr.decode('utf-8', 'replace'))
+
+
+def origin_url(path):
+    """已有仓库的 origin 地址，没有配置 origin 时返回 None"""
+    result = subprocess.run(['git', '-C', path, 'config', '--get', 'remote.origin.url'],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.stdout.decode('utf-8', 'replace').strip() or None
+
+
+async def acquire(url, path, mode="mirror", depth=None, fetch=True):
+    """
+    获取一个仓库：目录不存在时按 mode 克隆，已存在时从 origin 增量 fetch；url 为空时直接使用本地仓库
+    已存在的仓库没有 origin 或 fetch 失败时只打印警告，继续使用本地数据(返回 local)，离线时也能分析
+    :param url: 远端地址，本地测试可以用 file:// 地址
+    :param path: 本地目录
+    :param mode: full / bare / mirror / partial
+    :param depth: 浅克隆深度，None 表示完整历史
+    :param fetch: 目录已存在时是否 fetch
+    :return: 执行的动作 clone / fetch / local
+    """
+    if not url:
+        return 'local'
+    if os.path.exists(path):
+        if not fetch:
+            return 'local'
+        if origin_url(path) is None:
+            print(f"警告: {path} 没有配置 origin，跳过 fetch，使用本地数据", file=sys.stderr)
+            return 'local'
+        try:
+            await _git(*fetch_args(depth), cwd=path)
+        except subprocess.CalledProcessError as e:
+            print(f"警告: {path} fetch 失败，使用本地数据: {(e.stderr or '').strip() or e}", file=sys.stderr)
+            return 'local'
+        return 'fetch'
+    await _git(*clone_args(url, path, mode, depth))
+    if mode == 'bare':
+        # --bare 克隆不会配置 fetch refspec，补上后增量 fetch 才会更新本地分支
+        await _git('config', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*', cwd=path)
+    return 'clone'
+
+
+async def acquire_all(requests, concurrency=8, on_done=None):
+    """
+    并发获取多个仓库，同时进行的 clone/fetch 不超过 concurrency 个
+    :param requests: [(url, path, mode, depth), ...]
+    :param on_done: 每个仓库完成(无论成功与否)后立即以 AcquireResult 回调，便于下游提前开始处理
+    :return: 与 requests 顺序一致的 AcquireResult 列表
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(url, path, mode, depth):
+        result = AcquireResult(url, path, mode)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result.action = await acquire(url, path, mode, depth)
+            except Exception as e:
+                result.error = e
+            result.seconds = time.perf_counter() - start
+        if on_done is not None:
+            on_done(result)
+        return result
+
+    return await asyncio.gather(*(run_one(*request) for request in requests))
+
+
+def acquire_sync(url, path, mode="mirror", depth=None, fetch=True):
+    """acquire 的同步版本，供单仓库流程使用"""
+    return asyncio.run(acquire(url, path, mode, depth, fetch))
+
+
+def default_path(url, workdir, mode):
+    """按地址推导本地目录，裸仓库类模式以 .git 结尾"""
+    name = os.path.basename(url.rstrip('/'))
+    name = name[:-4] if name.endswith('.git') else name
+    return os.path.join(workdir, name if mode == 'full' else name + '.git')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="并发克隆或更新多个仓库")
+    parser.add_argument("urls", nargs="+", help="仓库地址")
+    parser.add_argument("--workdir", default="repos", help="仓库存放目录")
+    parser.add_argument("--mode", choices=CLONE_MODES, default="mirror", help="克隆模式")
+    parser.add_argument("--depth", type=int, default=None, help="浅克隆深度")
+    parser.add_argument("--jobs", type=int, default=8, help="同时进行的 clone/fetch 数")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    requests = [(url, default_path(url, args.workdir, args.mode), args.mode, args.depth) for url in args.urls]
+    results = asyncio.run(acquire_all(requests, args.jobs, on_done=lambda r: print(r)))
+    sys.exit(1 if any(r.error for r in results) else 0)
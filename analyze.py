@@ -1,422 +1,1054 @@
 import os
-import matplotlib.pyplot as plt
+import json
+import hashlib
+import functools
+from importlib import metadata
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from collections import Counter
+import numpy as np
+from numstat import load_numstat
+from ref_index import build_ref_index, ref_short_name
+from dag import CommitDag, DagCollector, branch_refs, default_base, rows_for_shas
+import profiling
+from streaming import HistoryStream, CountBy, Histogram, RunningSum, SlidingWindow, DecimatingSeries, RecencyCounter
+from selection import HistorySelection
+from rollup import TimeRollup, RollupCollector
+from path_trie import PathTrie, ROOT_LABEL, file_extension
+from ownership import ownership_history
+import classifier
+from classifier import ClassifyCollector
+from sketches import SpaceSaving, HyperLogLog, TDigest
+from chart_views import chart_view, json_default
 
-# 解决中文显示问题，兼容所有系统，标准配置
-plt.rcParams['font.sans-serif'] = ['Source Han Sans CN', 'Arial Unicode MS', 'SimHei', 'sans-serif']
-plt.rcParams['axes.unicode_minus'] = False
+# 中文字体候选，按顺序取本机已安装的第一个
+CJK_FONTS = ['Source Han Sans CN', 'Arial Unicode MS', 'SimHei']
+
+@functools.lru_cache(maxsize=None)
+def _matplotlib():
+    """
+    首次渲染时才导入 matplotlib 并设置中文字体：只做计算、输出 json 或全部图表命中渲染缓存时不付出 matplotlib 的启动开销
+    字体在每个进程中只解析一次，直接查 matplotlib 已缓存的字体列表，不再让每段文字逐个尝试不存在的字体族
+    """
+    import matplotlib
+    from matplotlib import font_manager
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    cjk = [family for family in CJK_FONTS if family in installed]
+    matplotlib.rcParams['font.sans-serif'] = cjk + [f for f in matplotlib.rcParams['font.sans-serif'] if f not in cjk]
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    return matplotlib
+
+@functools.lru_cache(maxsize=None)
+def _matplotlib_version():
+    # 渲染缓存的键需要 matplotlib 版本，读取包元数据即可，不必导入 matplotlib
+    return metadata.version('matplotlib')
 
 def get_save_path(filename, output_dir, prefix):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     return os.path.join(output_dir, f"{prefix}{filename}")
 
-def draw_author_stats(commits, output_dir="stats", prefix=""):
-    authors = [c['author'] for c in commits]
-    author_counts = Counter(authors).most_common(10)
-    plt.figure(figsize=(10, 6))
+def _most_common_authors(commits, n):
+    # 等价于 Counter(authors).most_common(n)：按提交数降序，并列时按首次出现的顺序
+    counts = commits.author_counts()
+    order = np.argsort(-counts, kind='stable')[:n]
+    return [(commits.authors[i], int(counts[i])) for i in order]
+
+# ---------------------------------------------------------------------------
+# 第一阶段：计算每张图表所需的数据(纯数据，可被 pickle 传给渲染进程)
+# ---------------------------------------------------------------------------
+
+def compute_author_stats(commits):
+    author_counts = _most_common_authors(commits, 10)
     names, counts = zip(*author_counts) if author_counts else ([], [])
-    plt.barh(names, counts, color='skyblue')
-    plt.title('前 10 名作者提交数统计')
-    plt.xlabel('提交次数')
-    plt.tight_layout()
-    path = get_save_path('stats_authors.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+    return {'names': list(names), 'counts': list(counts)}
 
-def draw_monthly_activity(commits, output_dir="stats", prefix=""):
-    months = [c['date'][:7] for c in commits]
-    month_counts = Counter(months)
-    sorted_months = sorted(month_counts.items())
-    plt.figure(figsize=(12, 6))
-    if sorted_months:
-        m_labels, m_values = zip(*sorted_months)
-        plt.plot(m_labels, m_values, marker='o', linestyle='-', color='green')
-        plt.xticks(rotation=45)
-    plt.title('每月提交频率趋势')
-    plt.ylabel('提交次数')
-    plt.tight_layout()
-    path = get_save_path('stats_monthly.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+def _rollup_items(rollup, bucket, field='commits'):
+    # 等价于 sorted(Counter(标签).items())，只保留计数非零的桶
+    keys, values = rollup.series(bucket, field)
+    present = values > 0
+    return list(zip(rollup.labels(bucket, keys[present]), values[present].tolist()))
 
-def draw_keyword_distribution(commits, output_dir="stats", prefix=""):
-    keywords = {'新增 (add)': 0, '更新 (update)': 0, '修复 (fix)': 0, '其他': 0}
-    for c in commits:
-        msg = c['message'].lower()
-        if 'add' in msg:
-            keywords['新增 (add)'] += 1
-        elif 'update' in msg:
-            keywords['更新 (update)'] += 1
-        elif 'fix' in msg:
-            keywords['修复 (fix)'] += 1
-        else:
-            keywords['其他'] += 1
-    plt.figure(figsize=(8, 8))
-    plt.pie(keywords.values(), labels=keywords.keys(), autopct='%1.1f%%', 
-            colors=['#ff9999','#66b3ff','#99ff99','#ffcc99'])
-    plt.title('提交信息关键词分布')
-    path = get_save_path('stats_keywords.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+def compute_monthly_activity(rollup):
+    return {'items': _rollup_items(rollup, 'month')}
 
-def draw_day_of_week_activity(commits, output_dir="stats", prefix=""):
-    days = [datetime.strptime(c['date'], '%Y-%m-%d %H:%M').weekday() for c in commits]
-    day_counts = Counter(days)
-    day_labels = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
-    counts_by_day = [day_counts.get(i, 0) for i in range(7)]
-    plt.figure(figsize=(10, 5))
-    plt.bar(day_labels, counts_by_day, color='teal')
-    plt.title('每周提交演变分布')
-    plt.ylabel('提交次数')
-    path = get_save_path('stats_dow.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+def _message_categories(commits, ruleset):
+    # 规则集一次批量分类，结果按 sha 缓存在规则集上
+    return {'labels': list(ruleset.labels), 'values': ruleset.counts(ruleset.classify_commits(commits))}
 
-def draw_hourly_activity(commits, output_dir="stats", prefix=""):
-    hours = [datetime.strptime(c['date'], '%Y-%m-%d %H:%M').hour for c in commits]
-    hour_counts = Counter(hours)
-    hour_labels = [f"{i:02d}h" for i in range(24)]
-    counts_by_hour = [hour_counts.get(i, 0) for i in range(24)]
-    plt.figure(figsize=(12, 5))
-    plt.plot(hour_labels, counts_by_hour, marker='s', color='orange')
-    plt.fill_between(hour_labels, counts_by_hour, alpha=0.2, color='orange')
-    plt.title('全天时段提交活跃度')
-    plt.xlabel('小时')
-    plt.ylabel('提交次数')
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    path = get_save_path('stats_hourly.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+def compute_keyword_distribution(commits, ruleset=None):
+    """
+    :param ruleset: classifier.Ruleset，默认为 classifier.RULESETS['keywords'](可由 --rules 替换)
+    """
+    if ruleset is None:
+        ruleset = classifier.RULESETS['keywords']
+    return _message_categories(commits, ruleset)
 
-def analyze_message_metrics(commits, output_dir="stats", prefix=""):
-    lengths = [len(c['message']) for c in commits]
-    plt.figure(figsize=(10, 6))
-    plt.hist(lengths, bins=20, color='plum', edgecolor='black')
-    plt.title('提交信息长度分布情况')
-    plt.xlabel('长度 (字符数)')
-    plt.ylabel('频率')
-    path = get_save_path('stats_msg_lengths.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+def compute_day_of_week_activity(rollup):
+    return {'values': rollup.series('day_of_week')[1].tolist()}
 
-def analyze_cumulative_growth(commits, output_dir="stats", prefix=""):
-    sorted_commits = sorted(commits, key=lambda x: x['date'])
-    dates = [datetime.strptime(c['date'], '%Y-%m-%d %H:%M') for c in sorted_commits]
-    cumulative_counts = list(range(1, len(dates) + 1))
-    plt.figure(figsize=(10, 6))
-    plt.plot(dates, cumulative_counts, color='crimson', linewidth=2)
-    plt.fill_between(dates, cumulative_counts, color='crimson', alpha=0.1)
-    plt.title('项目提交累计增长曲线')
-    plt.xlabel('日期')
-    plt.ylabel('总提交数')
-    plt.grid(True, which='both', linestyle='--', alpha=0.5)
-    path = get_save_path('stats_growth.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
-
-def analyze_hotspots(repo, limit=100, output_dir="stats", prefix=""):
-    dir_counter = Counter()
-    for commit in repo.iter_commits('--all', max_count=limit):
-        files = commit.stats.files.keys()
-        for f in files:
-            directory = f.split('/')[0] if '/' in f else '根目录 (root)'
-            dir_counter[directory] += 1
-    top_dirs = dir_counter.most_common(10)
+def compute_hourly_activity(rollup):
+    return {'values': rollup.series('hour_of_day')[1].tolist()}
+
+def compute_message_metrics(commits):
+    return {'lengths': [len(m) for m in commits.messages]}
+
+def compute_cumulative_growth(rollup):
+    # 每个小时桶一个点，取该小时内最后一个提交之后的累计值
+    hours, counts = rollup.series('hour')
+    return {'dates': (hours * 60).astype('datetime64[m]'), 'counts': np.cumsum(counts)}
+
+def _top_directory(path):
+    return path.split('/')[0] if '/' in path else ROOT_LABEL
+
+def compute_hotspots(trie, depth=1):
+    """
+    :param trie: 由 numstat.head(limit) 构建的 PathTrie
+    :param depth: 目录深度，1 为顶层目录
+    """
+    top_dirs = trie.hotspots(depth, 10)
     if not top_dirs:
-        return
-    plt.figure(figsize=(10, 6))
-    dirs, counts = zip(*top_dirs)
-    plt.bar(dirs, counts, color='gold')
-    plt.title('最常被修改的前 10 个目录')
-    plt.xticks(rotation=45)
-    plt.ylabel('修改频率')
-    plt.tight_layout()
-    path = get_save_path('stats_hotspots.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+        return None
+    return {'items': top_dirs}
 
-def draw_merge_activities(commits, output_dir="stats", prefix=""):
-    merge_commits = [c for c in commits if len(c['parents']) > 1]
-    months = [c['date'][:7] for c in merge_commits]
-    merge_month_counts = Counter(months)
-    sorted_months = sorted(merge_month_counts.items())
-    plt.figure(figsize=(12, 6))
-    if sorted_months:
-        m_labels, m_values = zip(*sorted_months)
-        plt.bar(m_labels, m_values, color='mediumpurple')
-        plt.xticks(rotation=45)
-    plt.title('每月合并 (PR 完成) 活动统计')
-    plt.ylabel('合并次数')
-    plt.tight_layout()
-    path = get_save_path('stats_merges.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+def compute_merge_activities(rollup):
+    return {'items': _rollup_items(rollup, 'month', 'merges')}
 
-def draw_merge_ratio(commits, output_dir="stats", prefix=""):
-    merge_commits = [c for c in commits if len(c['parents']) > 1]
+def compute_merge_ratio(commits):
     total = len(commits)
-    merges = len(merge_commits)
-    plt.figure(figsize=(8, 8))
-    plt.pie([merges, total-merges], labels=['合并提交 (Merge)', '普通提交 (Normal)'], 
-            autopct='%1.1f%%', colors=['#6c5ce7', '#a29bfe'])
-    plt.title('合并提交与普通提交占比')
-    path = get_save_path('stats_merge_ratio.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
-
-def draw_file_type_distribution(repo, limit=100, output_dir="stats", prefix=""):
-    ext_counter = Counter()
-    for commit in repo.iter_commits('--all', max_count=limit):
-        for f in commit.stats.files.keys():
-            ext = os.path.splitext(f)[1].lower()
-            if not ext: ext = '无后缀'
-            ext_counter[ext] += 1
-    top_exts = ext_counter.most_common(10)
-    if not top_exts: return
-    plt.figure(figsize=(10, 6))
-    exts, counts = zip(*top_exts)
-    plt.bar(exts, counts, color='lightcoral')
-    plt.title('最常修改的文件类型 (前 10)')
-    plt.ylabel('修改次数')
-    plt.tight_layout()
-    path = get_save_path('stats_file_types.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+    merges = int(commits.is_merge().sum())
+    return {'values': [merges, total - merges]}
 
-def draw_weekly_velocity(commits, output_dir="stats", prefix=""):
-    weeks = {}
-    for c in commits:
-        dt = datetime.strptime(c['date'], '%Y-%m-%d %H:%M')
-        year_week = dt.strftime('%Y-W%W')
-        weeks[year_week] = weeks.get(year_week, 0) + 1
-    sorted_weeks = sorted(weeks.items())
-    plt.figure(figsize=(15, 6))
-    if sorted_weeks:
-        w_labels, w_values = zip(*sorted_weeks)
-        plt.plot(w_labels, w_values, color='dodgerblue', marker='.')
-        plt.xticks(rotation=90, fontsize=8)
-    plt.title('每周提交速度趋势')
-    plt.ylabel('提交次数')
-    plt.tight_layout()
-    path = get_save_path('stats_weekly.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
-
-def draw_loc_evolution(repo, limit=200, output_dir="stats", prefix=""):
+def compute_file_type_distribution(trie):
+    top_exts = trie.extensions(10)
+    if not top_exts: return None
+    return {'items': top_exts}
+
+def compute_weekly_velocity(rollup):
+    return {'items': _rollup_items(rollup, 'week')}
+
+def compute_loc_evolution(numstat, limit=200):
     dates = []
     cumulative_loc = 0
     loc_history = []
-    commits = list(repo.iter_commits('--all', max_count=limit))
-    commits.reverse()
-    for commit in commits:
-        stats = commit.stats.total
-        net_change = stats['insertions'] - stats['deletions']
+    table = numstat.head(limit)
+    for i in reversed(range(len(table))):
+        insertions, deletions = table.total(i)
+        net_change = insertions - deletions
         cumulative_loc += net_change
-        dt = datetime.fromtimestamp(commit.authored_date)
+        dt = datetime.fromtimestamp(table.authored_dates[i])
         dates.append(dt)
         loc_history.append(cumulative_loc)
-    plt.figure(figsize=(12, 6))
-    plt.plot(dates, loc_history, color='forestgreen', linewidth=1.5)
-    plt.fill_between(dates, loc_history, color='forestgreen', alpha=0.1)
-    plt.title('代码库净行数演变趋势 (LOC)')
-    plt.xlabel('日期')
-    plt.ylabel('累计行数 (净值)')
-    plt.grid(True, linestyle=':', alpha=0.6)
-    plt.tight_layout()
-    path = get_save_path('stats_loc.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
-
-def draw_release_timeline(repo, output_dir="stats", prefix=""):
-    tags = sorted(repo.tags, key=lambda t: t.commit.authored_date)
+    return {'dates': dates, 'values': loc_history}
+
+def compute_release_timeline(ref_index):
+    tags = ref_index.tags_by_date()
     if not tags:
-        print("未发现 Release 标签，跳过发布统计。")
-        return
-    tag_names = [t.name for t in tags]
-    tag_dates = [datetime.fromtimestamp(t.commit.authored_date) for t in tags]
-    plt.figure(figsize=(12, 6))
-    plt.scatter(tag_dates, [1] * len(tag_dates), color='red', s=100, zorder=3)
-    for i, (date, name) in enumerate(zip(tag_dates, tag_names)):
-        plt.vlines(date, 0, 1, colors='grey', linestyles='--', alpha=0.3)
-        plt.text(date, 1.05 if i % 2 == 0 else 0.9, name, 
-                 rotation=45, ha='right', fontsize=9, color='darkred')
-    plt.title('项目 Release (Tag) 发布时间轴')
-    plt.yticks([])
-    plt.xlabel('发布年份/月份')
-    plt.ylim(0.5, 1.5)
-    plt.grid(axis='x', linestyle=':', alpha=0.5)
-    plt.tight_layout()
-    path = get_save_path('stats_releases.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
-
-
-def draw_code_ins_del_trend(repo, commits, output_dir="stats", prefix=""):
-    """
-    统计并绘制每次提交的代码新增/删除行数趋势图
+        return None
+    return {
+        'names': [name for name, _, _ in tags],
+        'dates': [datetime.fromtimestamp(authored_date) for _, _, authored_date in tags],
+    }
+
+def compute_code_ins_del_trend(numstat, commits):
+    """
+    统计每次提交的代码新增/删除行数趋势
     功能说明: 分析项目迭代过程中代码增减规律，反映功能迭代/重构的节奏
-    :param repo: git仓库对象
-    :param commits: 提交记录列表
-    :param output_dir: 输出目录
-    :param prefix: 文件名前缀
+    :param numstat: 共享的 NumstatTable(拓扑顺序，最新提交在前)
+    :param commits: CommitTable 提交表
     """
     insertions_list = []
     deletions_list = []
     commit_dates = []
     # 遍历提交记录，提取每行提交的增删行数
-    for commit in repo.iter_commits('--all', max_count=len(commits), topo_order=True):
-        stats = commit.stats.total
-        insertions_list.append(stats['insertions'])
-        deletions_list.append(stats['deletions'])
-        commit_dates.append(datetime.fromtimestamp(commit.authored_date))
+    table = numstat.head(len(commits))
+    for i in range(len(table)):
+        insertions, deletions = table.total(i)
+        insertions_list.append(insertions)
+        deletions_list.append(deletions)
+        commit_dates.append(datetime.fromtimestamp(table.authored_dates[i]))
     # 反转数据保证时间正序
-    insertions_list = insertions_list[::-1]
-    deletions_list = deletions_list[::-1]
-    commit_dates = commit_dates[::-1]
-    
-    plt.figure(figsize=(12, 6))
-    plt.plot(commit_dates, insertions_list, marker='.', color='#2E8B57', label='新增代码行数', linewidth=1.5)
-    plt.plot(commit_dates, deletions_list, marker='.', color='#DC143C', label='删除代码行数', linewidth=1.5)
-    plt.fill_between(commit_dates, insertions_list, alpha=0.2, color='#2E8B57')
-    plt.fill_between(commit_dates, deletions_list, alpha=0.2, color='#DC143C')
-    plt.title('项目提交代码新增/删除行数趋势分析')
-    plt.xlabel('提交日期')
-    plt.ylabel('代码行数')
-    plt.legend(loc='upper right')
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    path = get_save_path('stats_ins_del_trend.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+    return {
+        'dates': commit_dates[::-1],
+        'insertions': insertions_list[::-1],
+        'deletions': deletions_list[::-1],
+    }
 
-def draw_cn_keyword_distribution(commits, output_dir="stats", prefix=""):
+def compute_cn_keyword_distribution(commits, ruleset=None):
     """
     统计提交信息的中文高频开发关键词分布(补充英文关键词的不足)
     功能说明: 适配中文开源项目提交习惯，分析开发行为类型占比，完善关键词分析维度
-    :param commits: 提交记录列表
-    :param output_dir: 输出目录
-    :param prefix: 文件名前缀
-    """
-    # 定义中文开发高频关键词，覆盖主流提交场景，无遗漏
-    cn_keywords = {
-        '新增/添加': 0,
-        '修改/更新': 0,
-        '修复/修补/Bug': 0,
-        '优化/重构': 0,
-        '其他提交': 0
-    }
-    # 遍历所有提交信息进行关键词匹配
-    for commit_info in commits:
-        msg = commit_info['message']
-        if any(word in msg for word in ['新增', '添加']):
-            cn_keywords['新增/添加'] += 1
-        elif any(word in msg for word in ['修改', '更新']):
-            cn_keywords['修改/更新'] += 1
-        elif any(word in msg for word in ['修复', '修补', 'bug', 'Bug']):
-            cn_keywords['修复/修补/Bug'] += 1
-        elif any(word in msg for word in ['优化', '重构', '调整']):
-            cn_keywords['优化/重构'] += 1
-        else:
-            cn_keywords['其他提交'] += 1
-    # 绘制饼图，配色美观，标注百分比
-    plt.figure(figsize=(8, 8))
-    plt.pie(cn_keywords.values(), labels=cn_keywords.keys(), autopct='%1.1f%%',
-            colors=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57'], startangle=90)
-    plt.title('提交信息-中文高频开发关键词分布')
-    path = get_save_path('stats_cn_keywords.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
+    :param commits: CommitTable 提交表
+    :param ruleset: classifier.Ruleset，默认为 classifier.RULESETS['cn_keywords']
+    """
+    if ruleset is None:
+        ruleset = classifier.RULESETS['cn_keywords']
+    return _message_categories(commits, ruleset)
 
-def draw_author_contribution_ratio(commits, output_dir="stats", prefix=""):
+def _commit_type_items(ruleset, values):
+    # 去掉默认类别(非规范提交)与计数为 0 的类型，没有任何规范提交时返回 None
+    default = ruleset.labels.index(ruleset.default)
+    items = [(label, value) for i, (label, value) in enumerate(zip(ruleset.labels, values)) if i != default and value > 0]
+    if not items:
+        return None
+    return {'items': items, 'other': (ruleset.default, values[default])}
+
+def compute_commit_type_distribution(commits, ruleset=None):
+    """
+    统计 Conventional Commits 类型(feat/fix/docs...)的分布
+    :param commits: CommitTable 提交表
+    :param ruleset: classifier.Ruleset，默认为 classifier.RULESETS['commit_types']
     """
-    统计核心贡献者提交量占比饼图(补充提交次数排行的深度分析)
+    if ruleset is None:
+        ruleset = classifier.RULESETS['commit_types']
+    return _commit_type_items(ruleset, _message_categories(commits, ruleset)['values'])
+
+def compute_author_contribution_ratio(commits):
+    """
+    统计核心贡献者提交量占比(补充提交次数排行的深度分析)
     功能说明: 分析项目的核心开发人员构成，反映团队贡献权重与项目维护模式
-    :param commits: 提交记录列表
-    :param output_dir: 输出目录
-    :param prefix: 文件名前缀
+    :param commits: CommitTable 提交表
     """
-    authors = [commit['author'] for commit in commits]
-    author_counts = Counter(authors)
     # 取提交量前8的核心贡献者，其余归为"其他贡献者"，保证图表简洁美观
-    top_authors = author_counts.most_common(8)
-    other_count = sum(author_counts.values()) - sum([count for _, count in top_authors])
-    
+    top_authors = _most_common_authors(commits, 8)
+    other_count = len(commits) - sum([count for _, count in top_authors])
+
     # 组装最终统计数据
     contribution_data = list(top_authors)
     if other_count > 0:
         contribution_data.append(('其他贡献者', other_count))
-    
-    names, counts = zip(*contribution_data)
-    plt.figure(figsize=(9, 9))
-    plt.pie(counts, labels=names, autopct='%1.1f%%',
-            colors=plt.cm.Set3(range(len(names))), startangle=90)
-    plt.title('项目核心贡献者提交量占比分析')
-    path = get_save_path('stats_author_ratio.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
-
-def draw_modify_file_count_distribution(repo, commits, output_dir="stats", prefix=""):
-    """
-    统计每次提交的改动文件数量分布直方图
+    return {'items': contribution_data}
+
+def compute_modify_file_count_distribution(numstat, commits):
+    """
+    统计每次提交的改动文件数量分布
     功能说明: 分析项目开发粒度，判断是小步迭代(少量文件修改)还是大批量重构(大量文件修改)
-    :param repo: git仓库对象
-    :param commits: 提交记录列表
-    :param output_dir: 输出目录
-    :param prefix: 文件名前缀
+    :param numstat: 共享的 NumstatTable(拓扑顺序，最新提交在前)
+    :param commits: CommitTable 提交表
     """
     modify_file_counts = []
     # 遍历提交记录，统计每次提交修改的文件数量
-    for commit in repo.iter_commits('--all', max_count=len(commits), topo_order=True):
-        file_count = len(commit.stats.files)
-        modify_file_counts.append(file_count)
-    
-    plt.figure(figsize=(11, 6))
-    plt.hist(modify_file_counts, bins=15, color='#74B9FF', edgecolor='black', alpha=0.8)
-    plt.title('单次提交-改动文件数量分布情况')
-    plt.xlabel('每次提交修改的文件数')
-    plt.ylabel('该类型提交的出现频次')
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    path = get_save_path('stats_modify_file_count.png', output_dir, prefix)
-    plt.savefig(path)
-    plt.close()
-    print(f"已生成统计图: {path}")
-
-def run_all_analysis(repo, commits, output_dir="stats", prefix=""):
-    draw_author_stats(commits, output_dir, prefix)
-    draw_monthly_activity(commits, output_dir, prefix)
-    draw_keyword_distribution(commits, output_dir, prefix)
-    draw_day_of_week_activity(commits, output_dir, prefix)
-    draw_hourly_activity(commits, output_dir, prefix)
-    analyze_message_metrics(commits, output_dir, prefix)
-    analyze_cumulative_growth(commits, output_dir, prefix)
-    analyze_hotspots(repo, 200, output_dir, prefix)
-    draw_merge_activities(commits, output_dir, prefix)
-    draw_merge_ratio(commits, output_dir, prefix)
-    draw_file_type_distribution(repo, 200, output_dir, prefix)
-    draw_weekly_velocity(commits, output_dir, prefix)
-    draw_loc_evolution(repo, 300, output_dir, prefix)
-    draw_release_timeline(repo, output_dir, prefix)
-    draw_code_ins_del_trend(repo, commits, output_dir, prefix)
-    draw_cn_keyword_distribution(commits, output_dir, prefix)
-    draw_author_contribution_ratio(commits, output_dir, prefix)
-    draw_modify_file_count_distribution(repo, commits, output_dir, prefix)
\ No newline at end of file
+    table = numstat.head(len(commits))
+    for i in range(len(table)):
+        modify_file_counts.append(table.file_count(i))
+    return {'counts': modify_file_counts}
+
+def _base_row(commits, ref_index, base):
+    # 没有可用的基准分支时，以最新的提交作为主线末端
+    if base is None:
+        return len(commits) - 1
+    return int(rows_for_shas(commits, [ref_index.tips[base]])[0])
+
+def compute_branch_stats(dag, commits, ref_index):
+    """
+    分支存活时间与合并耗时，分支为基准分支第一父提交链以外的各条第一父提交链
+    - 存活时间：分支上最早的提交到合并(未合并时为分支最新的提交)
+    - 合并耗时：分叉点到合并
+    """
+    if not len(dag):
+        return None
+    chains = dag.chains([_base_row(commits, ref_index, default_base(ref_index, commits))])
+    branches = chains.branches()
+    if not len(branches):
+        return None
+    ts = commits.timestamps
+    merges = chains.merges[branches]
+    merged = merges >= 0
+    ends = np.where(merged, merges, chains.heads[branches])
+    lifetimes = (ts[ends] - ts[chains.tails[branches]]) / 86400
+    with_fork = merged & (chains.forks[branches] >= 0)
+    latencies = (ts[merges[with_fork]] - ts[chains.forks[branches][with_fork]]) / 86400
+    return {'lifetimes': lifetimes.tolist(), 'latencies': latencies.tolist(),
+            'merged': int(merged.sum()), 'open': int((~merged).sum())}
+
+def compute_ahead_behind(dag, commits, ref_index, limit=20):
+    """各分支相对基准分支的 ahead / behind 提交数，取差异最大的 limit 个"""
+    base = default_base(ref_index, commits)
+    if base is None:
+        return None
+    refs = [(name, sha) for name, sha in branch_refs(ref_index) if name != base]
+    rows = rows_for_shas(commits, [sha for _, sha in refs])
+    present = [(ref_short_name(name), row) for (name, _), row in zip(refs, rows.tolist()) if row >= 0]
+    if not present:
+        return None
+    counts = dag.ahead_behind(_base_row(commits, ref_index, base), [row for _, row in present])
+    items = [(name, ahead, behind) for (name, _), (ahead, behind) in zip(present, counts)]
+    items.sort(key=lambda item: -(item[1] + item[2]))
+    return {'base': ref_short_name(base), 'items': items[:limit]}
+
+def compute_ownership_stats(snapshots, n=10):
+    """最新版本中存活行数最多的 n 位作者"""
+    if not snapshots or not snapshots[-1][1]:
+        return None
+    counts = snapshots[-1][1]
+    return {'items': counts.most_common(n), 'total': sum(counts.values())}
+
+def compute_ownership_trend(snapshots, n=8):
+    """各采样时间点上存活行数的构成，取最新版本中排名前 n 的作者，其余合并为“其他”"""
+    if len(snapshots) < 2:
+        return None
+    top = [name for name, _ in snapshots[-1][1].most_common(n)]
+    series = [[counts[name] for _, counts in snapshots] for name in top]
+    series.append([sum(counts.values()) - sum(counts[name] for name in top) for _, counts in snapshots])
+    return {'dates': [datetime.fromtimestamp(ts) for ts, _ in snapshots], 'labels': top + ['其他'], 'series': series}
+
+@profiling.profiled()
+def compute_ownership_charts(repo, cache=None, samples=8, workers=None, rev='HEAD'):
+    """
+    代码归属图表的数据，blame 代价较高，只在显式开启时计算
+    :param samples: 在 rev 的历史上按时间采样的版本数(含 rev 本身)
+    :param workers: 并行 blame 的线程数
+    """
+    snapshots = ownership_history(repo.git_dir, rev, samples, cache, workers)
+    return [
+        ('ownership', compute_ownership_stats(snapshots)),
+        ('ownership_trend', compute_ownership_trend(snapshots)),
+    ]
+
+# ---------------------------------------------------------------------------
+# 第二阶段：基于面向对象的 Figure API 渲染，不依赖 pyplot 的全局状态，可在子进程中并行执行
+# ---------------------------------------------------------------------------
+
+def _render_approx_note(fig, data):
+    # 近似统计(--approx)的图表在底部注明所用的数据结构与误差范围
+    if data.get('approx'):
+        fig.subplots_adjust(bottom=fig.subplotpars.bottom + 0.05)
+        fig.text(0.5, 0.005, data['approx'], ha='center', va='bottom', fontsize=8, color='dimgray', wrap=True)
+
+def _render_author_stats(fig, data):
+    ax = fig.subplots()
+    ax.barh(data['names'], data['counts'], color='skyblue')
+    ax.set_title('前 10 名作者提交数统计')
+    ax.set_xlabel('提交次数')
+    fig.tight_layout()
+    _render_approx_note(fig, data)
+
+def _render_monthly_activity(fig, data):
+    ax = fig.subplots()
+    if data['items']:
+        m_labels, m_values = zip(*data['items'])
+        ax.plot(m_labels, m_values, marker='o', linestyle='-', color='green')
+        ax.tick_params(axis='x', labelrotation=45)
+    ax.set_title('每月提交频率趋势')
+    ax.set_ylabel('提交次数')
+    fig.tight_layout()
+
+def _render_keyword_distribution(fig, data):
+    ax = fig.subplots()
+    ax.pie(data['values'], labels=data['labels'], autopct='%1.1f%%',
+           colors=['#ff9999','#66b3ff','#99ff99','#ffcc99'])
+    ax.set_title('提交信息关键词分布')
+
+def _render_day_of_week_activity(fig, data):
+    ax = fig.subplots()
+    day_labels = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+    ax.bar(day_labels, data['values'], color='teal')
+    ax.set_title('每周提交演变分布')
+    ax.set_ylabel('提交次数')
+
+def _render_hourly_activity(fig, data):
+    ax = fig.subplots()
+    hour_labels = [f"{i:02d}h" for i in range(24)]
+    ax.plot(hour_labels, data['values'], marker='s', color='orange')
+    ax.fill_between(hour_labels, data['values'], alpha=0.2, color='orange')
+    ax.set_title('全天时段提交活跃度')
+    ax.set_xlabel('小时')
+    ax.set_ylabel('提交次数')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+def _render_message_metrics(fig, data):
+    ax = fig.subplots()
+    # 流式计算时只保存 取值 -> 次数，以 weights 传入，直方图与逐条数据完全相同
+    ax.hist(data['lengths'], bins=20, weights=data.get('weights'), color='plum', edgecolor='black')
+    ax.set_title('提交信息长度分布情况')
+    ax.set_xlabel('长度 (字符数)')
+    ax.set_ylabel('频率')
+    _render_approx_note(fig, data)
+
+def _render_cumulative_growth(fig, data):
+    ax = fig.subplots()
+    ax.plot(data['dates'], data['counts'], color='crimson', linewidth=2)
+    ax.fill_between(data['dates'], data['counts'], color='crimson', alpha=0.1)
+    ax.set_title('项目提交累计增长曲线')
+    ax.set_xlabel('日期')
+    ax.set_ylabel('总提交数')
+    ax.grid(True, which='both', linestyle='--', alpha=0.5)
+    _render_approx_note(fig, data)
+
+def _render_hotspots(fig, data):
+    ax = fig.subplots()
+    dirs, counts = zip(*data['items'])
+    ax.bar(dirs, counts, color='gold')
+    ax.set_title('最常被修改的前 10 个目录')
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.set_ylabel('修改频率')
+    fig.tight_layout()
+    _render_approx_note(fig, data)
+
+def _render_merge_activities(fig, data):
+    ax = fig.subplots()
+    if data['items']:
+        m_labels, m_values = zip(*data['items'])
+        ax.bar(m_labels, m_values, color='mediumpurple')
+        ax.tick_params(axis='x', labelrotation=45)
+    ax.set_title('每月合并 (PR 完成) 活动统计')
+    ax.set_ylabel('合并次数')
+    fig.tight_layout()
+
+def _render_merge_ratio(fig, data):
+    ax = fig.subplots()
+    ax.pie(data['values'], labels=['合并提交 (Merge)', '普通提交 (Normal)'],
+           autopct='%1.1f%%', colors=['#6c5ce7', '#a29bfe'])
+    ax.set_title('合并提交与普通提交占比')
+
+def _render_file_type_distribution(fig, data):
+    ax = fig.subplots()
+    exts, counts = zip(*data['items'])
+    ax.bar(exts, counts, color='lightcoral')
+    ax.set_title('最常修改的文件类型 (前 10)')
+    ax.set_ylabel('修改次数')
+    fig.tight_layout()
+    _render_approx_note(fig, data)
+
+def _render_weekly_velocity(fig, data):
+    ax = fig.subplots()
+    if data['items']:
+        w_labels, w_values = zip(*data['items'])
+        ax.plot(w_labels, w_values, color='dodgerblue', marker='.')
+        ax.tick_params(axis='x', labelrotation=90, labelsize=8)
+    ax.set_title('每周提交速度趋势')
+    ax.set_ylabel('提交次数')
+    fig.tight_layout()
+
+def _render_loc_evolution(fig, data):
+    ax = fig.subplots()
+    ax.plot(data['dates'], data['values'], color='forestgreen', linewidth=1.5)
+    ax.fill_between(data['dates'], data['values'], color='forestgreen', alpha=0.1)
+    ax.set_title('代码库净行数演变趋势 (LOC)')
+    ax.set_xlabel('日期')
+    ax.set_ylabel('累计行数 (净值)')
+    ax.grid(True, linestyle=':', alpha=0.6)
+    fig.tight_layout()
+
+def _render_release_timeline(fig, data):
+    ax = fig.subplots()
+    tag_dates, tag_names = data['dates'], data['names']
+    ax.scatter(tag_dates, [1] * len(tag_dates), color='red', s=100, zorder=3)
+    for i, (date, name) in enumerate(zip(tag_dates, tag_names)):
+        ax.vlines(date, 0, 1, colors='grey', linestyles='--', alpha=0.3)
+        ax.text(date, 1.05 if i % 2 == 0 else 0.9, name,
+                rotation=45, ha='right', fontsize=9, color='darkred')
+    ax.set_title('项目 Release (Tag) 发布时间轴')
+    ax.set_yticks([])
+    ax.set_xlabel('发布年份/月份')
+    ax.set_ylim(0.5, 1.5)
+    ax.grid(axis='x', linestyle=':', alpha=0.5)
+    fig.tight_layout()
+
+def _render_code_ins_del_trend(fig, data):
+    ax = fig.subplots()
+    commit_dates = data['dates']
+    ax.plot(commit_dates, data['insertions'], marker='.', color='#2E8B57', label='新增代码行数', linewidth=1.5)
+    ax.plot(commit_dates, data['deletions'], marker='.', color='#DC143C', label='删除代码行数', linewidth=1.5)
+    ax.fill_between(commit_dates, data['insertions'], alpha=0.2, color='#2E8B57')
+    ax.fill_between(commit_dates, data['deletions'], alpha=0.2, color='#DC143C')
+    ax.set_title('项目提交代码新增/删除行数趋势分析')
+    ax.set_xlabel('提交日期')
+    ax.set_ylabel('代码行数')
+    ax.legend(loc='upper right')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+
+def _render_cn_keyword_distribution(fig, data):
+    # 绘制饼图，配色美观，标注百分比
+    ax = fig.subplots()
+    ax.pie(data['values'], labels=data['labels'], autopct='%1.1f%%',
+           colors=['#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FECA57'], startangle=90)
+    ax.set_title('提交信息-中文高频开发关键词分布')
+
+def _render_commit_type_distribution(fig, data):
+    ax = fig.subplots()
+    labels, values = zip(*data['items'])
+    ax.bar(labels, values, color=_matplotlib().colormaps['tab20'](range(len(labels))))
+    conventional = sum(values)
+    ax.set_title(f"提交类型分布 (Conventional Commits，规范提交占 {conventional / (conventional + data['other'][1]):.1%})")
+    ax.set_ylabel('提交次数')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+def _render_author_contribution_ratio(fig, data):
+    ax = fig.subplots()
+    names, counts = zip(*data['items'])
+    ax.pie(counts, labels=names, autopct='%1.1f%%',
+           colors=_matplotlib().colormaps['Set3'](range(len(names))), startangle=90)
+    ax.set_title('项目核心贡献者提交量占比分析')
+    _render_approx_note(fig, data)
+
+def _render_modify_file_count_distribution(fig, data):
+    ax = fig.subplots()
+    ax.hist(data['counts'], bins=15, weights=data.get('weights'), color='#74B9FF', edgecolor='black', alpha=0.8)
+    ax.set_title('单次提交-改动文件数量分布情况')
+    ax.set_xlabel('每次提交修改的文件数')
+    ax.set_ylabel('该类型提交的出现频次')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    _render_approx_note(fig, data)
+
+def _render_branch_stats(fig, data):
+    ax_life, ax_latency = fig.subplots(1, 2)
+    for ax, values, color, title in ((ax_life, data['lifetimes'], 'teal', '分支存活时间'),
+                                     (ax_latency, data['latencies'], 'darkorange', '合并耗时 (分叉点到合并)')):
+        if values:
+            ax.hist(values, bins=30, color=color, edgecolor='black', alpha=0.8)
+            median = float(np.median(values))
+            ax.axvline(median, color='black', linestyle='--', label=f'中位数 {median:.1f} 天')
+            ax.legend()
+        ax.set_title(title)
+        ax.set_xlabel('天')
+        ax.set_ylabel('分支数')
+    fig.suptitle(f"分支统计：已合并 {data['merged']} 个，未合并 {data['open']} 个")
+    fig.tight_layout()
+
+def _render_ahead_behind(fig, data):
+    ax = fig.subplots()
+    names, ahead, behind = zip(*data['items'])
+    y = np.arange(len(names))
+    ax.barh(y, ahead, color='seagreen', label='ahead (领先)')
+    ax.barh(y, [-b for b in behind], color='indianred', label='behind (落后)')
+    ax.set_yticks(y, names)
+    ax.invert_yaxis()
+    ax.axvline(0, color='black', linewidth=0.8)
+    ax.set_title(f"各分支相对 {data['base']} 的领先/落后提交数")
+    ax.set_xlabel('提交数')
+    ax.legend()
+    fig.tight_layout()
+
+def _render_ownership_stats(fig, data):
+    ax = fig.subplots()
+    names, lines = zip(*data['items'])
+    ax.barh(names, lines, color='cadetblue')
+    ax.invert_yaxis()
+    for y, value in enumerate(lines):
+        ax.text(value, y, f" {value / data['total']:.1%}", va='center')
+    ax.set_title('当前版本中各作者存活的代码行数 (git blame)')
+    ax.set_xlabel('代码行数')
+    fig.tight_layout()
+
+def _render_ownership_trend(fig, data):
+    ax = fig.subplots()
+    ax.stackplot(data['dates'], data['series'], labels=data['labels'],
+                 colors=_matplotlib().colormaps['tab20'](range(len(data['labels']))), alpha=0.85)
+    ax.set_title('各作者存活代码行数随时间的变化')
+    ax.set_ylabel('代码行数')
+    ax.legend(loc='upper left', fontsize='small')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+ChartSpec = namedtuple('ChartSpec', ['filename', 'figsize', 'render', 'skip_message'])
+
+# 图表名 -> 输出文件、画布尺寸与渲染函数，顺序即 run_all_analysis 的输出顺序
+CHARTS = {
+    'authors': ChartSpec('stats_authors.png', (10, 6), _render_author_stats, None),
+    'monthly': ChartSpec('stats_monthly.png', (12, 6), _render_monthly_activity, None),
+    'keywords': ChartSpec('stats_keywords.png', (8, 8), _render_keyword_distribution, None),
+    'dow': ChartSpec('stats_dow.png', (10, 5), _render_day_of_week_activity, None),
+    'hourly': ChartSpec('stats_hourly.png', (12, 5), _render_hourly_activity, None),
+    'msg_lengths': ChartSpec('stats_msg_lengths.png', (10, 6), _render_message_metrics, None),
+    'growth': ChartSpec('stats_growth.png', (10, 6), _render_cumulative_growth, None),
+    'hotspots': ChartSpec('stats_hotspots.png', (10, 6), _render_hotspots, None),
+    'merges': ChartSpec('stats_merges.png', (12, 6), _render_merge_activities, None),
+    'merge_ratio': ChartSpec('stats_merge_ratio.png', (8, 8), _render_merge_ratio, None),
+    'file_types': ChartSpec('stats_file_types.png', (10, 6), _render_file_type_distribution, None),
+    'weekly': ChartSpec('stats_weekly.png', (15, 6), _render_weekly_velocity, None),
+    'loc': ChartSpec('stats_loc.png', (12, 6), _render_loc_evolution, None),
+    'releases': ChartSpec('stats_releases.png', (12, 6), _render_release_timeline,
+                          "未发现 Release 标签，跳过发布统计。"),
+    'ins_del_trend': ChartSpec('stats_ins_del_trend.png', (12, 6), _render_code_ins_del_trend, None),
+    'cn_keywords': ChartSpec('stats_cn_keywords.png', (8, 8), _render_cn_keyword_distribution, None),
+    'commit_types': ChartSpec('stats_commit_types.png', (12, 6), _render_commit_type_distribution,
+                              "未发现符合 Conventional Commits 规范的提交，跳过提交类型统计。"),
+    'author_ratio': ChartSpec('stats_author_ratio.png', (9, 9), _render_author_contribution_ratio, None),
+    'modify_file_count': ChartSpec('stats_modify_file_count.png', (11, 6), _render_modify_file_count_distribution, None),
+    'branches': ChartSpec('stats_branches.png', (14, 6), _render_branch_stats, "未发现分支，跳过分支统计。"),
+    'ahead_behind': ChartSpec('stats_ahead_behind.png', (12, 8), _render_ahead_behind,
+                              "未发现其他分支，跳过 ahead/behind 统计。"),
+    'ownership': ChartSpec('stats_ownership.png', (10, 6), _render_ownership_stats, "没有可归属的文本文件，跳过代码归属统计。"),
+    'ownership_trend': ChartSpec('stats_ownership_trend.png', (12, 6), _render_ownership_trend,
+                                 "历史中只有一个采样点，跳过代码归属趋势。"),
+}
+
+# 近似统计不保存提交图，分支与 ahead/behind 图的数据为 None 并不表示仓库没有分支
+APPROX_SKIP_MESSAGES = {
+    'branches': "近似统计(--approx)不保存提交图，跳过分支统计。",
+    'ahead_behind': "近似统计(--approx)不保存提交图，跳过 ahead/behind 统计。",
+}
+
+def _save_png(fig, path):
+    fig.savefig(path)
+
+def _save_png_fast(fig, path):
+    # 低分辨率 + 最低压缩级别：编码耗时与文件大小都明显下降，适合只在页面中预览的场景
+    fig.savefig(path, dpi=72, pil_kwargs={'compress_level': 1})
+
+def _save_svg(fig, path):
+    # 文字保留为 <text> 而不是字形路径，文件更小；固定 id 的盐值与日期，相同数据的输出逐字节一致
+    with _matplotlib().rc_context({'svg.fonttype': 'none', 'svg.hashsalt': 'comtool'}):
+        fig.savefig(path, format='svg', metadata={'Date': None})
+
+OutputFormat = namedtuple('OutputFormat', ['extension', 'save'])
+
+# 输出格式 -> 文件后缀与保存函数；json 不经过 matplotlib，直接写出 Chart.js 配置(与报告服务 /api/charts 相同)
+OUTPUT_FORMATS = {
+    'png': OutputFormat('.png', _save_png),
+    'png-fast': OutputFormat('.png', _save_png_fast),
+    'svg': OutputFormat('.svg', _save_svg),
+    'json': OutputFormat('.json', None),
+}
+
+# 渲染函数或输出格式的实现改变时递增，使已有的渲染缓存失效
+RENDER_VERSION = 2
+
+def chart_filename(name, output_format='png'):
+    return os.path.splitext(CHARTS[name].filename)[0] + OUTPUT_FORMATS[output_format].extension
+
+def chart_digest(name, data, output_format='png'):
+    """图表输入的内容哈希：图表名、画布尺寸、输出格式、渲染版本与数据本身，任何一项变化都会重新渲染"""
+    spec = CHARTS[name]
+    payload = json.dumps([RENDER_VERSION, _matplotlib_version(), name, spec.figsize, output_format, data],
+                         default=json_default, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _manifest_path(output_dir, prefix):
+    return os.path.join(output_dir, f"{prefix}render_manifest.json")
+
+def _load_manifest(path):
+    # 渲染清单：输出文件名 -> 上次渲染时的 chart_digest
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(path, manifest):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def render_chart(name, data, path, output_format='png'):
+    """用独立的 Figure 渲染一张图表并保存，串行与并行路径共用，保证输出逐字节一致"""
+    spec = CHARTS[name]
+    save = OUTPUT_FORMATS[output_format].save
+    if save is None:
+        with profiling.stage(f"encode:{name}"):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(chart_view(name, data), f, ensure_ascii=False, default=json_default)
+        return path
+    _matplotlib()
+    from matplotlib.figure import Figure
+    with profiling.stage(f"layout:{name}"):
+        fig = Figure(figsize=spec.figsize)
+        spec.render(fig, data)
+    with profiling.stage(f"encode:{name}"):
+        save(fig, path)
+    return path
+
+def _render_job(job):
+    name, data, path, output_format, profile = job
+    if profile and profiling.active() is None:
+        # 在渲染进程中单独采集，记录随结果交回主进程合并
+        with profiling.Profiler() as profiler:
+            with profiling.stage(f"render:{name}"):
+                render_chart(name, data, path, output_format)
+        return path, profiler.records
+    with profiling.stage(f"render:{name}"):
+        render_chart(name, data, path, output_format)
+    return path, None
+
+@profiling.profiled()
+def render_charts(chart_data, output_dir="stats", prefix="", workers=1, executor=None, output_format='png',
+                  force=False, skip_messages=None):
+    """
+    渲染第一阶段算好的全部图表
+    :param chart_data: [(图表名, 数据), ...]，数据为 None 表示跳过
+    :param workers: 渲染进程数，1 表示在当前进程串行渲染
+    :param executor: 外部共享的进程池(批量分析时多个仓库共用)，传入时忽略 workers
+    :param output_format: 输出格式，见 OUTPUT_FORMATS
+    :param force: 忽略渲染清单，全部重新渲染；默认数据与上次相同且文件仍在时跳过该图表
+    :param skip_messages: {图表名: 提示}，数据为 None 的原因不是 CHARTS 中的 skip_message 时由调用方给出
+    """
+    profiler = profiling.active()
+    manifest_path = _manifest_path(output_dir, prefix)
+    manifest = _load_manifest(manifest_path)
+    jobs, digests = [], {}
+    for name, data in chart_data:
+        spec = CHARTS[name]
+        if data is None:
+            message = (skip_messages or {}).get(name, spec.skip_message)
+            if message:
+                print(message)
+            continue
+        filename = chart_filename(name, output_format)
+        path = get_save_path(filename, output_dir, prefix)
+        with profiling.stage(f"digest:{name}"):
+            digest = chart_digest(name, data, output_format)
+        if not force and manifest.get(os.path.basename(path)) == digest and os.path.exists(path):
+            print(f"图表数据未变化，跳过渲染: {path}")
+            continue
+        digests[path] = digest
+        jobs.append((name, data, path, output_format, profiler is not None))
+    if executor is not None:
+        _collect_rendered(executor.map(_render_job, jobs), profiler)
+    elif workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            _collect_rendered(pool.map(_render_job, jobs), profiler)
+    else:
+        _collect_rendered(map(_render_job, jobs), profiler)
+    if digests:
+        manifest.update({os.path.basename(path): digest for path, digest in digests.items()})
+        _save_manifest(manifest_path, manifest)
+
+def _collect_rendered(results, profiler):
+    for path, records in results:
+        if profiler is not None:
+            profiler.merge(records)
+        print(f"已生成统计图: {path}")
+
+def _draw(name, data, output_dir, prefix):
+    render_charts([(name, data)], output_dir, prefix)
+
+def draw_author_stats(commits, output_dir="stats", prefix=""):
+    _draw('authors', compute_author_stats(commits), output_dir, prefix)
+
+def draw_monthly_activity(commits, output_dir="stats", prefix=""):
+    _draw('monthly', compute_monthly_activity(TimeRollup.from_commits(commits)), output_dir, prefix)
+
+def draw_keyword_distribution(commits, output_dir="stats", prefix=""):
+    _draw('keywords', compute_keyword_distribution(commits), output_dir, prefix)
+
+def draw_day_of_week_activity(commits, output_dir="stats", prefix=""):
+    _draw('dow', compute_day_of_week_activity(TimeRollup.from_commits(commits)), output_dir, prefix)
+
+def draw_hourly_activity(commits, output_dir="stats", prefix=""):
+    _draw('hourly', compute_hourly_activity(TimeRollup.from_commits(commits)), output_dir, prefix)
+
+def analyze_message_metrics(commits, output_dir="stats", prefix=""):
+    _draw('msg_lengths', compute_message_metrics(commits), output_dir, prefix)
+
+def analyze_cumulative_growth(commits, output_dir="stats", prefix=""):
+    _draw('growth', compute_cumulative_growth(TimeRollup.from_commits(commits)), output_dir, prefix)
+
+def analyze_hotspots(numstat, limit=100, output_dir="stats", prefix=""):
+    _draw('hotspots', compute_hotspots(PathTrie.from_numstat(numstat.head(limit))), output_dir, prefix)
+
+def draw_merge_activities(commits, output_dir="stats", prefix=""):
+    _draw('merges', compute_merge_activities(TimeRollup.from_commits(commits)), output_dir, prefix)
+
+def draw_merge_ratio(commits, output_dir="stats", prefix=""):
+    _draw('merge_ratio', compute_merge_ratio(commits), output_dir, prefix)
+
+def draw_file_type_distribution(numstat, limit=100, output_dir="stats", prefix=""):
+    _draw('file_types', compute_file_type_distribution(PathTrie.from_numstat(numstat.head(limit))), output_dir, prefix)
+
+def draw_weekly_velocity(commits, output_dir="stats", prefix=""):
+    _draw('weekly', compute_weekly_velocity(TimeRollup.from_commits(commits)), output_dir, prefix)
+
+def draw_loc_evolution(numstat, limit=200, output_dir="stats", prefix=""):
+    _draw('loc', compute_loc_evolution(numstat, limit), output_dir, prefix)
+
+def draw_release_timeline(ref_index, output_dir="stats", prefix=""):
+    _draw('releases', compute_release_timeline(ref_index), output_dir, prefix)
+
+def draw_code_ins_del_trend(numstat, commits, output_dir="stats", prefix=""):
+    _draw('ins_del_trend', compute_code_ins_del_trend(numstat, commits), output_dir, prefix)
+
+def draw_cn_keyword_distribution(commits, output_dir="stats", prefix=""):
+    _draw('cn_keywords', compute_cn_keyword_distribution(commits), output_dir, prefix)
+
+def draw_commit_type_distribution(commits, output_dir="stats", prefix=""):
+    _draw('commit_types', compute_commit_type_distribution(commits), output_dir, prefix)
+
+def draw_author_contribution_ratio(commits, output_dir="stats", prefix=""):
+    _draw('author_ratio', compute_author_contribution_ratio(commits), output_dir, prefix)
+
+def draw_modify_file_count_distribution(numstat, commits, output_dir="stats", prefix=""):
+    _draw('modify_file_count', compute_modify_file_count_distribution(numstat, commits), output_dir, prefix)
+
+def draw_branch_stats(commits, ref_index, output_dir="stats", prefix=""):
+    _draw('branches', compute_branch_stats(CommitDag.from_table(commits), commits, ref_index), output_dir, prefix)
+
+def draw_ahead_behind(commits, ref_index, output_dir="stats", prefix=""):
+    _draw('ahead_behind', compute_ahead_behind(CommitDag.from_table(commits), commits, ref_index), output_dir, prefix)
+
+# 未指定 HistorySelection 时沿用的各图表窗口(最近 N 个提交)；指定后所有图表统计同一批提交
+LEGACY_CHART_LIMITS = {'hotspots': 200, 'file_types': 200, 'loc': 300}
+FULL_CHART_LIMITS = {'hotspots': None, 'file_types': None, 'loc': None}
+
+def chart_computations(limits=LEGACY_CHART_LIMITS):
+    """
+    每张图表的计算方式：[(图表名, 计算函数, 依赖的输入名, 额外参数), ...]，顺序与 CHARTS 一致
+    输入名为 commits / numstat / ref_index / dag / rollup(按时间桶预聚合的 TimeRollup) /
+    hotspot_paths、file_type_paths(由 numstat.head(limits[...]) 构建的 PathTrie)，按需加载输入的调用方(例如报告服务)只准备用到的那几项
+    :param limits: 热点目录/文件类型/LOC 三张图各自统计的最近提交数，None 表示 numstat 中的全部提交；
+                   前两项由调用方在构建 PathTrie 时使用
+    提交信息分类图表的规则集在调用时从 classifier.RULESETS 读取，load_rulesets 之后的调用使用新规则集
+    """
+    return [
+        ('authors', compute_author_stats, ('commits',), ()),
+        ('monthly', compute_monthly_activity, ('rollup',), ()),
+        ('keywords', compute_keyword_distribution, ('commits',), (classifier.RULESETS['keywords'],)),
+        ('dow', compute_day_of_week_activity, ('rollup',), ()),
+        ('hourly', compute_hourly_activity, ('rollup',), ()),
+        ('msg_lengths', compute_message_metrics, ('commits',), ()),
+        ('growth', compute_cumulative_growth, ('rollup',), ()),
+        ('hotspots', compute_hotspots, ('hotspot_paths',), ()),
+        ('merges', compute_merge_activities, ('rollup',), ()),
+        ('merge_ratio', compute_merge_ratio, ('commits',), ()),
+        ('file_types', compute_file_type_distribution, ('file_type_paths',), ()),
+        ('weekly', compute_weekly_velocity, ('rollup',), ()),
+        ('loc', compute_loc_evolution, ('numstat',), (limits['loc'],)),
+        ('releases', compute_release_timeline, ('ref_index',), ()),
+        ('ins_del_trend', compute_code_ins_del_trend, ('numstat', 'commits'), ()),
+        ('cn_keywords', compute_cn_keyword_distribution, ('commits',), (classifier.RULESETS['cn_keywords'],)),
+        ('commit_types', compute_commit_type_distribution, ('commits',), (classifier.RULESETS['commit_types'],)),
+        ('author_ratio', compute_author_contribution_ratio, ('commits',), ()),
+        ('modify_file_count', compute_modify_file_count_distribution, ('numstat', 'commits'), ()),
+        ('branches', compute_branch_stats, ('dag', 'commits', 'ref_index'), ()),
+        ('ahead_behind', compute_ahead_behind, ('dag', 'commits', 'ref_index'), ()),
+    ]
+
+def compute_all_charts(commits, numstat, ref_index, limits=LEGACY_CHART_LIMITS):
+    """
+    第一阶段：每张图表的数据只计算一次，返回 [(图表名, 数据), ...]
+    :param limits: 同 chart_computations
+    """
+    with profiling.stage("dag"):
+        dag = CommitDag.from_table(commits)
+    with profiling.stage("rollup"):
+        rollup = TimeRollup.from_commits(commits, numstat)
+    with profiling.stage("path_trie"):
+        # 两张图的窗口相同时共用一棵树
+        tries = {limit: PathTrie.from_numstat(numstat.head(limit)) for limit in {limits['hotspots'], limits['file_types']}}
+    inputs = {'commits': commits, 'numstat': numstat, 'ref_index': ref_index, 'dag': dag, 'rollup': rollup,
+              'hotspot_paths': tries[limits['hotspots']], 'file_type_paths': tries[limits['file_types']]}
+    chart_data = []
+    for name, compute, needs, extra in chart_computations(limits):
+        with profiling.stage(f"compute:{name}"):
+            chart_data.append((name, compute(*(inputs[key] for key in needs), *extra)))
+    return chart_data
+
+@profiling.profiled()
+def compute_report(repo, commits, cache=None, ref_index=None, selection=None, history_workers=1):
+    """
+    :param selection: 生成 commits 时使用的 HistorySelection；传入后 numstat 与所有图表都统计这同一批提交，
+                      不传时沿用旧口径(numstat 取各图表所需窗口的最大值，部分图表只看最近 200/300 个提交)
+    :param history_workers: 不使用缓存时分片读取 numstat 的进程数，见 numstat.load_numstat
+    """
+    # 所有基于 diff 的图表共用一次 `git log --numstat` 遍历的结果
+    # 传入已 refresh 的 HistoryCache 时直接从缓存读取，不再重新计算 diff
+    if selection is None:
+        max_count, revs, limits = max(300, len(commits)), ('--all',), LEGACY_CHART_LIMITS
+    else:
+        max_count, revs, limits = selection.max_count, selection.rev_args(), FULL_CHART_LIMITS
+    if cache is not None:
+        numstat = cache.load_numstat(repo.git_dir, max_count, revs)
+    else:
+        numstat = load_numstat(repo.git_dir, revs, max_count, workers=history_workers)
+    if ref_index is None:
+        ref_index = build_ref_index(repo.git_dir)
+    return compute_all_charts(commits, numstat, ref_index, limits)
+
+# ---------------------------------------------------------------------------
+# 流式计算：按时间正序只遍历一次历史，所有图表的数据由增量聚合器同时累积
+# ---------------------------------------------------------------------------
+
+def _commit_totals(c):
+    return c.authored_date, sum(f[1] for f in c.files), sum(f[2] for f in c.files)
+
+def _top_items(counter, n):
+    # Counter / RecencyCounter 返回 (key, 计数)，SpaceSaving 另带误差上界，图表只用前两项
+    return [(key, count) for key, count, *_ in counter.most_common(n)]
+
+def _distinct_note(distinct, what):
+    return f"约 {distinct.estimate()} 个不同{what} (HyperLogLog，标准误差 ±{distinct.relative_error:.1%})"
+
+def _space_saving_note(sketch, n, distinct, what):
+    error = max((error for _, _, error in sketch.most_common(n)), default=0)
+    return (f"近似统计: Space-Saving(容量 {sketch.capacity})，前 {n} 项计数最多高估 {error}；"
+            f"{_distinct_note(distinct, what)}")
+
+def _tdigest_note(digest):
+    return (f"近似统计: t-digest(δ={digest.compression}，{len(digest.means)} 个质心)，分位数秩误差 ≤ {digest.rank_error:.1%}；"
+            f"中位数 ≈ {digest.quantile(0.5):.0f}，P90 ≈ {digest.quantile(0.9):.0f}，P99 ≈ {digest.quantile(0.99):.0f}")
+
+@profiling.profiled()
+def compute_report_streaming(repo, selection=None, ref_index=None, series_capacity=4096, limits=FULL_CHART_LIMITS,
+                             approx=False, history_workers=1, graph=None):
+    """
+    compute_report 的流式版本：一次 `git log --reverse --numstat` 遍历，按时间正序把提交推送给各图表的增量聚合器，
+    返回相同结构的 [(图表名, 数据), ...]，可以处理整个历史(--full-history)
+    - 计数/直方图类图表只保存分类计数；按时间分桶的图表共用一个按月/周等有界时间桶累加的 RollupCollector，
+      累计增长的小时桶超过 series_capacity 个后改为按天、按月分桶；
+      设置了窗口的图表使用固定大小的滑动窗口，未设置时按 key 全量计数
+    - 逐提交的曲线(增删趋势、LOC)超过 series_capacity 个点后按间隔降采样，未超过时与 compute_report 的结果一致
+    - 分支与 ahead/behind 图需要完整的提交图，额外收集每个提交的 sha、时间与父提交，内存随提交数增长；
+      近似统计时不收集，这两张图的数据为 None，渲染时以 APPROX_SKIP_MESSAGES 说明原因
+    :param repo: git.Repo
+    :param selection: HistorySelection，默认为 --all 的全部历史
+    :param ref_index: 已构建的 RefIndex，不传则现场构建
+    :param series_capacity: 逐提交曲线与累计增长曲线最多保留的点数
+    :param limits: 同 compute_all_charts
+    :param approx: 使用内存与提交数无关的近似统计(见 sketches)：作者与未设窗口的目录/后缀排行用 Space-Saving，
+                   消息长度与改动文件数分布用 t-digest，另用 HyperLogLog 估计不同作者/文件数；
+                   相关图表的数据带有 approx 字段，说明误差范围。按月/周分桶的图表仍随历史跨越的月数、周数增长，
+                   不能与 graph=True 同时使用
+    :param history_workers: 分片读取历史的进程数，提交仍按时间正序推送给聚合器，见 streaming.iter_history
+    :param graph: 是否计算分支与 ahead/behind 图，None 表示非近似统计时计算
+    """
+    if graph is None:
+        graph = not approx
+    if approx and graph:
+        raise ValueError("近似统计不保存提交图，不能同时计算分支与 ahead/behind 图")
+    if selection is None:
+        selection = HistorySelection()
+    if ref_index is None:
+        ref_index = build_ref_index(repo.git_dir)
+    stream = HistoryStream(repo.git_dir, selection.rev_args(), selection.max_count, workers=history_workers)
+    if approx:
+        authors = stream.subscribe(SpaceSaving(lambda c: (c.author,)))
+        distinct_authors = stream.subscribe(HyperLogLog(lambda c: (c.author,)))
+        distinct_files = stream.subscribe(HyperLogLog(lambda c: [f[0] for f in c.files]))
+        msg_lengths = stream.subscribe(TDigest(lambda c: len(c.message)))
+        file_counts = stream.subscribe(TDigest(lambda c: len(c.files)))
+    else:
+        authors = stream.subscribe(CountBy(lambda c: c.author))
+        msg_lengths = stream.subscribe(Histogram(lambda c: len(c.message)))
+        file_counts = stream.subscribe(Histogram(lambda c: len(c.files)))
+    rulesets = {name: classifier.RULESETS[name] for name in ('keywords', 'cn_keywords', 'commit_types')}
+    categories = {name: stream.subscribe(ClassifyCollector(ruleset)) for name, ruleset in rulesets.items()}
+    rollup = stream.subscribe(RollupCollector(series_capacity))
+    ins_del = stream.subscribe(DecimatingSeries(_commit_totals, series_capacity))
+    hotspot_limit, file_type_limit, loc_limit = limits['hotspots'], limits['file_types'], limits['loc']
+    ranking = SpaceSaving if approx else RecencyCounter
+    if hotspot_limit is None:
+        dirs = stream.subscribe(ranking(lambda c: [_top_directory(f[0]) for f in c.files]))
+    if file_type_limit is None:
+        exts = stream.subscribe(ranking(lambda c: [file_extension(f[0]) for f in c.files]))
+    if hotspot_limit is not None or file_type_limit is not None:
+        window = max(limit for limit in (hotspot_limit, file_type_limit) if limit is not None)
+        recent_paths = stream.subscribe(SlidingWindow(window, lambda c: [f[0] for f in c.files]))
+    if loc_limit is None:
+        # 先累加再采样，降采样后每个点仍是截至该提交的准确累计值
+        loc_total = stream.subscribe(RunningSum(lambda c: sum(f[1] - f[2] for f in c.files)))
+        loc = stream.subscribe(DecimatingSeries(lambda c: (c.authored_date, loc_total.total), series_capacity))
+    else:
+        recent_totals = stream.subscribe(SlidingWindow(loc_limit, _commit_totals))
+    if graph:
+        graph = stream.subscribe(DagCollector())
+    total = stream.run()
+    time_rollup = rollup.result()
+    branch_stats = ahead_behind = None
+    if graph:
+        graph_table = graph.result()
+        dag = CommitDag.from_table(graph_table)
+        branch_stats = compute_branch_stats(dag, graph_table, ref_index)
+        ahead_behind = compute_ahead_behind(dag, graph_table, ref_index)
+
+    # 滑动窗口按从新到旧重放，与 numstat.head(limit) 的遍历顺序一致
+    dir_counter, ext_counter = Counter(), Counter()
+    if hotspot_limit is not None or file_type_limit is not None:
+        for age, paths in enumerate(reversed(recent_paths.result())):
+            for f in paths:
+                if hotspot_limit is not None and age < hotspot_limit:
+                    dir_counter[_top_directory(f)] += 1
+                if file_type_limit is not None and age < file_type_limit:
+                    ext_counter[file_extension(f)] += 1
+    top_dirs = _top_items(dirs if hotspot_limit is None else dir_counter, 10)
+    top_exts = _top_items(exts if file_type_limit is None else ext_counter, 10)
+
+    if loc_limit is None:
+        loc_points = loc.result()
+    else:
+        loc_points, cumulative_loc = [], 0
+        for authored_date, insertions, deletions in recent_totals.result():
+            cumulative_loc += insertions - deletions
+            loc_points.append((authored_date, cumulative_loc))
+
+    # Counter 按首次出现的顺序插入，most_common 的并列顺序与 _most_common_authors 一致
+    author_counter = authors if approx else authors.result()
+    top_authors = _top_items(author_counter, 10)
+    ratio_authors = _top_items(author_counter, 8)
+    other_count = total - sum(count for _, count in ratio_authors)
+    merge_total = time_rollup.total('merges')
+    lengths, length_weights = msg_lengths.result()
+    file_count_values, file_count_weights = file_counts.result()
+    ins_del_points = ins_del.result()
+    chart_data = [
+        ('authors', {'names': [n for n, _ in top_authors], 'counts': [c for _, c in top_authors]}),
+        ('monthly', compute_monthly_activity(time_rollup)),
+        ('keywords', {'labels': list(rulesets['keywords'].labels), 'values': categories['keywords'].result()}),
+        ('dow', compute_day_of_week_activity(time_rollup)),
+        ('hourly', compute_hourly_activity(time_rollup)),
+        ('msg_lengths', {'lengths': lengths, 'weights': length_weights}),
+        ('growth', compute_cumulative_growth(time_rollup)),
+        ('hotspots', {'items': top_dirs} if top_dirs else None),
+        ('merges', compute_merge_activities(time_rollup)),
+        ('merge_ratio', {'values': [merge_total, total - merge_total]}),
+        ('file_types', {'items': top_exts} if top_exts else None),
+        ('weekly', compute_weekly_velocity(time_rollup)),
+        ('loc', {'dates': [datetime.fromtimestamp(p[0]) for p in loc_points], 'values': [p[1] for p in loc_points]}),
+        ('releases', compute_release_timeline(ref_index)),
+        ('ins_del_trend', {'dates': [datetime.fromtimestamp(p[0]) for p in ins_del_points],
+                           'insertions': [p[1] for p in ins_del_points],
+                           'deletions': [p[2] for p in ins_del_points]}),
+        ('cn_keywords', {'labels': list(rulesets['cn_keywords'].labels), 'values': categories['cn_keywords'].result()}),
+        ('commit_types', _commit_type_items(rulesets['commit_types'], categories['commit_types'].result())),
+        ('author_ratio', {'items': ratio_authors + ([('其他贡献者', other_count)] if other_count > 0 else [])}),
+        ('modify_file_count', {'counts': file_count_values, 'weights': file_count_weights}),
+        ('branches', branch_stats),
+        ('ahead_behind', ahead_behind),
+    ]
+    if approx:
+        author_note = _space_saving_note(authors, 10, distinct_authors, '作者')
+        notes = {
+            'authors': author_note,
+            'author_ratio': author_note,
+            'msg_lengths': _tdigest_note(msg_lengths),
+            'modify_file_count': _tdigest_note(file_counts),
+            'hotspots': (_space_saving_note(dirs, 10, distinct_files, '文件') if hotspot_limit is None else
+                         f"最近 {hotspot_limit} 个提交为精确统计；{_distinct_note(distinct_files, '文件')}"),
+            'file_types': (_space_saving_note(exts, 10, distinct_files, '文件') if file_type_limit is None else
+                           f"最近 {file_type_limit} 个提交为精确统计；{_distinct_note(distinct_files, '文件')}"),
+        }
+        if time_rollup.granularity != 'hour':
+            unit = {'day': '天', 'month': '月'}[time_rollup.granularity]
+            notes['growth'] = f"小时桶超过 {series_capacity} 个，累计增长曲线改为按{unit}分桶"
+        for name, data in chart_data:
+            if data is not None and name in notes:
+                data['approx'] = notes[name]
+    return chart_data
+
+def run_all_analysis(repo, commits, output_dir="stats", prefix="", cache=None, ref_index=None, workers=1,
+                     streaming=False, selection=None, ownership_samples=0, blame_workers=None, approx=False,
+                     output_format='png', force_render=False, history_workers=1):
+    """
+    :param streaming: 使用 compute_report_streaming 一次遍历计算全部图表数据，不经过缓存与 NumstatTable
+    :param approx: 流式计算时使用固定内存的近似统计(隐含 streaming)，见 compute_report_streaming
+    :param output_format / force_render: 见 render_charts 的 output_format / force
+    :param selection: 生成 commits 时使用的 HistorySelection，传入后所有图表统计同一批提交
+    :param ownership_samples: 大于 0 时额外计算代码归属(git blame)，在 HEAD 的历史上按时间采样的版本数
+    :param blame_workers: 并行 blame 的线程数，默认为 CPU 核数
+    :param history_workers: 分片读取历史(numstat)的进程数，1 表示单次遍历，None 表示 CPU 核数
+    """
+    streaming = streaming or approx
+    if streaming and selection is None:
+        chart_data = compute_report_streaming(repo, HistorySelection(max_count=len(commits)), ref_index,
+                                              limits=LEGACY_CHART_LIMITS, approx=approx, history_workers=history_workers)
+    elif streaming:
+        chart_data = compute_report_streaming(repo, selection, ref_index, approx=approx, history_workers=history_workers)
+    else:
+        chart_data = compute_report(repo, commits, cache, ref_index, selection, history_workers)
+    if ownership_samples > 0:
+        chart_data += compute_ownership_charts(repo, cache, ownership_samples, blame_workers)
+    render_charts(chart_data, output_dir, prefix, workers, output_format=output_format, force=force_render,
+                  skip_messages=APPROX_SKIP_MESSAGES if approx else None)
@@ -0,0 +1,300 @@
+"""
+批量分析多个仓库
+用法: python batch.py manifest.json --output-root reports
+
+manifest.json 可以是仓库列表，也可以是 {"repos": [...]}，每一项形如:
+    {"name": "comtool", "url": "https://github.com/Neutree/COMTool.git"}
+    {"name": "local", "path": "/srv/mirrors/foo.git"}
+    "https://github.com/owner/repo.git"
+url 存在时先克隆(已存在则 fetch)到 path(默认 <workdir>/<name>.git)，只给 path 时直接分析本地仓库或裸镜像
+克隆模式 "mode" 可选 full / bare / mirror / partial(默认取 --clone-mode，旧写法 "mirror": true 等同 mirror)，
+"depth" 指定浅克隆深度；所有仓库的 clone/fetch 在同一个 asyncio 事件循环中并发执行
+每一项还可以指定提交选择 "revs": [...]、"since"、"until"、"limit"(默认 300，null 表示全部历史)，
+该仓库的提交表与所有图表都统计同一批提交；历史缓存默认只补齐选中的提交，
+"backfill": true(或命令行 --backfill)时改为补齐整个仓库的历史
+"""
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import multiprocessing
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import git
+import analyze
+from acquire import CLONE_MODES, acquire, default_path, origin_url
+from main import get_git_history
+from history_cache import HistoryCache
+from ref_index import build_ref_index
+from selection import HistorySelection, validate_selection
+from html_generator import generate_git_tree_html, generate_scalable_git_tree_html
+
+
+class RepoJob:
+    """一个仓库在流水线中的状态，各阶段依次填充 repo / commits / chart_data"""
+
+    def __init__(self, name, url=None, path=None, mode="mirror", selection=None, depth=None, backfill=False):
+        self.name = name
+        self.url = url
+        self.path = path
+        self.mode = mode
+        self.depth = depth
+        self.selection = selection or HistorySelection(max_count=300)
+        self.backfill = backfill
+        self.repo = None
+        self.cache = None
+        self.ref_index = None
+        self.commits = None
+        self.chart_data = None
+        self.output_dir = None
+        self.error = None
+        self.timings = {}
+
+    def release(self):
+        """关闭缓存连接并释放中间结果；仓库处理完成或某个阶段失败后调用，可重复调用"""
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        self.commits = None
+        self.chart_data = None
+
+
+def _default_name(entry):
+    source = (entry.get('url') or entry.get('path') or '').rstrip('/')
+    name = os.path.basename(source)
+    return name[:-4] if name.endswith('.git') else name
+
+
+def load_manifest(path, workdir="repos", output_root="reports", default_mode="mirror", backfill=False):
+    """
+    读取仓库清单，返回 RepoJob 列表
+    :param backfill: 清单中未指定 backfill 的仓库是否补齐整个历史的缓存
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data['repos'] if isinstance(data, dict) else data
+    jobs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'path': entry} if os.path.exists(entry) else {'url': entry}
+        name = entry.get('name') or _default_name(entry)
+        mode = entry.get('mode') or ('mirror' if entry.get('mirror') else default_mode)
+        if mode not in CLONE_MODES:
+            raise ValueError(f"{name}: 未知的克隆模式 {mode}")
+        repo_path = entry.get('path') or default_path(name, workdir, mode)
+        selection = HistorySelection(entry.get('revs'), entry.get('since'), entry.get('until'), entry.get('limit', 300))
+        job = RepoJob(name, entry.get('url'), repo_path, mode, selection, entry.get('depth'),
+                      entry.get('backfill', backfill))
+        job.output_dir = os.path.join(output_root, name)
+        jobs.append(job)
+    return jobs
+
+
+# ---------------------------------------------------------------------------
+# 各流水线阶段，一个函数处理一个仓库
+# ---------------------------------------------------------------------------
+
+async def fetch_job(job):
+    if job.url and not os.path.exists(job.path):
+        print(f"[{job.name}] Cloning {job.url} to {job.path} ({job.mode})...")
+    elif job.url and (origin := origin_url(job.path)):
+        print(f"[{job.name}] Fetching origin ({origin})...")
+    await acquire(job.url, job.path, job.mode, job.depth)
+    job.repo = git.Repo(job.path)
+
+
+def stage_history(job):
+    validate_selection(job.repo.git_dir, job.selection)
+    job.ref_index = build_ref_index(job.repo.git_dir)
+    job.cache = HistoryCache.open_for_repo(job.path)
+    if job.backfill:
+        added = job.cache.refresh(job.repo.git_dir, job.ref_index)
+    else:
+        selection = job.selection
+        added = job.cache.refresh_selection(job.repo.git_dir, selection.max_count, selection.rev_args(),
+                                            ref_index=job.ref_index)
+    print(f"[{job.name}] 历史缓存已更新: 新增 {added} 个提交")
+    job.commits = get_git_history(job.repo, cache=job.cache, ref_index=job.ref_index, selection=job.selection)
+
+
+def stage_analysis(job):
+    job.chart_data = analyze.compute_report(job.repo, job.commits, job.cache, job.ref_index, job.selection)
+
+
+def make_render_stage(executor, output_format="png"):
+    def stage_render(job):
+        analyze.render_charts(job.chart_data, job.output_dir, f"{job.name}_", executor=executor,
+                              output_format=output_format)
+        job.chart_data = None
+    return stage_render
+
+
+def make_html_stage(tree_mode):
+    generate = generate_scalable_git_tree_html if tree_mode == "scalable" else generate_git_tree_html
+    def stage_html(job):
+        generate(job.commits, job.url or job.path, output_path=os.path.join(job.output_dir, "git_tree.html"))
+        job.release()
+    return stage_html
+
+
+class Stage:
+    """流水线中的一个阶段：固定数量的工作线程从输入队列取任务，处理后交给下一阶段"""
+
+    def __init__(self, name, func, concurrency):
+        self.name = name
+        self.func = func
+        self.concurrency = max(1, concurrency)
+
+    def _worker(self, inbox, outbox):
+        while True:
+            job = inbox.get()
+            if job is None:
+                return
+            if job.error is None:
+                start = time.perf_counter()
+                try:
+                    self.func(job)
+                except Exception as e:
+                    job.error = f"{self.name}: {e!r}"
+                    print(f"[{job.name}] {self.name} 阶段失败: {e!r}")
+                    # 失败的仓库不再进入后续阶段的处理，立即关闭其缓存连接
+                    job.release()
+                job.timings[self.name] = time.perf_counter() - start
+            outbox.put(job)
+
+
+class FetchStage(Stage):
+    """
+    clone/fetch 阶段：只用一个线程，在其中的 asyncio 事件循环里并发获取所有仓库(最多 concurrency 个同时进行)，
+    每个仓库获取完成后立即交给下一阶段，不必等待其余仓库
+    """
+
+    def __init__(self, concurrency):
+        super().__init__("fetch", fetch_job, 1)
+        self.limit = max(1, concurrency)
+
+    def _worker(self, inbox, outbox):
+        jobs = []
+        while True:
+            job = inbox.get()
+            if job is None:
+                break
+            jobs.append(job)
+        asyncio.run(self._fetch_all(jobs, outbox))
+
+    async def _fetch_all(self, jobs, outbox):
+        semaphore = asyncio.Semaphore(self.limit)
+
+        async def run_one(job):
+            if job.error is None:
+                async with semaphore:
+                    start = time.perf_counter()
+                    try:
+                        await self.func(job)
+                    except Exception as e:
+                        job.error = f"{self.name}: {e!r}"
+                        print(f"[{job.name}] {self.name} 阶段失败: {e!r}")
+                    job.timings[self.name] = time.perf_counter() - start
+            outbox.put(job)
+
+        await asyncio.gather(*(run_one(job) for job in jobs))
+
+
+def run_pipeline(jobs, stages):
+    """
+    按阶段流水线处理所有仓库，不同仓库的 I/O 阶段与 CPU 阶段可以重叠执行
+    :return: 处理完成的 RepoJob 列表(顺序为完成顺序)
+    """
+    queues = [queue.Queue() for _ in range(len(stages) + 1)]
+    for job in jobs:
+        queues[0].put(job)
+
+    def close_stage(index, workers):
+        # 当前阶段的线程全部退出后，再给下一阶段发送结束信号
+        for t in workers:
+            t.join()
+        if index + 1 < len(stages):
+            for _ in range(stages[index + 1].concurrency):
+                queues[index + 1].put(None)
+
+    closers = []
+    for index, stage in enumerate(stages):
+        workers = [threading.Thread(target=stage._worker, args=(queues[index], queues[index + 1]), daemon=True)
+                   for _ in range(stage.concurrency)]
+        for t in workers:
+            t.start()
+        closer = threading.Thread(target=close_stage, args=(index, workers), daemon=True)
+        closer.start()
+        closers.append(closer)
+    for _ in range(stages[0].concurrency):
+        queues[0].put(None)
+    try:
+        for closer in closers:
+            closer.join()
+    finally:
+        # 流水线中途退出(例如 Ctrl+C)或阶段列表不含 html 时，仍关闭所有仓库的缓存连接
+        for job in jobs:
+            if job.cache is not None:
+                job.cache.close()
+                job.cache = None
+
+    done = []
+    while not queues[-1].empty():
+        done.append(queues[-1].get())
+    return done
+
+
+def write_summary(jobs, output_root):
+    summary = [{
+        "name": job.name,
+        "path": job.path,
+        "output_dir": job.output_dir,
+        "status": "failed" if job.error else "ok",
+        "error": job.error,
+        "timings": job.timings,
+    } for job in jobs]
+    os.makedirs(output_root, exist_ok=True)
+    path = os.path.join(output_root, "batch_summary.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="按清单批量分析多个仓库")
+    parser.add_argument("manifest", help="仓库清单 JSON 文件")
+    parser.add_argument("--output-root", default="reports", help="输出根目录，每个仓库一个子目录")
+    parser.add_argument("--workdir", default="repos", help="克隆仓库的存放目录")
+    parser.add_argument("--clone-mode", choices=CLONE_MODES, default="mirror",
+                        help="清单中未指定 mode 的仓库使用的克隆模式")
+    parser.add_argument("--fetch-jobs", type=int, default=8, help="同时进行 clone/fetch 的仓库数")
+    parser.add_argument("--history-jobs", type=int, default=4, help="同时提取提交历史的仓库数")
+    parser.add_argument("--analysis-jobs", type=int, default=2, help="同时计算图表数据的仓库数")
+    parser.add_argument("--render-workers", type=int, default=os.cpu_count() or 1, help="渲染统计图的进程数")
+    parser.add_argument("--html-jobs", type=int, default=2, help="同时生成 git 树页面的仓库数")
+    parser.add_argument("--tree-mode", choices=["single", "scalable"], default="single",
+                        help="git 树页面模式，大仓库建议使用 scalable")
+    parser.add_argument("--format", choices=list(analyze.OUTPUT_FORMATS), default="png",
+                        help="统计图输出格式，数据未变化的图表不会重新渲染")
+    parser.add_argument("--backfill", action="store_true",
+                        help="补齐整个仓库历史的缓存，而不只是选中的提交(清单中的 backfill 优先)")
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest, args.workdir, args.output_root, args.clone_mode, args.backfill)
+    # 流水线线程与 fetch 阶段的事件循环运行时 fork 渲染进程可能继承被占用的锁而死锁，改用 spawn 启动
+    render_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.render_workers, mp_context=render_context) as render_pool:
+        stages = [
+            FetchStage(args.fetch_jobs),
+            Stage("history", stage_history, args.history_jobs),
+            Stage("analysis", stage_analysis, args.analysis_jobs),
+            # 渲染阶段的线程只负责提交任务，真正的并行度由共享进程池决定
+            Stage("render", make_render_stage(render_pool, args.format), max(1, args.analysis_jobs)),
+            Stage("html", make_html_stage(args.tree_mode), args.html_jobs),
+        ]
+        finished = run_pipeline(jobs, stages)
+    failed = [job for job in finished if job.error]
+    print(f"批量分析完成: 成功 {len(finished) - len(failed)} 个，失败 {len(failed)} 个")
+    print(f"汇总: {write_summary(finished, args.output_root)}")
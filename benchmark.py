@@ -0,0 +1,345 @@
+"""
+合成仓库基准测试
+用法: python benchmark.py --commits 1000 10000 --branch-rate 0.05 --merge-rate 0.3 --files 300 --tags 20 --authors 30 -o bench.json
+      python benchmark.py --startup
+
+
+每个规模先用 `git fast-import` 在本地生成一个确定性的合成仓库(不访问网络)，
+再按 main.py 的流程逐阶段计时，记录墙钟时间与峰值内存，结果写成 JSON，便于在不同版本之间对比；
+--startup 只检查命令行的启动耗时，超出预算时以非零状态退出，用于防止启动变慢；不导入较重模块的约束由 tests/test_main.py 检查
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime
+from importlib import metadata
+import git
+import numpy
+import analyze
+from main import get_git_history
+from history_cache import HistoryCache, cache_path_for
+from numstat import load_numstat
+from ref_index import build_ref_index
+from html_generator import generate_git_tree_html, generate_scalable_git_tree_html
+from gitcmd import run_git
+from profiling import reset_peak_rss, peak_rss_mb
+
+FIRST_NAMES = ["张三", "李四", "王五", "赵六", "Alice", "Bob", "Carol", "Dave", "Eve", "Mallory"]
+MESSAGES = [
+    "fix: 修复 {area} 的空指针问题",
+    "feat: 新增 {area} 配置项",
+    "修复 {area} 串口断开后无法重连",
+    "优化 {area} 性能",
+    "docs: update {area} readme",
+    "refactor {area} module",
+    "add test for {area}",
+    "update {area}",
+    "bugfix in {area}",
+    "release {area}",
+]
+AREAS = ["serial", "ui", "plugin", "protocol", "i18n", "build", "config", "log"]
+EXTENSIONS = [".py", ".py", ".py", ".c", ".h", ".js", ".md", ".txt", ".json", ".ui"]
+
+
+class SyntheticRepoSpec:
+    """合成仓库的规模参数，相同参数与随机种子总是生成完全相同的仓库"""
+
+    def __init__(self, commits=1000, branch_rate=0.05, merge_rate=0.3, files=200, tags=10, authors=20, seed=0):
+        self.commits = commits
+        self.branch_rate = branch_rate
+        self.merge_rate = merge_rate
+        self.files = files
+        self.tags = tags
+        self.authors = authors
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+def _file_content(rnd):
+    lines = [f"line {rnd.randrange(200)}" for _ in range(rnd.randint(3, 40))]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _data(payload):
+    return b"data %d\n" % len(payload) + payload + b"\n"
+
+
+def _iter_fast_import(spec):
+    """
+    产出 fast-import 命令流
+    - 主线为 refs/heads/main，每个提交以 branch_rate 的概率从当前提交分出一个 topic 分支
+    - 每个提交以 merge_rate 的概率把一个未合并的 topic 分支合并回主线(产生合并提交)
+    - 其余提交随机落在主线或某个 topic 分支上，修改 1~3 个文件
+    - 最后在主线上均匀打 tags 个附注标签
+    """
+    rnd = random.Random(spec.seed)
+    authors = [(f"{FIRST_NAMES[k % len(FIRST_NAMES)]}{k // len(FIRST_NAMES) or ''}", f"dev{k}@example.com")
+               for k in range(max(1, spec.authors))]
+    paths = [f"src/mod{k % 17}/file{k}{EXTENSIONS[k % len(EXTENSIONS)]}" for k in range(max(1, spec.files))]
+    branches = {"main": None}  # 分支名 -> 最新提交的 mark
+    main_marks = []
+    timestamp = 1500000000
+
+    for mark in range(1, spec.commits + 1):
+        timestamp += rnd.randint(60, 6 * 3600)
+        name, email = authors[rnd.randrange(len(authors))]
+        topics = [b for b in branches if b != "main"]
+        merge_from = None
+        if topics and rnd.random() < spec.merge_rate:
+            branch, merge_from = "main", topics[rnd.randrange(len(topics))]
+            message = f"Merge branch '{merge_from}'"
+        else:
+            branch = "main" if not topics or rnd.random() < 0.5 else topics[rnd.randrange(len(topics))]
+            message = MESSAGES[rnd.randrange(len(MESSAGES))].format(area=AREAS[rnd.randrange(len(AREAS))])
+        out = [b"commit refs/heads/%s\n" % branch.encode(), b"mark :%d\n" % mark]
+        ident = f"{name} <{email}> {timestamp} +0800\n".encode("utf-8")
+        out += [b"author " + ident, b"committer " + ident, _data(message.encode("utf-8"))]
+        if branches[branch] is not None:
+            out.append(b"from :%d\n" % branches[branch])
+        if merge_from is not None:
+            out.append(b"merge :%d\n" % branches.pop(merge_from))
+        for _ in range(rnd.randint(1, 3)):
+            out.append(b"M 100644 inline %s\n" % paths[rnd.randrange(len(paths))].encode())
+            out.append(_data(_file_content(rnd)))
+        yield b"".join(out)
+        branches[branch] = mark
+        if branch == "main":
+            main_marks.append(mark)
+        if rnd.random() < spec.branch_rate:
+            branches[f"topic-{mark}"] = mark
+
+    for k in range(min(spec.tags, len(main_marks))):
+        mark = main_marks[(k + 1) * len(main_marks) // (spec.tags + 1)]
+        tagger = f"{authors[0][0]} <{authors[0][1]}> {timestamp} +0800\n".encode("utf-8")
+        yield b"tag v0.%d\nfrom :%d\ntagger " % (k + 1, mark) + tagger + _data(b"release")
+
+
+def make_synthetic_repo(path, spec):
+    """
+    用 git fast-import 生成合成仓库
+    :param path: 仓库目录，已存在时先删除
+    :param spec: SyntheticRepoSpec
+    """
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    subprocess.run(["git", "init", "-q", path], check=True)
+    run_git(path, "symbolic-ref", "HEAD", "refs/heads/main")
+    proc = subprocess.Popen(["git", "-C", path, "fast-import", "--quiet"], stdin=subprocess.PIPE)
+    for block in _iter_fast_import(spec):
+        proc.stdin.write(block)
+    proc.stdin.close()
+    if proc.wait() != 0:
+        raise RuntimeError(f"git fast-import 失败: {path}")
+    return git.Repo(path)
+
+
+# ---------------------------------------------------------------------------
+# 计时与内存
+# ---------------------------------------------------------------------------
+
+class StageTimer:
+    """逐阶段记录墙钟时间与峰值 RSS，阶段内的 print 输出被屏蔽"""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        per_stage = reset_peak_rss()
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+        elapsed = time.perf_counter() - start
+        entry = self.stages.setdefault(name, {"wall_seconds": [], "peak_rss_mb": 0.0, "per_stage_rss": per_stage})
+        entry["wall_seconds"].append(round(elapsed, 6))
+        entry["peak_rss_mb"] = round(max(entry["peak_rss_mb"], peak_rss_mb()), 1)
+
+
+def run_pipeline_once(repo, output_dir, timer, workers=1, limit=None, history_workers=None):
+    """
+    按 main.py 的流程执行一遍，每个阶段单独计时
+    :param limit: 读取的提交数，None 表示整个历史
+    :param history_workers: *_sharded 阶段分片读取历史的进程数，None 表示 CPU 核数
+    """
+    cache_path = cache_path_for(repo.working_tree_dir)
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    limit = limit or int(run_git(repo.git_dir, "rev-list", "--all", "--count"))
+    with timer.stage("ref_index"):
+        ref_index = build_ref_index(repo.git_dir)
+    with timer.stage("history_cache_refresh"):
+        cache = HistoryCache(cache_path)
+        cache.refresh(repo.git_dir, ref_index)
+    with timer.stage("get_git_history"):
+        commits = get_git_history(repo, limit, cache=cache, ref_index=ref_index)
+    with timer.stage("get_git_history_catfile"):
+        get_git_history(repo, limit, ref_index=ref_index, backend="catfile")
+    with timer.stage("get_git_history_catfile_sharded"):
+        get_git_history(repo, limit, ref_index=ref_index, backend="catfile", workers=history_workers)
+    with timer.stage("get_git_history_gitpython"):
+        get_git_history(repo, limit, ref_index=ref_index, backend="gitpython")
+    with timer.stage("load_numstat"):
+        load_numstat(repo.git_dir, max_count=limit)
+    with timer.stage("load_numstat_sharded"):
+        load_numstat(repo.git_dir, max_count=limit, workers=history_workers)
+    with timer.stage("compute_report"):
+        chart_data = analyze.compute_report(repo, commits, cache, ref_index)
+    with timer.stage("render_charts"):
+        analyze.render_charts(chart_data, output_dir, "bench_", workers)
+    with timer.stage("generate_git_tree_html"):
+        generate_git_tree_html(commits, repo.working_tree_dir, os.path.join(output_dir, "git_tree.html"))
+    with timer.stage("generate_scalable_git_tree_html"):
+        generate_scalable_git_tree_html(commits, repo.working_tree_dir, os.path.join(output_dir, "git_tree_scalable.html"))
+    cache.close()
+    return len(commits)
+
+
+def _summarize(stages):
+    for entry in stages.values():
+        walls = sorted(entry["wall_seconds"])
+        entry["best_seconds"] = walls[0]
+        entry["median_seconds"] = walls[len(walls) // 2]
+    return stages
+
+
+def environment_info():
+    """记录被测版本与运行环境，方便跨版本比较"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        revision = run_git(here, "describe", "--always", "--dirty").decode().strip()
+    except (subprocess.CalledProcessError, OSError):
+        revision = None
+    return {
+        "analyzer_revision": revision,
+        "git": run_git(here, "--version").decode().strip(),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "matplotlib": metadata.version("matplotlib"),
+        "gitpython": git.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmark(specs, workdir, repeat=1, workers=1, limit=None, keep=False, history_workers=None):
+    results = []
+    for spec in specs:
+        repo_path = os.path.join(workdir, f"synthetic_{spec.commits}")
+        start = time.perf_counter()
+        repo = make_synthetic_repo(repo_path, spec)
+        generate_seconds = time.perf_counter() - start
+        timer = StageTimer()
+        commit_count = 0
+        for _ in range(repeat):
+            commit_count = run_pipeline_once(repo, os.path.join(workdir, f"reports_{spec.commits}"), timer, workers, limit,
+                                             history_workers)
+        results.append({
+            "spec": spec.to_dict(),
+            "repo": {
+                "commits_analyzed": commit_count,
+                "refs": len(build_ref_index(repo.git_dir).tips),
+                "generate_seconds": round(generate_seconds, 3),
+            },
+            "stages": _summarize(timer.stages),
+        })
+        print(f"[{spec.commits} commits] " + ", ".join(
+            f"{name} {entry['best_seconds']:.3f}s" for name, entry in timer.stages.items()), file=sys.stderr)
+        repo.close()
+        if not keep:
+            shutil.rmtree(repo_path, ignore_errors=True)
+            shutil.rmtree(os.path.join(workdir, f"reports_{spec.commits}"), ignore_errors=True)
+            if os.path.exists(cache_path_for(repo_path)):
+                os.remove(cache_path_for(repo_path))
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment_info(),
+        "settings": {"repeat": repeat, "workers": workers, "limit": limit, "history_workers": history_workers},
+        "results": results,
+    }
+
+
+# ---------------------------------------------------------------------------
+# 启动耗时
+# ---------------------------------------------------------------------------
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (名称, 命令行参数, 扣除解释器自身启动后的耗时预算(秒))
+STARTUP_CHECKS = [
+    ("import main", ["-c", "import main"], 0.15),
+    ("main.py --help", ["main.py", "--help"], 0.2),
+    ("main.py history --help", ["main.py", "history", "--help"], 0.2),
+    ("main.py tree --help", ["main.py", "tree", "--help"], 0.2),
+    ("import analyze", ["-c", "import analyze"], 0.4),
+]
+
+
+def _run_python(argv):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + argv, cwd=HERE, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def check_startup(repeat=5):
+    """
+    逐项测量启动耗时，取 repeat 次中的最小值并扣除空解释器的启动时间
+    :return: [{name, seconds, budget_seconds, ok}, ...]
+    """
+    baseline = min(_run_python(["-c", "pass"]) for _ in range(repeat))
+    results = []
+    for name, argv, budget in STARTUP_CHECKS:
+        seconds = min(_run_python(argv) for _ in range(repeat)) - baseline
+        results.append({"name": name, "seconds": round(seconds, 4), "budget_seconds": budget, "ok": seconds <= budget})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="用合成仓库测量分析流程各阶段的耗时与内存")
+    parser.add_argument("--commits", type=int, nargs="+", default=[1000, 5000], help="要测试的提交数，可给多个")
+    parser.add_argument("--branch-rate", type=float, default=0.05, help="每个提交分出新 topic 分支的概率")
+    parser.add_argument("--merge-rate", type=float, default=0.3, help="每个提交合并一个 topic 分支的概率")
+    parser.add_argument("--files", type=int, default=200, help="仓库中的文件数")
+    parser.add_argument("--tags", type=int, default=10, help="标签数")
+    parser.add_argument("--authors", type=int, default=20, help="作者数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--limit", type=int, default=None, help="读取的提交数，默认整个历史")
+    parser.add_argument("--repeat", type=int, default=1, help="每个规模重复运行的次数")
+    parser.add_argument("--workers", type=int, default=1, help="渲染统计图的进程数")
+    parser.add_argument("--history-workers", type=int, default=None, help="*_sharded 阶段分片读取历史的进程数，默认为 CPU 核数")
+    parser.add_argument("--workdir", default=None, help="合成仓库与报告的存放目录，默认使用临时目录")
+    parser.add_argument("--keep", action="store_true", help="保留生成的仓库与报告")
+    parser.add_argument("-o", "--output", default=None, help="结果 JSON 路径，默认输出到标准输出")
+    parser.add_argument("--startup", action="store_true", help="只检查命令行启动耗时，超出预算时返回非零状态")
+    args = parser.parse_args()
+
+    if args.startup:
+        checks = check_startup(max(args.repeat, 5))
+        for check in checks:
+            print(f"{'ok  ' if check['ok'] else 'FAIL'} {check['name']}: {check['seconds']:.3f}s "
+                  f"(预算 {check['budget_seconds']}s)", file=sys.stderr)
+        sys.exit(0 if all(check["ok"] for check in checks) else 1)
+
+    specs = [SyntheticRepoSpec(n, args.branch_rate, args.merge_rate, args.files, args.tags, args.authors, args.seed)
+             for n in args.commits]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="analyzer-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    report = run_benchmark(specs, workdir, args.repeat, args.workers, args.limit, args.keep, args.history_workers)
+    if not args.keep and args.workdir is None:
+        shutil.rmtree(workdir, ignore_errors=True)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"基准测试结果: {os.path.abspath(args.output)}", file=sys.stderr)
+    else:
+        print(text)
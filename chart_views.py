@@ -0,0 +1,123 @@
+"""
+图表数据 -> Chart.js 配置
+把 analyze 计算出的图表数据转换为浏览器端 Chart.js 可直接使用的配置，报告服务的 /api/charts 与 --format json 的输出共用
+"""
+from datetime import datetime
+import numpy as np
+
+# 折线图最多发送给浏览器的点数，超过时按固定间隔抽样
+MAX_POINTS = 2000
+WEEKDAY_LABELS = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+def _thin(labels, *series):
+    step = max(1, -(-len(labels) // MAX_POINTS))
+    if step == 1:
+        return (list(labels), *(list(s) for s in series))
+    return (list(labels[::step]), *(list(s[::step]) for s in series))
+
+
+def _dates(values):
+    return [v.strftime('%Y-%m-%d %H:%M') if isinstance(v, datetime) else str(v).replace('T', ' ') for v in values]
+
+
+def _chart(kind, title, labels, datasets, **options):
+    return {'title': title, 'type': kind,
+            'data': {'labels': list(labels), 'datasets': datasets}, 'options': options}
+
+
+def _bar(title, labels, values, label, horizontal=False):
+    options = {'indexAxis': 'y'} if horizontal else {}
+    return _chart('bar', title, labels, [{'label': label, 'data': list(values)}], **options)
+
+
+def _pie(title, labels, values):
+    return _chart('pie', title, labels, [{'data': list(values)}])
+
+
+def _histogram(title, values, weights, label, bins=15):
+    counts, edges = np.histogram(values, bins=bins, weights=weights)
+    labels = [f"{edges[i]:.0f}-{edges[i + 1]:.0f}" for i in range(len(counts))]
+    return _bar(title, labels, counts.tolist(), label)
+
+
+def _items(data):
+    labels, values = zip(*data['items']) if data['items'] else ([], [])
+    return labels, values
+
+
+def _view_branches(data):
+    values = data['lifetimes'] + data['latencies']
+    edges = np.histogram_bin_edges(values, bins=20)
+    labels = [f"{edges[i]:.1f}-{edges[i + 1]:.1f}" for i in range(len(edges) - 1)]
+    return _chart('bar', f"分支统计：已合并 {data['merged']} 个，未合并 {data['open']} 个 (天)", labels, [
+        {'label': '分支存活时间', 'data': np.histogram(data['lifetimes'], edges)[0].tolist()},
+        {'label': '合并耗时 (分叉点到合并)', 'data': np.histogram(data['latencies'], edges)[0].tolist()},
+    ])
+
+
+def _view_ahead_behind(data):
+    names, ahead, behind = zip(*data['items'])
+    return _chart('bar', f"各分支相对 {data['base']} 的领先/落后提交数", names, [
+        {'label': 'ahead (领先)', 'data': list(ahead)},
+        {'label': 'behind (落后)', 'data': [-b for b in behind]},
+    ], indexAxis='y')
+
+
+def _view_ownership_trend(data):
+    datasets = [{'label': label, 'data': values, 'fill': True} for label, values in zip(data['labels'], data['series'])]
+    return _chart('line', '各作者存活代码行数随时间的变化', _dates(data['dates']), datasets,
+                  scales={'y': {'stacked': True}})
+
+
+VIEWS = {
+    'authors': lambda d: _bar('前 10 名作者提交数统计', d['names'], d['counts'], '提交数', horizontal=True),
+    'monthly': lambda d: _bar('每月提交活跃度', *_items(d), '提交数'),
+    'keywords': lambda d: _pie('提交信息关键词分布', d['labels'], d['values']),
+    'dow': lambda d: _bar('一周中每天的提交活跃度', WEEKDAY_LABELS, d['values'], '提交数'),
+    'hourly': lambda d: _bar('一天中每小时的提交活跃度', [f'{h:02d}' for h in range(24)], d['values'], '提交数'),
+    'msg_lengths': lambda d: _histogram('提交信息长度分布', d['lengths'], d.get('weights'), '提交数', bins=20),
+    'growth': lambda d: _chart('line', '提交总数累计增长', *(lambda x, y: (_dates(x), [{'label': '累计提交数', 'data': y}]))(
+        *_thin(d['dates'], np.asarray(d['counts']).tolist()))),
+    'hotspots': lambda d: _bar('最常被修改的前 10 个目录', *_items(d), '修改频率'),
+    'merges': lambda d: _bar('每月合并 (PR 完成) 活动统计', *_items(d), '合并次数'),
+    'merge_ratio': lambda d: _pie('合并提交与普通提交占比', ['合并提交 (Merge)', '普通提交 (Normal)'], d['values']),
+    'file_types': lambda d: _bar('最常修改的文件类型 (前 10)', *_items(d), '修改次数'),
+    'weekly': lambda d: _chart('line', '每周提交速度', *(lambda x, y: (x, [{'label': '提交数', 'data': y}]))(*_thin(*_items(d)))),
+    'loc': lambda d: _chart('line', '代码行数 (LOC) 演变', *(lambda x, y: (_dates(x), [{'label': '累计净增行数', 'data': y}]))(
+        *_thin(d['dates'], d['values']))),
+    'releases': lambda d: _chart('line', '版本发布时间线', [f"{n} ({t:%Y-%m-%d})" for n, t in zip(d['names'], d['dates'])],
+                                 [{'label': '累计发布数', 'data': list(range(1, len(d['names']) + 1))}]),
+    'ins_del_trend': lambda d: _chart('line', '每次提交的代码新增/删除行数', *(lambda x, i, r: (_dates(x), [
+        {'label': '新增行数', 'data': i}, {'label': '删除行数', 'data': r}]))(*_thin(d['dates'], d['insertions'], d['deletions']))),
+    'cn_keywords': lambda d: _pie('中文提交关键词分布', d['labels'], d['values']),
+    'commit_types': lambda d: _bar('提交类型分布 (Conventional Commits)', *_items(d), '提交次数'),
+    'author_ratio': lambda d: _pie('项目核心贡献者提交量占比分析', *_items(d)),
+    'modify_file_count': lambda d: _histogram('单次提交-改动文件数量分布情况', d['counts'], d.get('weights'), '提交数'),
+    'branches': _view_branches,
+    'ahead_behind': _view_ahead_behind,
+    'ownership': lambda d: _bar('当前版本中各作者存活的代码行数 (git blame)', *_items(d), '代码行数', horizontal=True),
+    'ownership_trend': _view_ownership_trend,
+}
+
+
+def chart_view(name, data):
+    """把 analyze 计算出的图表数据转换为可直接交给 Chart.js 的配置，数据为 None 时返回 None"""
+    if data is None:
+        return None
+    view = VIEWS[name](data)
+    if data.get('approx'):
+        # 近似统计的误差范围作为副标题
+        view['options'].setdefault('plugins', {})['subtitle'] = {'display': True, 'text': data['approx']}
+    return view
+
+
+def json_default(value):
+    # json.dumps 的 default：numpy 标量/数组与 datetime
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
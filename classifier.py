@@ -0,0 +1,326 @@
+"""
+提交信息分类
+每个规则集由若干条有序规则组成，一条提交信息归入第一条命中的规则(与原先 if/elif 的优先级相同)，都不命中时归入默认类别
+- 所有提交信息以换行拼接为一个 UTF-8 缓冲区(开头另加一个换行)，每个关键词、每个正则在整个缓冲区上只扫描一遍；
+  命中位置通过二分映射回提交下标，再按优先级从低到高覆盖，没有逐条提交的 Python 循环
+- 正则的匹配跨过换行(例如 fix.*\\n.*feat、\\s)时会连到相邻的提交信息，这样的匹配作废，
+  它覆盖的几条提交信息各自在自己的范围内重新查找；关键词不含换行，不会跨越
+- 关键词单独扫描而不合并成一个 a|b|c 的正则：re 对纯字面量有快速查找，合并后每个位置都要尝试各个分支，反而更慢
+- 以 ^ 开头的正则(例如 Conventional Commits 的 type 前缀)改写为以换行开头，同样可以利用字面量查找，
+  不必在每个位置尝试 MULTILINE 下的 ^；各个 type 也分别扫描，原因同上
+- 忽略大小写的规则在 ASCII 小写化后的缓冲区上匹配(与 str.lower() 只在极少数非 ASCII 字符上有差异)
+- 结果按提交 sha 缓存在规则集对象上，同一进程中再次分类(例如报告服务切换提交范围)只处理新出现的提交
+- 规则集可以从 JSON 文件加载，格式见 load_rulesets
+"""
+import re
+import json
+import threading
+from itertools import chain
+import numpy as np
+
+_SEPARATOR = b'\n'
+
+
+def _sha_keys(shas):
+    # sha 前 16 位十六进制数作为 uint64 排序键，比直接对 S40 排序/二分快得多
+    raw = np.frombuffer(bytes.fromhex(shas.tobytes().decode('ascii')), dtype=np.uint8).reshape(-1, 20)
+    return np.ascontiguousarray(raw[:, :8]).view('>u8').ravel().astype(np.uint64)
+
+
+def _empty_cache():
+    # (sha 键, sha, 类别下标)，按 sha 键排序
+    return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype='S40'), np.zeros(0, dtype=np.int32)
+
+
+class Rule:
+    """
+    :param label: 类别名
+    :param keywords: 子串关键词
+    :param patterns: 正则表达式(作用于单条提交信息的 UTF-8 字节)，以 ^ 开头时整个正则锚定在提交信息开头，
+                     $ 匹配提交信息结尾；\\A、\\Z 与向后的环视作用于整个缓冲区，不要使用
+    :param ignore_case: 是否忽略 ASCII 大小写
+    """
+
+    def __init__(self, label, keywords=(), patterns=(), ignore_case=False):
+        if not keywords and not patterns:
+            raise ValueError(f"规则 {label} 没有任何关键词或正则")
+        if any('\n' in keyword for keyword in keywords):
+            raise ValueError(f"规则 {label} 的关键词不能包含换行")
+        self.label = label
+        self.keywords = list(keywords)
+        self.patterns = list(patterns)
+        self.ignore_case = ignore_case
+
+    def scans(self):
+        """
+        :return: [(正则字节串, flags, 是否为关键词), ...]，每一项在缓冲区上单独扫描；开头的 ^ 改写为换行
+        """
+        result = []
+        for keyword in self.keywords:
+            keyword = keyword.encode('utf-8')
+            result.append((re.escape(keyword.lower() if self.ignore_case else keyword), 0, True))
+        for pattern in self.patterns:
+            pattern = pattern.encode('utf-8')
+            # 缓冲区已小写化，正则中没有大写字母时不需要 IGNORECASE(有 [A-Z]、\S 等时仍需要)
+            flags = re.MULTILINE | (re.IGNORECASE if self.ignore_case and pattern != pattern.lower() else 0)
+            if pattern.startswith(b'^'):
+                pattern = _SEPARATOR + pattern[1:]
+            result.append((pattern, flags, False))
+        return result
+
+    def to_dict(self):
+        result = {'label': self.label}
+        if self.keywords:
+            result['keywords'] = self.keywords
+        if self.patterns:
+            result['patterns'] = self.patterns
+        if self.ignore_case:
+            result['ignore_case'] = True
+        return result
+
+
+class Ruleset:
+    """
+    :param rules: 按优先级排列的 Rule
+    :param default: 都不命中时的类别
+    labels 为各规则的类别(去重，保持首次出现的顺序)加上默认类别，分类结果为 labels 中的下标
+    """
+
+    def __init__(self, rules, default='其他'):
+        self.rules = list(rules)
+        self.default = default
+        self.labels = list(dict.fromkeys(rule.label for rule in self.rules))
+        if default not in self.labels:
+            self.labels.append(default)
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        self._rule_labels = [label_index[rule.label] for rule in self.rules]
+        # 按优先级排列的扫描：(编译后的正则, 是否在小写缓冲区上匹配, 类别下标, 是否为关键词, 是否锚定在换行上)
+        self._scans = [(re.compile(pattern, flags), rule.ignore_case, label, literal, pattern.startswith(_SEPARATOR))
+                       for rule, label in zip(self.rules, self._rule_labels)
+                       for pattern, flags, literal in rule.scans()]
+        self._lower = any(rule.ignore_case for rule in self.rules)
+        self._lock = threading.Lock()
+        self._cache = _empty_cache()
+
+    def __getstate__(self):
+        # 锁与 sha 缓存不随对象传给其他进程
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_cache'] = _empty_cache()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        由 to_dict / JSON 文件的格式构建，格式有误时抛出 ValueError，说明是第几条规则
+        """
+        if not isinstance(data, dict) or not isinstance(data.get('rules'), list):
+            raise ValueError("规则集需要是带有 rules 列表的对象")
+        if not isinstance(data.get('default', ''), str):
+            raise ValueError("规则集的 default 需要是字符串")
+        return cls([_rule_from_dict(i, r) for i, r in enumerate(data['rules'])], data.get('default', '其他'))
+
+    def to_dict(self):
+        return {'default': self.default, 'rules': [rule.to_dict() for rule in self.rules]}
+
+    def classify(self, messages):
+        """
+        批量分类，messages 为提交信息首行的列表
+        :return: 与 messages 等长的类别下标数组(int32)
+        """
+        n = len(messages)
+        result = np.full(n, self.labels.index(self.default), dtype=np.int32)
+        if not n:
+            return result
+        buffer = '\n'.join(chain(('',), messages)).encode('utf-8')
+        # starts[i] 为第 i 条提交信息在缓冲区中的起点，其前一个字节是换行
+        starts = np.flatnonzero(np.frombuffer(buffer, dtype=np.uint8) == _SEPARATOR[0]) + 1
+        if len(starts) != n:
+            # 提交信息本身含有换行时，按每条的字节长度计算起点
+            lengths = np.fromiter((len(m.encode('utf-8')) + 1 for m in messages), dtype=np.int64, count=n)
+            starts = np.cumsum(lengths) - lengths + 1
+        # ends[i] 为第 i 条提交信息的终点(下一条之前的换行)
+        ends = np.append(starts[1:] - 1, len(buffer))
+        lowered = buffer.lower() if self._lower else buffer
+        # 从优先级最低的扫描开始覆盖，最后留下的是优先级最高的命中
+        for compiled, ignore_case, label, literal, anchored in reversed(self._scans):
+            target = lowered if ignore_case else buffer
+            if literal:
+                positions = np.fromiter(map(re.Match.start, compiled.finditer(target)), dtype=np.int64)
+                rows = np.searchsorted(starts, positions, side='right') - 1
+            else:
+                rows = _pattern_rows(compiled, anchored, target, starts, ends)
+            if len(rows):
+                result[rows] = label
+        return result
+
+    def classify_cached(self, shas, messages):
+        """
+        带 sha 缓存的 classify
+        :param shas: S40 sha 数组，与 messages 一一对应
+        """
+        shas = np.asarray(shas, dtype='S40')
+        keys = _sha_keys(shas)
+        result = np.empty(len(shas), dtype=np.int32)
+        with self._lock:
+            cached_keys, cached_shas, cached_labels = self._cache
+        hit = np.zeros(len(shas), dtype=bool)
+        if len(cached_keys) and len(shas):
+            # 先把待查的键排序再二分，访存连续，比乱序二分快数倍
+            order = np.argsort(keys)
+            pos = np.empty(len(keys), dtype=np.int64)
+            pos[order] = np.searchsorted(cached_keys, keys[order])
+            pos = np.clip(pos, 0, len(cached_keys) - 1)
+            # 前缀相同但 sha 不同的提交按未命中处理
+            hit = (cached_keys[pos] == keys) & (cached_shas[pos] == shas)
+            result[hit] = cached_labels[pos[hit]]
+        missing = np.flatnonzero(~hit)
+        if len(missing):
+            labels = self.classify([messages[i] for i in missing.tolist()])
+            result[missing] = labels
+            with self._lock:
+                merged_keys, merged_shas, merged_labels = (
+                    np.concatenate([old, new]) for old, new in zip(self._cache, (keys[missing], shas[missing], labels)))
+                keep = np.unique(merged_keys, return_index=True)[1]
+                self._cache = (merged_keys[keep], merged_shas[keep], merged_labels[keep])
+        return result
+
+    def classify_commits(self, commits):
+        """对 CommitTable 分类，结果按 sha 缓存"""
+        return self.classify_cached(commits.shas, commits.messages)
+
+    def counts(self, label_ids):
+        """各类别的数量，顺序与 labels 一致"""
+        return np.bincount(label_ids, minlength=len(self.labels)).tolist()
+
+
+class ClassifyCollector:
+    """流式计算时的聚合器：提交信息攒够 batch 条后批量分类，内存只与 batch 有关，result() 为各类别的数量(顺序与 labels 一致)"""
+
+    def __init__(self, ruleset, batch=65536):
+        self.ruleset = ruleset
+        self.batch = batch
+        self.messages = []
+        self.counts = np.zeros(len(ruleset.labels), dtype=np.int64)
+
+    def update(self, commit):
+        self.messages.append(commit.message)
+        if len(self.messages) >= self.batch:
+            self._flush()
+
+    def _flush(self):
+        if self.messages:
+            self.counts += np.bincount(self.ruleset.classify(self.messages), minlength=len(self.counts))
+            self.messages = []
+
+    def result(self):
+        self._flush()
+        return self.counts.tolist()
+
+
+def _rule_from_dict(index, data):
+    name = f"第 {index + 1} 条规则"
+    if not isinstance(data, dict):
+        raise ValueError(f"{name}需要是对象")
+    label = data.get('label')
+    if not isinstance(label, str):
+        raise ValueError(f"{name}缺少 label")
+    name = f"{name} ({label})"
+    keywords, patterns = data.get('keywords', []), data.get('patterns', [])
+    for key, values in (('keywords', keywords), ('patterns', patterns)):
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"{name} 的 {key} 需要是字符串列表")
+    for pattern in patterns:
+        try:
+            re.compile(pattern.encode('utf-8'))
+        except re.error as e:
+            raise ValueError(f"{name} 的正则 {pattern!r} 无效: {e}") from None
+    try:
+        return Rule(label, keywords, patterns, bool(data.get('ignore_case', False)))
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}") from None
+
+
+def _pattern_rows(compiled, anchored, target, starts, ends):
+    """
+    正则在缓冲区上的命中映射为提交下标，只保留完全落在一条提交信息之内的匹配
+    锚定的正则从提交信息前的换行开始匹配，按 起点 + 1 映射回提交
+    """
+    spans = np.fromiter(chain.from_iterable(map(re.Match.span, compiled.finditer(target))), dtype=np.int64)
+    begins, stops = spans[0::2], spans[1::2]
+    rows = np.searchsorted(starts, begins + anchored, side='right') - 1
+    inside = (rows >= 0) & (stops <= ends[rows])
+    if inside.all():
+        return rows
+    # 跨越换行的匹配作废；它覆盖的提交信息中可能另有完整的匹配(被这次匹配吞掉了)，逐条重新查找
+    matched = set(rows[inside].tolist())
+    # 最后一条被吞掉的提交信息：非锚定的匹配吞掉了 stop 之前的字符，锚定的匹配还吞掉了下一条提交信息前的换行
+    lasts = np.searchsorted(starts, stops[~inside] - 1 + anchored, side='right') - 1
+    retry = set()
+    for first, last in zip(np.maximum(rows[~inside], 0).tolist(), lasts.tolist()):
+        retry.update(range(first, last + 1))
+    found = [row for row in sorted(retry - matched)
+             if compiled.search(target, starts[row] - anchored, ends[row]) is not None]
+    return np.concatenate([rows[inside], np.array(found, dtype=np.int64)])
+
+
+def _conventional(kind, label):
+    # Conventional Commits: type(scope)!: description，type 不区分大小写
+    return Rule(label, patterns=[rf'^{kind}(?:\([^)\n]*\))?!?: '], ignore_case=True)
+
+
+KEYWORDS = Ruleset([
+    Rule('新增 (add)', ['add'], ignore_case=True),
+    Rule('更新 (update)', ['update'], ignore_case=True),
+    Rule('修复 (fix)', ['fix'], ignore_case=True),
+], default='其他')
+
+CN_KEYWORDS = Ruleset([
+    Rule('新增/添加', ['新增', '添加']),
+    Rule('修改/更新', ['修改', '更新']),
+    Rule('修复/修补/Bug', ['修复', '修补', 'bug', 'Bug']),
+    Rule('优化/重构', ['优化', '重构', '调整']),
+], default='其他提交')
+
+COMMIT_TYPES = Ruleset([
+    _conventional('feat', 'feat (新功能)'),
+    _conventional('fix', 'fix (修复)'),
+    _conventional('docs', 'docs (文档)'),
+    _conventional('style', 'style (格式)'),
+    _conventional('refactor', 'refactor (重构)'),
+    _conventional('perf', 'perf (性能)'),
+    _conventional('test', 'test (测试)'),
+    _conventional('build', 'build (构建)'),
+    _conventional('ci', 'ci (持续集成)'),
+    _conventional('chore', 'chore (杂项)'),
+    _conventional('revert', 'revert (回滚)'),
+], default='非规范提交')
+
+# 图表名 -> 规则集，load_rulesets 可以整体替换其中的条目
+RULESETS = {'keywords': KEYWORDS, 'cn_keywords': CN_KEYWORDS, 'commit_types': COMMIT_TYPES}
+
+
+def load_rulesets(path):
+    """
+    从 JSON 文件加载规则集并替换 RULESETS 中的同名条目，文件格式：
+        {"keywords": {"default": "其他", "rules": [{"label": "修复", "keywords": ["fix", "bug"], "ignore_case": true},
+                                                  {"label": "发布", "patterns": ["^release\\\\b"]}]}}
+    :return: 被替换的图表名列表
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    unknown = set(data) - set(RULESETS)
+    if unknown:
+        raise ValueError(f"未知的规则集: {', '.join(sorted(unknown))}，可选 {', '.join(RULESETS)}")
+    rulesets = {}
+    for name, ruleset in data.items():
+        try:
+            rulesets[name] = Ruleset.from_dict(ruleset)
+        except ValueError as e:
+            raise ValueError(f"规则集 {name}: {e}") from None
+    RULESETS.update(rulesets)
+    return list(data)
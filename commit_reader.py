@@ -0,0 +1,101 @@
+"""
+直接解析原始提交对象的历史读取器
+`git rev-list` 的输出经操作系统管道直接接到 `git cat-file --batch`，Python 端只顺序读取原始提交对象并解析头部，
+不创建 GitPython 的 Commit 对象，也不会为每个属性按需触发对象读取；整段历史只需两个 git 子进程
+多进程时先由 rev-list 确定顺序，再把提交序列分片，在多个进程中各自用 cat-file 读取并解析(见 shards.py)
+"""
+import subprocess
+import tempfile
+from gitcmd import GitError, run_git
+from profiling import count
+import shards
+
+
+def parse_commit(raw):
+    """
+    解析原始提交对象
+    :return: (authored_date, author, message 第一行, [父提交 sha, ...])
+    """
+    header, _, body = raw.partition(b'\n\n')
+    parents = []
+    author = b''
+    authored_date = 0
+    encoding = 'utf-8'
+    for line in header.split(b'\n'):
+        # gpgsig / mergetag 等多行头部的续行以空格开头，直接跳过
+        if line.startswith(b'parent '):
+            parents.append(line[7:47].decode('ascii'))
+        elif line.startswith(b'author '):
+            # author 名字 <邮箱> 时间戳 时区
+            end = line.rfind(b'> ')
+            author = line[7:line.rfind(b' <', 0, end + 1)]
+            authored_date = int(line[end + 2:].split()[0])
+        elif line.startswith(b'encoding '):
+            encoding = line[9:].decode('ascii', 'replace')
+    # 与 git log 的 %an / %B 一致：整个对象按 encoding 头声明的编码解码
+    try:
+        author = author.decode(encoding, 'replace')
+        message = body.decode(encoding, 'replace')
+    except LookupError:
+        author = author.decode('utf-8', 'replace')
+        message = body.decode('utf-8', 'replace')
+    return authored_date, author, message.strip().split('\n')[0], parents
+
+
+def _commits_shard(repo_path, shas):
+    # 整个分片的输出一次读入(communicate 同时写入与读取，不会因管道写满而互相等待)
+    output = run_git(repo_path, 'cat-file', '--batch', input=''.join(f'{sha}\n' for sha in shas).encode('ascii'))
+    rows = []
+    pos = 0
+    while pos < len(output):
+        end = output.index(b'\n', pos)
+        sha, kind, size = output[pos:end].split()
+        pos = end + 1 + int(size) + 1
+        if kind == b'commit':
+            rows.append((sha.decode('ascii'), *parse_commit(output[end + 1:pos - 1])))
+    return rows
+
+
+def iter_commits(repo_path, rev_args=('--all',), max_count=None, workers=1):
+    """
+    按 `git rev-list --topo-order` 的顺序(从新到旧)逐个产出 (sha, authored_date, author, message, parents)
+    :param rev_args: 版本范围与过滤条件(见 HistorySelection.rev_args)
+    :param max_count: 最多读取的提交数，None 表示不限制
+    :param workers: 解析提交对象的工作进程数，1 表示单进程流式读取，None 表示 CPU 核数
+    """
+    if shards.parallel(workers):
+        shas = shards.rev_list(repo_path, rev_args, max_count)
+        for rows in shards.map_shards(_commits_shard, repo_path, shas, workers):
+            yield from rows
+        return
+    args = ['git', '-C', repo_path, 'rev-list', '--topo-order']
+    if max_count is not None:
+        args.append(f'--max-count={max_count}')
+    errors = tempfile.TemporaryFile()
+    rev_list = subprocess.Popen([*args, *rev_args, '--'], stdout=subprocess.PIPE, stderr=errors)
+    cat_file = subprocess.Popen(['git', '-C', repo_path, 'cat-file', '--batch'],
+                                stdin=rev_list.stdout, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    # 管道已交给 cat-file，父进程关闭自己的一端，rev-list 结束后 cat-file 才能读到 EOF
+    rev_list.stdout.close()
+    stream = cat_file.stdout
+    try:
+        while True:
+            line = stream.readline()
+            if not line:
+                break
+            sha, kind, size = line.split()
+            raw = stream.read(int(size) + 1)[:-1]
+            if kind != b'commit':
+                continue
+            count('git_objects')
+            yield (sha.decode('ascii'), *parse_commit(raw))
+    finally:
+        stream.close()
+        cat_file.wait()
+        rev_list.wait()
+        errors.seek(0)
+        stderr = errors.read()
+        errors.close()
+    # 提前停止读取时 rev-list 会被 SIGPIPE 终止(返回码为负)，只有正常读完后的失败才报错
+    if rev_list.returncode > 0:
+        raise GitError(rev_list.returncode, rev_list.args, stderr=stderr)
@@ -0,0 +1,172 @@
+import time
+import numpy as np
+from datetime import datetime
+
+
+def local_utc_offsets(timestamps):
+    """
+    计算每个时间戳在本机时区下的 UTC 偏移(秒)，与 datetime.fromtimestamp 的结果一致
+    时区偏移只会在整点附近变化，因此只对出现过的小时逐个查询，再广播回每个提交
+    """
+    hours, inverse = np.unique(timestamps // 3600, return_inverse=True)
+    offsets = np.array([time.localtime(int(h) * 3600).tm_gmtoff for h in hours], dtype=np.int64)
+    return offsets[inverse]
+
+
+class CommitTable:
+    """
+    列式存储的提交表，按时间从旧到新排列(与原先 get_git_history 返回的列表顺序一致)
+    - shas: S40 定长字节数组
+    - timestamps: int64 作者时间(epoch 秒)
+    - author_ids / authors: 作者分类编码，authors 按首次出现的顺序排列
+    - parent_offsets / parent_ids: CSR 形式的父提交，parent_ids >= 0 为表内行号，
+      负数 -k-1 表示不在表内的父提交 external_parents[k]
+    - refs: 只为带引用的行保存 {行号: [引用名, ...]}
+    """
+
+    def __init__(self, shas, timestamps, author_ids, authors, messages,
+                 parent_offsets, parent_ids, external_parents, refs):
+        self.shas = shas
+        self.timestamps = timestamps
+        self.author_ids = author_ids
+        self.authors = authors
+        self.messages = messages
+        self.parent_offsets = parent_offsets
+        self.parent_ids = parent_ids
+        self.external_parents = external_parents
+        self.refs = refs
+        self._local_times = None
+
+    def __len__(self):
+        return len(self.shas)
+
+    def sha(self, i):
+        return self.shas[i].decode('ascii')
+
+    def parents(self, i):
+        result = []
+        for pid in self.parent_ids[self.parent_offsets[i]:self.parent_offsets[i + 1]]:
+            result.append(self.sha(pid) if pid >= 0 else self.external_parents[-pid - 1])
+        return result
+
+    def parent_counts(self):
+        return np.diff(self.parent_offsets)
+
+    def is_merge(self):
+        return self.parent_counts() > 1
+
+    def author_counts(self):
+        """每个作者的提交数，下标与 authors 对应"""
+        return np.bincount(self.author_ids, minlength=len(self.authors))
+
+    def local_times(self):
+        """本机时区下的“墙上时间”，以 epoch 秒表示，便于直接按小时/天/月分桶"""
+        if self._local_times is None:
+            self._local_times = self.timestamps + local_utc_offsets(self.timestamps)
+        return self._local_times
+
+    def local_minutes(self):
+        """精确到分钟的本地时间(datetime64[m])，对应原先的 'YYYY-MM-DD HH:MM' 字符串"""
+        return (self.local_times() // 60).astype('datetime64[m]')
+
+    def record(self, i):
+        """还原为原先 get_git_history 输出的字典结构"""
+        sha = self.sha(i)
+        return {
+            "hash": sha[:7],
+            "hashFull": sha,
+            "author": self.authors[self.author_ids[i]],
+            "date": datetime.fromtimestamp(int(self.timestamps[i])).strftime('%Y-%m-%d %H:%M'),
+            "message": self.messages[i],
+            "parents": self.parents(i),
+            "refs": list(self.refs.get(i, ())),
+        }
+
+    def to_records(self):
+        return [self.record(i) for i in range(len(self))]
+
+
+class CommitTableBuilder:
+    """逐个追加提交，最后一次性转换为 CommitTable"""
+
+    def __init__(self):
+        self._shas = []
+        self._timestamps = []
+        self._authors = []
+        self._messages = []
+        self._parent_counts = []
+        self._parents = []
+        self._refs = []
+
+    def append(self, sha, authored_date, author, message, parents, refs=()):
+        self._shas.append(sha)
+        self._timestamps.append(authored_date)
+        self._authors.append(author)
+        self._messages.append(message)
+        self._parent_counts.append(len(parents))
+        self._parents.extend(parents)
+        self._refs.append(refs)
+
+    def build(self, reverse=False):
+        """
+        :param reverse: git 按从新到旧输出，传 True 时翻转为从旧到新存放
+        """
+        n = len(self._shas)
+        shas = np.array(self._shas, dtype='S40')
+        timestamps = np.array(self._timestamps, dtype=np.int64)
+        authors = np.array(self._authors, dtype=object)
+        counts = np.array(self._parent_counts, dtype=np.int64)
+        parent_shas = np.array(self._parents, dtype='S40')
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        messages = self._messages
+        refs = self._refs
+        if reverse:
+            # 父提交区间整体按行翻转，区间内部保持原顺序(第一个父提交仍在最前)
+            entry_rows = np.repeat(np.arange(n), counts)
+            within = np.arange(len(parent_shas)) - offsets[entry_rows]
+            shas, timestamps, authors, counts = shas[::-1], timestamps[::-1], authors[::-1], counts[::-1]
+            offsets = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            reversed_parents = np.empty_like(parent_shas)
+            reversed_parents[offsets[n - 1 - entry_rows] + within] = parent_shas
+            parent_shas = reversed_parents
+            messages = messages[::-1]
+            refs = refs[::-1]
+
+        # 作者分类编码：按在表中首次出现的顺序编号，保证与 Counter.most_common 的并列顺序一致
+        if n:
+            uniques, first_index, inverse = np.unique(authors, return_index=True, return_inverse=True)
+            rank = np.argsort(first_index, kind='stable')
+            remap = np.empty_like(rank)
+            remap[rank] = np.arange(len(rank))
+            author_ids = remap[inverse].astype(np.int32)
+            author_names = [str(name) for name in uniques[rank]]
+        else:
+            author_ids = np.zeros(0, dtype=np.int32)
+            author_names = []
+
+        # 通过排序 + 二分把父提交 sha 解析为行号，表外的父提交记为负数
+        parent_ids = np.zeros(len(parent_shas), dtype=np.int64)
+        external = []
+        if len(parent_shas):
+            sort_order = np.argsort(shas, kind='stable')
+            sorted_shas = shas[sort_order]
+            pos = np.clip(np.searchsorted(sorted_shas, parent_shas), 0, max(n - 1, 0))
+            found = (sorted_shas[pos] == parent_shas) if n else np.zeros(len(parent_shas), dtype=bool)
+            parent_ids[found] = sort_order[pos[found]]
+            missing = np.flatnonzero(~found)
+            external = [parent_shas[k].decode('ascii') for k in missing]
+            parent_ids[missing] = -np.arange(1, len(missing) + 1)
+
+        return CommitTable(
+            shas=shas,
+            timestamps=timestamps,
+            author_ids=author_ids,
+            authors=author_names,
+            messages=list(messages),
+            parent_offsets=offsets,
+            parent_ids=parent_ids,
+            external_parents=external,
+            refs={i: list(r) for i, r in enumerate(refs) if r},
+        )
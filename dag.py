@@ -0,0 +1,238 @@
+"""
+基于父提交数组的提交图(DAG)分析
+节点为 CommitTable 的行号(从旧到新，父提交总在子提交之前)，父/子邻接均为 CSR 形式
+- first_parent_chain: 沿第一个父提交回溯的主线
+- chains: 把提交图分解为互不相交的第一父提交链，每条支链对应一个分支：分叉点、合并点、存活时间、合并耗时
+- ahead_behind: 用位集一次传播所有引用的可达性，得到每个引用相对基准分支的 ahead/behind
+除位集传播外均为 O(提交数 + 父子边数)
+"""
+from collections import Counter
+import numpy as np
+from commit_table import CommitTableBuilder
+
+# 依次尝试作为基准分支的引用
+DEFAULT_BASE_REFS = ('refs/heads/main', 'refs/heads/master',
+                     'refs/remotes/origin/main', 'refs/remotes/origin/master')
+
+
+class Chains:
+    """
+    第一父提交链分解的结果，每条链一行
+    - chain_of[row]: 提交所属的链
+    - heads / tails: 链上最新 / 最旧的提交
+    - forks: tails 的第一个父提交(即分叉点)，没有时为 -1
+    - merges: 把 heads 作为非第一父提交合并进来的最早提交，未合并为 -1
+    链 0 起为 mainline 指定的主线，其余链按链头从新到旧排列
+    """
+
+    def __init__(self, chain_of, heads, tails, forks, merges, lengths, mainline_count):
+        self.chain_of = chain_of
+        self.heads = heads
+        self.tails = tails
+        self.forks = forks
+        self.merges = merges
+        self.lengths = lengths
+        self.mainline_count = mainline_count
+
+    def __len__(self):
+        return len(self.heads)
+
+    def branches(self):
+        """主线以外的链(分支)的下标"""
+        return np.arange(self.mainline_count, len(self))
+
+
+class CommitDag:
+    """
+    :param parent_offsets / parent_ids: 与 CommitTable 相同的 CSR 父提交，负数表示表外的父提交
+    :param timestamps: 每个提交的作者时间
+    """
+
+    def __init__(self, parent_offsets, parent_ids, timestamps):
+        n = len(parent_offsets) - 1
+        counts = np.diff(parent_offsets)
+        rows = np.repeat(np.arange(n, dtype=np.int64), counts)
+        if np.any(parent_ids >= rows):
+            raise ValueError("提交表不是拓扑顺序：存在排在子提交之后的父提交")
+        self.n = n
+        self.parent_offsets = parent_offsets
+        self.parent_ids = parent_ids
+        self.timestamps = timestamps
+        first = np.full(n, -1, dtype=np.int64)
+        has_parent = counts > 0
+        first[has_parent] = parent_ids[parent_offsets[:-1][has_parent]]
+        self.first_parent = np.maximum(first, -1)
+
+        # 子提交 CSR：按父提交排序所有表内的边
+        internal = parent_ids >= 0
+        edge_parents = parent_ids[internal]
+        edge_children = rows[internal]
+        order = np.argsort(edge_parents, kind='stable')
+        self.child_ids = edge_children[order]
+        self.child_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_parents, minlength=n), out=self.child_offsets[1:])
+
+        # 以非第一父提交的身份被合并时，最早的那个合并提交
+        is_first = np.zeros(len(parent_ids), dtype=bool)
+        is_first[parent_offsets[:-1][has_parent]] = True
+        side = internal & ~is_first
+        merged_by = np.full(n, n, dtype=np.int64)
+        np.minimum.at(merged_by, parent_ids[side], rows[side])
+        merged_by[merged_by == n] = -1
+        self.merged_by = merged_by
+
+    @classmethod
+    def from_table(cls, commits):
+        return cls(commits.parent_offsets, commits.parent_ids, commits.timestamps)
+
+    def __len__(self):
+        return self.n
+
+    def parents(self, row):
+        ids = self.parent_ids[self.parent_offsets[row]:self.parent_offsets[row + 1]]
+        return ids[ids >= 0]
+
+    def children(self, row):
+        return self.child_ids[self.child_offsets[row]:self.child_offsets[row + 1]]
+
+    def first_parent_chain(self, row):
+        """从 row 沿第一个父提交回溯到根(或表的边界)，返回从新到旧的行号数组"""
+        first_parent = self.first_parent
+        chain = []
+        while row >= 0:
+            chain.append(row)
+            row = first_parent[row]
+        return np.array(chain, dtype=np.int64)
+
+    def chains(self, mainline=()):
+        """
+        把全部提交分解为互不相交的第一父提交链，每个提交只访问一次
+        先依次认领 mainline 中各提交的第一父提交链，再从最新的提交往旧遍历，遇到尚未认领的提交就开始一条新链，
+        沿第一个父提交一直走到已被认领的提交(分叉点)或根
+        :param mainline: 作为主线优先认领的行号，例如默认分支的末端
+        """
+        first_parent = self.first_parent.tolist()
+        chain_of = [-1] * self.n
+        heads, tails, forks, lengths = [], [], [], []
+
+        def claim(start):
+            chain_id = len(heads)
+            row, tail, length = start, start, 0
+            while row >= 0 and chain_of[row] < 0:
+                chain_of[row] = chain_id
+                tail = row
+                length += 1
+                row = first_parent[row]
+            heads.append(start)
+            tails.append(tail)
+            forks.append(row)
+            lengths.append(length)
+
+        for row in mainline:
+            if chain_of[row] < 0:
+                claim(row)
+        mainline_count = len(heads)
+        for row in range(self.n - 1, -1, -1):
+            if chain_of[row] < 0:
+                claim(row)
+
+        heads = np.array(heads, dtype=np.int64)
+        return Chains(np.array(chain_of, dtype=np.int64), heads, np.array(tails, dtype=np.int64),
+                      np.array(forks, dtype=np.int64), self.merged_by[heads] if len(heads) else heads,
+                      np.array(lengths, dtype=np.int64), mainline_count)
+
+    def ancestor_masks(self, tips):
+        """
+        位集可达性：返回每个提交的整数位集，第 i 位表示该提交是 tips[i] 的祖先(含自身)
+        按行号从新到旧把子提交的位集 OR 到父提交上，每条父子边一次整数运算
+        """
+        masks = [0] * self.n
+        for bit, row in enumerate(tips):
+            masks[row] |= 1 << bit
+        offsets = self.parent_offsets.tolist()
+        parent_ids = self.parent_ids.tolist()
+        for row in range(self.n - 1, -1, -1):
+            mask = masks[row]
+            if mask:
+                for k in range(offsets[row], offsets[row + 1]):
+                    parent = parent_ids[k]
+                    if parent >= 0:
+                        masks[parent] |= mask
+        return masks
+
+    def ahead_behind(self, base, rows, batch=256):
+        """
+        每个引用相对基准提交的 ahead(只在引用中) / behind(只在基准中) 提交数，与 `git rev-list --count --left-right` 相同，
+        但只统计表内的提交；每批 batch 个引用共用一次位集传播
+        :param base: 基准提交的行号
+        :param rows: 各引用末端的行号
+        :return: [(ahead, behind), ...]
+        """
+        result = []
+        for start in range(0, len(rows), batch):
+            chunk = list(rows[start:start + batch])
+            # 第 0 位为基准，其后依次为本批引用
+            masks = Counter(self.ancestor_masks([base] + chunk))
+            reach = [0] * len(chunk)
+            shared = [0] * len(chunk)
+            base_total = 0
+            for mask, n in masks.items():
+                in_base = mask & 1
+                base_total += n if in_base else 0
+                mask >>= 1
+                while mask:
+                    low = mask & -mask
+                    i = low.bit_length() - 1
+                    reach[i] += n
+                    if in_base:
+                        shared[i] += n
+                    mask ^= low
+            result.extend((reach[i] - shared[i], base_total - shared[i]) for i in range(len(chunk)))
+        return result
+
+
+def rows_for_shas(commits, shas):
+    """把 sha 映射为提交表的行号，不在表内的为 -1"""
+    n = len(commits)
+    keys = np.array([sha.encode('ascii') for sha in shas], dtype='S40')
+    if n == 0 or len(keys) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    order = np.argsort(commits.shas, kind='stable')
+    sorted_shas = commits.shas[order]
+    pos = np.clip(np.searchsorted(sorted_shas, keys), 0, n - 1)
+    return np.where(sorted_shas[pos] == keys, order[pos], -1)
+
+
+def branch_refs(ref_index):
+    """本地与远端分支(不含 HEAD 符号引用)，[(引用全名, sha), ...]"""
+    return [(name, sha) for name, sha in ref_index.tips.items()
+            if name.startswith(('refs/heads/', 'refs/remotes/')) and not name.endswith('/HEAD')]
+
+
+def default_base(ref_index, commits):
+    """
+    选择基准分支：依次尝试 main / master，都不存在时取末端最新的分支
+    :return: 引用全名，没有分支在表内时为 None
+    """
+    refs = dict(branch_refs(ref_index))
+    for name in DEFAULT_BASE_REFS:
+        if name in refs and rows_for_shas(commits, [refs[name]])[0] >= 0:
+            return name
+    names = list(refs)
+    rows = rows_for_shas(commits, [refs[name] for name in names])
+    if not len(rows) or rows.max() < 0:
+        return None
+    return names[int(np.argmax(rows))]
+
+
+class DagCollector:
+    """流式计算时的聚合器：只收集 sha、时间与父提交，遍历结束后构建 CommitTable(按时间正序，无需翻转)"""
+
+    def __init__(self):
+        self.builder = CommitTableBuilder()
+
+    def update(self, commit):
+        self.builder.append(commit.sha, commit.authored_date, '', '', commit.parents)
+
+    def result(self):
+        return self.builder.build()
@@ -0,0 +1,79 @@
+import subprocess
+import tempfile
+
+
+class GitError(subprocess.CalledProcessError):
+    """git 以非 0 状态退出，str() 中带有 git 的错误信息(stderr)"""
+
+    def __str__(self):
+        message = error_message(self, default='')
+        return f"git {' '.join(self.cmd[3:])} 失败(退出码 {self.returncode})" + (f": {message}" if message else '')
+
+
+def error_message(error, default=None):
+    """CalledProcessError 中 git 输出的错误信息，没有时返回 default(默认为 str(error))"""
+    stderr = error.stderr
+    if isinstance(stderr, bytes):
+        stderr = stderr.decode('utf-8', 'replace')
+    stderr = (stderr or '').strip()
+    if stderr:
+        return stderr
+    return str(error) if default is None else default
+
+
+def popen_git(repo_path, *args, stdin=None):
+    """
+    以流式方式启动一个 git 子进程，stdout 为二进制管道；stderr 写入临时文件(不会因管道写满而阻塞)，
+    读完 stdout 后用 close_git 结束进程并检查返回码
+    :param repo_path: 仓库路径(工作区或 .git 目录均可)
+    :param args: git 子命令及参数
+    :param stdin: 需要写入标准输入时传 subprocess.PIPE
+    """
+    errors = tempfile.TemporaryFile()
+    proc = subprocess.Popen(['git', '-C', repo_path, *args], stdin=stdin, stdout=subprocess.PIPE, stderr=errors)
+    proc.errors = errors
+    return proc
+
+
+def write_input(proc, data):
+    """把 data 写入 popen_git 进程的标准输入并关闭；git 提前退出时忽略 BrokenPipeError，错误由 close_git 报告"""
+    try:
+        proc.stdin.write(data)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+
+
+def close_git(proc, check=True):
+    """
+    关闭 popen_git 启动的进程并等待其退出
+    :param check: 返回码非 0 时抛出 GitError；调用方提前停止读取时(git 会被 SIGPIPE 终止)传 False
+    """
+    proc.stdout.close()
+    returncode = proc.wait()
+    proc.errors.seek(0)
+    stderr = proc.errors.read()
+    proc.errors.close()
+    if check and returncode != 0:
+        raise GitError(returncode, proc.args, stderr=stderr)
+
+
+def run_git(repo_path, *args, input=None):
+    """执行 git 命令并返回完整的二进制输出，失败时抛出 GitError"""
+    result = subprocess.run(['git', '-C', repo_path, *args], input=input,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise GitError(result.returncode, result.args, output=result.stdout, stderr=result.stderr)
+    return result.stdout
+
+
+def iter_nul_tokens(stream, chunk_size=1 << 16):
+    """按 NUL 分隔符逐个产出 `git ... -z` 输出中的字段，不把整段输出读入内存"""
+    buf = b''
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        buf += chunk
+        parts = buf.split(b'\0')
+        buf = parts.pop()
+        yield from parts
+    if buf:
+        yield buf
@@ -0,0 +1,113 @@
+import heapq
+import numpy as np
+from profiling import profiled
+
+# 分支配色(沿用原 gitgraph 模板的颜色)
+LANE_COLORS = ["#2196F3", "#4CAF50", "#FF9800", "#E91E63", "#9C27B0", "#00BCD4", "#FF5722", "#607D8B", "#8BC34A", "#FFC107"]
+
+
+class GraphLayout:
+    """
+    提交图的泳道布局，行号 0 为最新提交(与 git log --graph 相同的自上而下顺序)
+    - order[row]: 该行对应的 CommitTable 行号
+    - lanes[row]: 该行提交所在的泳道
+    - colors[row]: 该行提交所属分支的颜色编号(LANE_COLORS 下标)
+    - edges: 每行一条边 (child_row, child_lane, carry_lane, parent_row, parent_lane, color)
+      边从子提交斜向进入 carry_lane，沿该泳道向下，在父提交上一行再斜向进入父提交所在泳道；
+      父提交不在表内时 parent_row 为 -1
+    """
+
+    def __init__(self, order, lanes, colors, edges, lane_count):
+        self.order = order
+        self.lanes = lanes
+        self.colors = colors
+        self.edges = edges
+        self.lane_count = lane_count
+
+    def __len__(self):
+        return len(self.order)
+
+    def coordinates(self, lane_width=20, row_height=40, left=20, top=20):
+        """返回每行提交的像素坐标 (xs, ys)"""
+        xs = left + self.lanes.astype(np.int64) * lane_width
+        ys = top + np.arange(len(self), dtype=np.int64) * row_height
+        return xs, ys
+
+    def edge_points(self, lane_width=20, row_height=40, left=20, top=20):
+        """把每条边展开为折线顶点 [(x, y), ...]，与 coordinates 使用相同的坐标系"""
+        x = lambda lane: left + lane * lane_width
+        y = lambda row: top + row * row_height
+        result = []
+        for child_row, child_lane, carry_lane, parent_row, parent_lane, _ in self.edges.tolist():
+            if parent_row < 0:
+                points = [(x(child_lane), y(child_row)), (x(child_lane), y(child_row) + row_height // 2)]
+            elif parent_row == child_row + 1:
+                points = [(x(child_lane), y(child_row)), (x(parent_lane), y(parent_row))]
+            else:
+                points = [(x(child_lane), y(child_row)), (x(carry_lane), y(child_row + 1)),
+                          (x(carry_lane), y(parent_row - 1)), (x(parent_lane), y(parent_row))]
+            result.append(points)
+        return result
+
+
+@profiled()
+def compute_layout(commits):
+    """
+    在 Python 端一次性计算泳道布局与配色，浏览器只负责绘制
+    - 第一个父提交沿用子提交的泳道和颜色；其余父提交若尚未被等待，则占用最左侧的空闲泳道并开启新颜色
+    - 每个父提交最多被一条泳道等待，到达父提交后多余的泳道立即释放，分支数再多泳道也会被复用
+    - 等待关系用字典、空闲泳道用最小堆维护，每个提交的处理代价为 O(父提交数 * log 泳道数)
+    :param commits: CommitTable(按时间从旧到新)
+    """
+    n = len(commits)
+    offsets, parent_ids = commits.parent_offsets, commits.parent_ids
+    waiting = {}       # 父提交行号 -> 正在等待它的泳道
+    lane_color = []    # 泳道 -> 当前颜色编号
+    free_lanes = []    # 空闲泳道的最小堆
+    next_color = 0
+    lanes = np.zeros(n, dtype=np.int32)
+    colors = np.zeros(n, dtype=np.int32)
+    edges = []
+
+    def open_lane():
+        nonlocal next_color
+        if free_lanes:
+            lane = heapq.heappop(free_lanes)
+        else:
+            lane = len(lane_color)
+            lane_color.append(0)
+        lane_color[lane] = next_color % len(LANE_COLORS)
+        next_color += 1
+        return lane
+
+    for row in range(n):
+        i = n - 1 - row
+        lane = waiting.pop(row, -1)
+        if lane < 0:
+            # 没有子提交在等待：新的分支末端
+            lane = open_lane()
+        lanes[row] = lane
+        colors[row] = lane_color[lane]
+        if offsets[i] == offsets[i + 1]:
+            heapq.heappush(free_lanes, lane)
+        for k in range(offsets[i], offsets[i + 1]):
+            pid = parent_ids[k]
+            parent_row = n - 1 - pid if pid >= 0 else -1
+            carry = waiting.get(parent_row, -1) if pid >= 0 else lane
+            if k == offsets[i]:
+                if pid >= 0 and carry < 0:
+                    carry = lane
+                    waiting[parent_row] = lane
+                elif carry != lane or pid < 0:
+                    # 第一个父提交不沿用本泳道时立即释放，其余父提交可以直接向下占用它
+                    heapq.heappush(free_lanes, lane)
+            elif pid >= 0 and carry < 0:
+                carry = open_lane()
+                waiting[parent_row] = carry
+            edges.append((row, lane, carry, parent_row, lane if pid < 0 else -1, lane_color[carry]))
+
+    edges = np.array(edges, dtype=np.int64).reshape(-1, 6)
+    has_parent = edges[:, 3] >= 0
+    edges[has_parent, 4] = lanes[edges[has_parent, 3]]
+    order = np.arange(n - 1, -1, -1, dtype=np.int64)
+    return GraphLayout(order, lanes, colors, edges, len(lane_color))
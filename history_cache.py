@@ -0,0 +1,304 @@
+import os
+import sqlite3
+import subprocess
+from collections import Counter
+from gitcmd import popen_git, close_git, write_input, run_git, iter_nul_tokens
+from numstat import NumstatTable, iter_numstat_sharded, iter_renames_sharded
+from ref_index import build_ref_index
+from profiling import count, profiled
+
+# 表结构变化时递增，旧版本的缓存文件会被整体重建
+SCHEMA_VERSION = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS commits (
+    sha TEXT PRIMARY KEY,
+    authored_date INTEGER NOT NULL,
+    author TEXT NOT NULL,
+    message TEXT NOT NULL,
+    parents TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS numstat (
+    sha TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    insertions INTEGER NOT NULL,
+    deletions INTEGER NOT NULL,
+    PRIMARY KEY (sha, seq)
+);
+CREATE TABLE IF NOT EXISTS renames (
+    sha TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    old_path TEXT NOT NULL,
+    new_path TEXT NOT NULL,
+    PRIMARY KEY (sha, seq)
+);
+CREATE TABLE IF NOT EXISTS renames_done (sha TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS refs (name TEXT PRIMARY KEY, sha TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS seen_refs (name TEXT PRIMARY KEY, sha TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS blame (
+    blob TEXT NOT NULL,
+    path TEXT NOT NULL,
+    author TEXT NOT NULL,
+    lines INTEGER NOT NULL,
+    PRIMARY KEY (blob, path, author)
+);
+"""
+
+
+def cache_path_for(repo_path):
+    """缓存文件与仓库目录并列存放，例如 ./repo -> ./repo.analyzer-cache.sqlite"""
+    return os.path.abspath(repo_path).rstrip(os.sep) + '.analyzer-cache.sqlite'
+
+
+def _is_ancestor(repo_path, old, new):
+    result = subprocess.run(['git', '-C', repo_path, 'merge-base', '--is-ancestor', old, new],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+def _fast_forwarded(repo_path, old_tips, new_tips):
+    """
+    对比两次记录的引用位置
+    :return: (仍然存在且被快进或未变化的旧引用 sha 集合, 是否有引用被删除或改写)
+    """
+    known = set()
+    rewritten = False
+    for name, old_sha in old_tips.items():
+        new_sha = new_tips.get(name)
+        if new_sha == old_sha or (new_sha is not None and _is_ancestor(repo_path, old_sha, new_sha)):
+            known.add(old_sha)
+        else:
+            rewritten = True
+    return known, rewritten
+
+
+def _iter_commit_meta(repo_path, exclude=(), shas=None):
+    """
+    遍历 --all 中不能从 exclude 到达的提交，逐个产出 (sha, authored_date, author, message, parents)
+    exclude 通过标准输入以 ^sha 的形式传给 git，避免引用过多时命令行超长
+    :param shas: 只读取这些提交(按给定顺序)，此时忽略 exclude
+    """
+    fmt = '--format=%H%x1f%at%x1f%an%x1f%P%x1f%B'
+    if shas is None:
+        proc = popen_git(repo_path, 'log', '-z', '--stdin', '--all', '--ignore-missing', fmt, stdin=subprocess.PIPE)
+        write_input(proc, ''.join(f'^{sha}\n' for sha in exclude).encode('ascii'))
+    else:
+        proc = popen_git(repo_path, 'log', '-z', '--no-walk=unsorted', '--stdin', fmt, stdin=subprocess.PIPE)
+        write_input(proc, ''.join(f'{sha}\n' for sha in shas).encode('ascii'))
+    done = False
+    try:
+        for token in iter_nul_tokens(proc.stdout):
+            sha, date, author, parents, body = token.decode('utf-8', 'replace').split('\x1f', 4)
+            count('git_objects')
+            yield sha, int(date), author, body.strip().split('\n')[0], parents
+        done = True
+    finally:
+        close_git(proc, check=done)
+
+
+class HistoryCache:
+    """
+    以提交 sha 为键的本地 SQLite 缓存，保存提交元数据、numstat 行与重命名，另以 (blob sha, 路径) 为键保存 blame 结果
+    refresh() 只遍历上次运行之后新出现的提交；引用被删除或被强制推送时，清理不再可达的提交
+    refresh_selection() 只补齐某个提交选择中缺失的提交，首次运行时不必计算整个历史的 diff；
+    它同样会在引用被改写时清理不可达的提交
+    refs 表记录 refresh() 已完整缓存的引用位置，seen_refs 表记录上次检查改写时的引用位置(两种刷新都会更新)
+    重命名需要额外一次 -M diff，只有 load_renames() 用到时才为尚未计算过的提交补齐
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = self._connect()
+        version = self._read_version()
+        if version is not None and version != str(SCHEMA_VERSION):
+            self.conn.close()
+            os.remove(path)
+            self.conn = self._connect()
+        self.conn.executescript(_SCHEMA)
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(SCHEMA_VERSION),))
+        self.conn.commit()
+
+    def _connect(self):
+        # 批量分析时同一个缓存会在流水线的不同阶段线程间传递，但同一时刻只有一个线程使用
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    @classmethod
+    def open_for_repo(cls, repo_path):
+        return cls(cache_path_for(repo_path))
+
+    def _read_version(self):
+        try:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return row[0] if row else None
+
+    def close(self):
+        self.conn.close()
+
+    @profiled('history_cache.refresh')
+    def refresh(self, repo_path, ref_index=None, workers=1):
+        """
+        让缓存与仓库当前的引用状态保持一致
+        :param repo_path: 仓库路径
+        :param ref_index: 已构建的 RefIndex，不传则现场构建
+        :param workers: 计算新提交 numstat 的工作进程数，None 表示 CPU 核数(见 shards.py)
+        :return: 本次新写入缓存的提交数
+        """
+        if ref_index is None:
+            ref_index = build_ref_index(repo_path)
+        new_tips = ref_index.tips
+        old_tips = dict(self.conn.execute('SELECT name, sha FROM refs'))
+        # 只有仍然存在且被快进(或未变化)的旧引用，其可达提交才保证已在缓存中
+        known, rewritten = _fast_forwarded(repo_path, old_tips, new_tips)
+        self._prune_if_rewritten(repo_path, new_tips, rewritten)
+
+        rows = list(_iter_commit_meta(repo_path, known))
+        # refresh_selection() 已写入的提交不必重新计算 diff
+        cached = {row[0] for row in self._select('commits', [row[0] for row in rows])}
+        rows = [row for row in rows if row[0] not in cached]
+        self._store_commits(repo_path, rows, workers)
+        self.conn.execute('DELETE FROM refs')
+        self.conn.executemany('INSERT INTO refs VALUES (?, ?)', new_tips.items())
+        self.conn.commit()
+        return len(rows)
+
+    @profiled('history_cache.refresh_selection')
+    def refresh_selection(self, repo_path, max_count=None, revs=('--all',), workers=1, ref_index=None):
+        """
+        只为选中的提交补齐缓存：按 rev-list 列出选择范围内的提交，读取并写入其中尚未缓存的那些
+        不更新 refs 表，之后的 refresh() 仍会补齐其余历史；引用被删除或被强制推送时同样清理不再可达的提交
+        :param max_count / revs: 同 ordered_shas
+        :param ref_index: 已构建的 RefIndex，不传则现场构建
+        :return: 本次新写入缓存的提交数
+        """
+        if ref_index is None:
+            ref_index = build_ref_index(repo_path)
+        new_tips = ref_index.tips
+        old_tips = dict(self.conn.execute('SELECT name, sha FROM seen_refs'))
+        _, rewritten = _fast_forwarded(repo_path, old_tips, new_tips)
+        self._prune_if_rewritten(repo_path, new_tips, rewritten)
+
+        shas = self.ordered_shas(repo_path, max_count, revs)
+        cached = {row[0] for row in self._select('commits', shas)}
+        missing = [sha for sha in shas if sha not in cached]
+        rows = list(_iter_commit_meta(repo_path, shas=missing)) if missing else []
+        self._store_commits(repo_path, rows, workers)
+        self.conn.commit()
+        return len(rows)
+
+    def _store_commits(self, repo_path, rows, workers):
+        # 读取 numstat 失败时撤销本次写入，不留下没有 numstat 行的提交
+        if not rows:
+            return
+        try:
+            self.conn.executemany('INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?, ?)', rows)
+            new_shas = [row[0] for row in rows]
+            for sha, _, files in iter_numstat_sharded(repo_path, new_shas, workers):
+                self.conn.executemany('INSERT OR REPLACE INTO numstat VALUES (?, ?, ?, ?, ?)',
+                                      [(sha, seq, path, ins, dels) for seq, (path, ins, dels) in enumerate(files)])
+        except BaseException:
+            self.conn.rollback()
+            raise
+
+    def _prune_if_rewritten(self, repo_path, new_tips, rewritten):
+        if rewritten:
+            self._prune_unreachable(repo_path)
+        self.conn.execute('DELETE FROM seen_refs')
+        self.conn.executemany('INSERT INTO seen_refs VALUES (?, ?)', new_tips.items())
+
+    def _prune_unreachable(self, repo_path):
+        reachable = set(run_git(repo_path, 'rev-list', '--all').decode('ascii').split())
+        cached = [row[0] for row in self.conn.execute('SELECT sha FROM commits')]
+        stale = [(sha,) for sha in cached if sha not in reachable]
+        self.conn.executemany('DELETE FROM commits WHERE sha = ?', stale)
+        self.conn.executemany('DELETE FROM numstat WHERE sha = ?', stale)
+        self.conn.executemany('DELETE FROM renames WHERE sha = ?', stale)
+        self.conn.executemany('DELETE FROM renames_done WHERE sha = ?', stale)
+
+    def ordered_shas(self, repo_path, max_count=None, revs=('--all',)):
+        """
+        按 `git rev-list --topo-order` 的顺序返回提交 sha，只读取提交图，不解析 diff
+        :param revs: 版本范围与过滤条件(见 HistorySelection.rev_args)
+        """
+        args = ['rev-list', '--topo-order']
+        if max_count is not None:
+            args.append(f'--max-count={max_count}')
+        return run_git(repo_path, *args, *revs, '--').decode('ascii').split()
+
+    def commit_rows(self, shas):
+        """按给定顺序产出 (sha, authored_date, author, message, parents)"""
+        records = {}
+        for sha, authored_date, author, message, parents in self._select('commits', shas):
+            records[sha] = (sha, authored_date, author, message, parents.split())
+        for sha in shas:
+            yield records[sha]
+
+    @profiled('history_cache.load_numstat')
+    def load_numstat(self, repo_path, max_count=None, revs=('--all',)):
+        """从缓存组装与 numstat.load_numstat 顺序一致的 NumstatTable，不含重命名信息(见 load_renames)"""
+        shas = self.ordered_shas(repo_path, max_count, revs)
+        dates = {sha: authored_date for sha, authored_date, *_ in self._select('commits', shas)}
+        files = {sha: [] for sha in shas}
+        for sha, _, path, ins, dels in self._select('numstat', shas, order='sha, seq'):
+            files[sha].append((path, ins, dels))
+        table = NumstatTable()
+        for sha in shas:
+            table.append_commit(sha, dates[sha], files[sha])
+        return table
+
+    @profiled('history_cache.load_renames')
+    def load_renames(self, repo_path, shas, workers=1):
+        """
+        读取这些提交的重命名，尚未计算过的提交在这里补做 -M diff 并写入缓存
+        :param shas: 已在缓存中的提交 sha
+        :param workers: 计算重命名的工作进程数，None 表示 CPU 核数
+        :return: {sha: [(旧路径, 新路径), ...]}，没有重命名的提交不出现在结果中
+        """
+        done = {row[0] for row in self._select('renames_done', shas)}
+        missing = [sha for sha in shas if sha not in done]
+        if missing:
+            for sha, renames in iter_renames_sharded(repo_path, missing, workers):
+                self.conn.executemany('INSERT OR REPLACE INTO renames VALUES (?, ?, ?, ?)',
+                                      [(sha, seq, old, new) for seq, (old, new) in enumerate(renames)])
+            self.conn.executemany('INSERT OR REPLACE INTO renames_done VALUES (?)', [(sha,) for sha in missing])
+            self.conn.commit()
+        renames = {}
+        for sha, _, old, new in self._select('renames', shas, order='sha, seq'):
+            renames.setdefault(sha, []).append((old, new))
+        return renames
+
+    def blame_results(self, keys, batch=500):
+        """
+        查询已缓存的 blame 结果
+        :param keys: [(blob sha, 路径), ...]
+        :return: {(blob sha, 路径): Counter {作者: 行数}}，未缓存的键不出现在结果中
+        """
+        wanted = set(keys)
+        blobs = sorted({blob for blob, _ in wanted})
+        results = {}
+        for start in range(0, len(blobs), batch):
+            chunk = blobs[start:start + batch]
+            marks = ','.join('?' * len(chunk))
+            for blob, path, author, lines in self.conn.execute(
+                    f'SELECT blob, path, author, lines FROM blame WHERE blob IN ({marks})', chunk):
+                if (blob, path) in wanted:
+                    counts = results.setdefault((blob, path), Counter())
+                    if lines:
+                        counts[author] = lines
+        return results
+
+    def store_blame(self, blob, path, counts):
+        """写入一个文件的 blame 结果(由调用方统一 commit)；没有任何行时写入一条 0 行记录，表示已经计算过"""
+        rows = [(blob, path, author, lines) for author, lines in counts.items()] or [(blob, path, '', 0)]
+        self.conn.executemany('INSERT OR REPLACE INTO blame VALUES (?, ?, ?, ?)', rows)
+
+    def _select(self, table, shas, order=None, batch=500):
+        # SQLite 对单条语句的参数个数有限制，分批查询
+        suffix = f' ORDER BY {order}' if order else ''
+        for start in range(0, len(shas), batch):
+            chunk = shas[start:start + batch]
+            marks = ','.join('?' * len(chunk))
+            yield from self.conn.execute(f'SELECT * FROM {table} WHERE sha IN ({marks}){suffix}', chunk)
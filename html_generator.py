@@ -1,14 +1,54 @@
 import os
 import json
+from graph_layout import LANE_COLORS, compute_layout
+from profiling import profiled
 
-def generate_git_tree_html(commits, git_url, output_path="git_tree.html"):
+# 默认页面的像素尺寸，与原 gitgraph 模板的间距保持一致
+ROW_HEIGHT = 45
+LANE_WIDTH = 40
+GRAPH_MARGIN = 20
+
+
+def _tree_drawing(commits, layout):
+    """
+    把布局结果转换为浏览器可以直接绘制的数据：提交为 [x, y, 颜色, hash, 说明, 作者, 日期, 引用]，
+    边为 [颜色, [x0, y0, x1, y1, ...]]，所有坐标都是最终像素值
+    """
+    xs, ys = layout.coordinates(LANE_WIDTH, ROW_HEIGHT, GRAPH_MARGIN, GRAPH_MARGIN)
+    rows = []
+    for row in range(len(layout)):
+        record = commits.record(int(layout.order[row]))
+        rows.append([int(xs[row]), int(ys[row]), LANE_COLORS[layout.colors[row]], record["hash"],
+                     record["message"], record["author"], record["date"], record["refs"]])
+    edges = []
+    for edge, points in zip(layout.edges.tolist(), layout.edge_points(LANE_WIDTH, ROW_HEIGHT, GRAPH_MARGIN, GRAPH_MARGIN)):
+        edges.append([LANE_COLORS[edge[5]], [v for point in points for v in point]])
+    return {
+        "width": GRAPH_MARGIN * 2 + max(layout.lane_count - 1, 0) * LANE_WIDTH,
+        "height": GRAPH_MARGIN * 2 + max(len(layout) - 1, 0) * ROW_HEIGHT,
+        "commits": rows,
+        "edges": edges,
+    }
+
+
+@profiled()
+def generate_git_tree_html(commits, git_url, output_path="git_tree.html", layout=None):
+    """
+    生成 git 树页面：分支泳道、颜色和坐标全部在 Python 端计算(见 graph_layout)，浏览器只按给定坐标绘制 SVG
+    :param commits: CommitTable 提交表
+    :param git_url: 页面标题中显示的仓库地址
+    :param output_path: 输出 HTML 路径
+    :param layout: 预先计算好的 GraphLayout，不传则现场计算
+    """
+    if layout is None:
+        layout = compute_layout(commits)
+    drawing = _tree_drawing(commits, layout)
     html_content = f"""
 <!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <title>Git Tree Visualization</title>
-    <script src="https://cdn.jsdelivr.net/npm/@gitgraph/js"></script>
     <style>
         body {{
             font-family: 'Consolas', 'Microsoft YaHei', 'Source Han Sans SC', sans-serif;
@@ -21,8 +61,13 @@ def generate_git_tree_html(commits, git_url, output_path="git_tree.html"):
             border-radius: 12px;
             box-shadow: 0 10px 30px rgba(0,0,0,0.1);
             overflow: auto;
-            min-height: 1200px;
         }}
+        #graph-container text {{
+            font: normal 10pt 'Consolas', 'Microsoft YaHei', 'Source Han Sans SC', sans-serif;
+            fill: #2c3e50;
+            dominant-baseline: middle;
+        }}
+        #graph-container .ref {{ font-weight: bold; }}
         h1 {{ 
             color: #2c3e50; 
             text-align: center;
@@ -37,109 +82,275 @@ def generate_git_tree_html(commits, git_url, output_path="git_tree.html"):
     <div id="graph-container"></div>
 
     <script>
-        const commitsData = {json.dumps(commits)};
-        const container = document.getElementById("graph-container");
-        const gitgraph = GitgraphJS.createGitgraph(container, {{
-            orientation: "vertical-reverse",
-            template: GitgraphJS.templateExtend("metro", {{
-                colors: ["#2196F3", "#4CAF50", "#FF9800", "#E91E63", "#9C27B0", "#00BCD4", "#FF5722", "#607D8B", "#8BC34A", "#FFC107"],
-                branch: {{
-                    lineWidth: 4,
-                    spacing: 40,
-                }},
-                commit: {{
-                    spacing: 45,
-                    dot: {{
-                        size: 10,
-                        strokeWidth: 2,
-                    }},
-                    message: {{
-                        displayHash: true,
-                        displayAuthor: true,
-                        font: "normal 10pt 'Consolas', 'Microsoft YaHei', 'Source Han Sans SC', sans-serif",
-                    }},
-                }},
-            }})
-        }});
+        const graph = {json.dumps(drawing, ensure_ascii=False, separators=(',', ':'))};
+        const SVG_NS = "http://www.w3.org/2000/svg";
+        const TEXT_GAP = 30, DOT_RADIUS = 5;
+
+        function svgElement(name, attrs) {{
+            const el = document.createElementNS(SVG_NS, name);
+            for (const key in attrs) el.setAttribute(key, attrs[key]);
+            return el;
+        }}
+
+        const svg = svgElement("svg", {{ height: graph.height }});
+        const edgeLayer = svg.appendChild(svgElement("g", {{ fill: "none", "stroke-width": 4 }}));
+        const dotLayer = svg.appendChild(svgElement("g", {{ "stroke-width": 2 }}));
+        const textLayer = svg.appendChild(svgElement("g", {{}}));
+        const textX = graph.width + TEXT_GAP;
 
-        const branches = {{}};
-        const commitToBranch = {{}};
-        const branchToLastCommit = new Map();
+        graph.edges.forEach(([color, points]) => {{
+            edgeLayer.appendChild(svgElement("polyline", {{ stroke: color, points: points.join(" ") }}));
+        }});
 
-        const main = gitgraph.branch({{
-            name: "main",
-            style: {{ label: {{ display: true }} }}
+        graph.commits.forEach(([x, y, color, hash, subject, author, date, refs]) => {{
+            dotLayer.appendChild(svgElement("circle", {{ cx: x, cy: y, r: DOT_RADIUS, fill: "#ffffff", stroke: color }}));
+            const text = textLayer.appendChild(svgElement("text", {{ x: textX, y: y }}));
+            text.appendChild(document.createTextNode(`${{hash}} `));
+            if (refs.length) {{
+                const refSpan = text.appendChild(svgElement("tspan", {{ class: "ref", fill: color }}));
+                refSpan.textContent = `(${{refs.join(", ")}}) `;
+            }}
+            text.appendChild(document.createTextNode(`${{subject}} - ${{author}} <${{date}}>`));
         }});
-        branches["main"] = main;
-        branchToLastCommit.set(main, null);
-
-        commitsData.forEach(c => {{
-            let targetBranch;
-            const firstParentHash = c.parents.length > 0 ? c.parents[0] : null;
-            
-            if (!firstParentHash) {{
-                targetBranch = branches["main"];
+
+        document.getElementById("graph-container").appendChild(svg);
+        // 文字宽度只有浏览器知道，绘制完成后再按实际内容设置画布宽度
+        svg.setAttribute("width", Math.ceil(textX + textLayer.getBBox().width + TEXT_GAP));
+    </script>
+</body>
+</html>
+"""
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(html_content)
+    print(f"HTML generated: {os.path.abspath(output_path)}")
+
+
+def _write_chunks(commits, layout, data_dir, chunk_size):
+    """
+    把布局结果切分为多个 JS 数据块，每块包含若干行提交以及与这些行相交的边
+    数据块以 window.__gitTreeChunk(i, {...}) 的形式保存，本地 file:// 打开时也能用 <script> 按需加载
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    n = len(layout)
+    chunk_count = (n + chunk_size - 1) // chunk_size
+    chunk_edges = [[] for _ in range(chunk_count)]
+    for edge_id, (child_row, child_lane, carry_lane, parent_row, parent_lane, color) in enumerate(layout.edges.tolist()):
+        end_row = child_row if parent_row < 0 else parent_row
+        color = LANE_COLORS[color]
+        for index in range(child_row // chunk_size, end_row // chunk_size + 1):
+            chunk_edges[index].append([edge_id, child_row, child_lane, carry_lane, parent_row, parent_lane, color])
+    for index in range(chunk_count):
+        start = index * chunk_size
+        rows = []
+        for row in range(start, min(start + chunk_size, n)):
+            record = commits.record(int(layout.order[row]))
+            lane = int(layout.lanes[row])
+            rows.append([lane, LANE_COLORS[layout.colors[row]], record["hash"], record["message"],
+                         record["author"], record["date"], record["refs"]])
+        payload = json.dumps({"start": start, "commits": rows, "edges": chunk_edges[index]},
+                             ensure_ascii=False, separators=(',', ':'))
+        with open(os.path.join(data_dir, f"chunk_{index:05d}.js"), "w", encoding="utf-8") as f:
+            f.write(f"window.__gitTreeChunk({index},{payload});\n")
+    return chunk_count
+
+
+@profiled()
+def generate_scalable_git_tree_html(commits, git_url, output_path="git_tree.html", chunk_size=1000, layout=None):
+    """
+    面向大仓库的 git 树页面：泳道布局在 Python 端预先算好，提交数据按块写入 <页面名>_data/ 目录，
+    浏览器只加载并绘制可视窗口内的行，页面打开时间与历史长度无关
+    :param commits: CommitTable 提交表
+    :param git_url: 页面标题中显示的仓库地址
+    :param output_path: 输出 HTML 路径
+    :param chunk_size: 每个数据块包含的提交数
+    :param layout: 预先计算好的 GraphLayout，不传则现场计算
+    """
+    if layout is None:
+        layout = compute_layout(commits)
+    data_dir = os.path.splitext(output_path)[0] + "_data"
+    chunk_count = _write_chunks(commits, layout, data_dir, chunk_size)
+    meta = {
+        "rows": len(layout),
+        "chunkSize": chunk_size,
+        "chunkCount": chunk_count,
+        "dataDir": os.path.basename(data_dir),
+    }
+    html_content = f"""
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Git Tree Visualization</title>
+    <style>
+        body {{
+            font-family: 'Consolas', 'Microsoft YaHei', 'Source Han Sans SC', sans-serif;
+            margin: 20px;
+            background-color: #f8f9fa;
+        }}
+        #graph-container {{
+            position: relative;
+            height: calc(100vh - 140px);
+            background: #ffffff;
+            border-radius: 12px;
+            box-shadow: 0 10px 30px rgba(0,0,0,0.1);
+            overflow: hidden;
+        }}
+        #graph-canvas {{ position: absolute; top: 0; left: 0; }}
+        #viewport {{ position: absolute; top: 0; left: 0; right: 0; bottom: 0; overflow-y: auto; }}
+        h1 {{
+            color: #2c3e50;
+            text-align: center;
+            margin-bottom: 30px;
+            font-size: 2.2em;
+            font-weight: 300;
+        }}
+    </style>
+</head>
+<body>
+    <h1>Git Repository History - {git_url}</h1>
+    <div id="graph-container">
+        <canvas id="graph-canvas"></canvas>
+        <div id="viewport"><div id="spacer"></div></div>
+    </div>
+
+    <script>
+        const META = {json.dumps(meta)};
+        const ROW_HEIGHT = 28, LANE_WIDTH = 16, LEFT = 24, DOT_RADIUS = 5, MAX_CHUNKS = 16;
+        const FONT = "normal 10pt 'Consolas', 'Microsoft YaHei', 'Source Han Sans SC', sans-serif";
+        const container = document.getElementById("graph-container");
+        const viewport = document.getElementById("viewport");
+        const canvas = document.getElementById("graph-canvas");
+        const ctx = canvas.getContext("2d");
+        document.getElementById("spacer").style.height = (META.rows * ROW_HEIGHT) + "px";
+
+        const chunks = new Map();
+        const pending = new Set();
+        let frameRequested = false;
+
+        window.__gitTreeChunk = function (index, data) {{
+            chunks.set(index, data);
+            pending.delete(index);
+            requestDraw();
+        }};
+
+        function loadChunk(index) {{
+            if (chunks.has(index) || pending.has(index)) return;
+            pending.add(index);
+            const script = document.createElement("script");
+            script.src = `${{META.dataDir}}/chunk_${{String(index).padStart(5, "0")}}.js`;
+            script.onload = () => script.remove();
+            document.head.appendChild(script);
+        }}
+
+        function visibleRange() {{
+            const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - 1);
+            const last = Math.min(META.rows - 1, Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_HEIGHT) + 1);
+            return [first, last];
+        }}
+
+        function evictChunks(keep) {{
+            // 只保留可视窗口附近的数据块，长时间滚动时内存保持有界
+            for (const index of chunks.keys()) {{
+                if (chunks.size <= MAX_CHUNKS) break;
+                if (!keep.has(index)) chunks.delete(index);
+            }}
+        }}
+
+        function resize() {{
+            const ratio = window.devicePixelRatio || 1;
+            canvas.width = container.clientWidth * ratio;
+            canvas.height = container.clientHeight * ratio;
+            canvas.style.width = container.clientWidth + "px";
+            canvas.style.height = container.clientHeight + "px";
+            ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+            requestDraw();
+        }}
+
+        function requestDraw() {{
+            if (frameRequested) return;
+            frameRequested = true;
+            requestAnimationFrame(() => {{ frameRequested = false; draw(); }});
+        }}
+
+        const laneX = lane => LEFT + lane * LANE_WIDTH;
+        const rowY = row => row * ROW_HEIGHT + ROW_HEIGHT / 2 - viewport.scrollTop;
+
+        function drawEdge(e) {{
+            const [, childRow, childLane, carryLane, parentRow, parentLane, color] = e;
+            ctx.strokeStyle = color;
+            ctx.lineWidth = 2;
+            ctx.beginPath();
+            ctx.moveTo(laneX(childLane), rowY(childRow));
+            if (parentRow < 0) {{
+                ctx.lineTo(laneX(childLane), rowY(childRow) + ROW_HEIGHT / 2);
+            }} else if (parentRow === childRow + 1) {{
+                ctx.lineTo(laneX(parentLane), rowY(parentRow));
             }} else {{
-                let parentBranch = commitToBranch[firstParentHash] || branches["main"];
-                
-                if (branchToLastCommit.get(parentBranch) === firstParentHash) {{
-                    targetBranch = parentBranch;
-                }} else {{
-                    targetBranch = parentBranch.branch({{
-                        name: `diverge-${{c.hash}}`,
-                        style: {{ label: {{ display: false }} }}
-                    }});
-                }}
+                ctx.lineTo(laneX(carryLane), rowY(childRow + 1));
+                ctx.lineTo(laneX(carryLane), rowY(parentRow - 1));
+                ctx.lineTo(laneX(parentLane), rowY(parentRow));
             }}
+            ctx.stroke();
+        }}
 
-            c.refs.forEach(ref => {{
-                if (ref.startsWith('refs/heads/') || (ref.startsWith('origin/') && !ref.includes('HEAD'))) {{
-                    const bName = ref.replace('refs/heads/', '').replace('origin/', '');
-                    if (!branches[bName]) {{
-                        branches[bName] = targetBranch.branch({{
-                            name: bName,
-                            style: {{ label: {{ display: true }} }}
-                        }});
-                    }}
-                    targetBranch = branches[bName];
+        function draw() {{
+            const [first, last] = visibleRange();
+            const needed = new Set();
+            for (let i = Math.floor(first / META.chunkSize); i <= Math.floor(last / META.chunkSize); i++) {{
+                needed.add(i);
+                loadChunk(i);
+            }}
+            evictChunks(needed);
+            ctx.clearRect(0, 0, container.clientWidth, container.clientHeight);
+
+            const drawn = new Set();
+            let maxLane = 0;
+            const rows = [];
+            for (const index of needed) {{
+                const chunk = chunks.get(index);
+                if (!chunk) continue;
+                for (const e of chunk.edges) {{
+                    const end = e[4] < 0 ? e[1] : e[4];
+                    if (drawn.has(e[0]) || end < first || e[1] > last) continue;
+                    drawn.add(e[0]);
+                    maxLane = Math.max(maxLane, e[2], e[3], e[5]);
+                    drawEdge(e);
                 }}
-            }});
-
-            const commitOptions = {{
-                hash: c.hash,
-                subject: c.message,
-                author: `${{c.author}} <${{c.date}}>`
-            }};
-
-            if (c.parents.length > 1) {{
-                let mergedSomething = false;
-                for (let i = 1; i < c.parents.length; i++) {{
-                    const otherBranch = commitToBranch[c.parents[i]];
-                    if (otherBranch && otherBranch !== targetBranch) {{
-                        targetBranch.merge({{
-                            branch: otherBranch,
-                            commitOptions: commitOptions
-                        }});
-                        mergedSomething = true;
-                        break; 
+                chunk.commits.forEach((c, k) => {{
+                    const row = chunk.start + k;
+                    if (row >= first && row <= last) {{
+                        rows.push([row, c]);
+                        maxLane = Math.max(maxLane, c[0]);
                     }}
-                }}
+                }});
+            }}
 
-                if (mergedSomething) {{
-                    commitToBranch[c.hashFull] = targetBranch;
-                    branchToLastCommit.set(targetBranch, c.hashFull);
-                    return;
-                }}
+            const textX = laneX(maxLane + 1);
+            ctx.font = FONT;
+            ctx.textBaseline = "middle";
+            for (const [row, c] of rows) {{
+                const [lane, color, hash, subject, author, date, refs] = c;
+                const y = rowY(row);
+                ctx.fillStyle = "#ffffff";
+                ctx.strokeStyle = color;
+                ctx.lineWidth = 2;
+                ctx.beginPath();
+                ctx.arc(laneX(lane), y, DOT_RADIUS, 0, 2 * Math.PI);
+                ctx.fill();
+                ctx.stroke();
+                const refText = refs.length ? `(${{refs.join(", ")}}) ` : "";
+                ctx.fillStyle = "#2c3e50";
+                ctx.fillText(`${{hash}} ${{refText}}${{subject}} - ${{author}} <${{date}}>`, textX, y);
             }}
+        }}
 
-            targetBranch.commit(commitOptions);
-            commitToBranch[c.hashFull] = targetBranch;
-            branchToLastCommit.set(targetBranch, c.hashFull);
-        }});
+        viewport.addEventListener("scroll", requestDraw);
+        window.addEventListener("resize", resize);
+        resize();
     </script>
 </body>
 </html>
 """
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(html_content)
-    print(f"HTML generated: {os.path.abspath(output_path)}")
+    print(f"HTML generated: {os.path.abspath(output_path)} ({chunk_count} data chunks)")
@@ -1,37 +1,230 @@
+"""
+开源仓库提交历史分析器
+用法: python main.py [history | charts | tree | all] [选项]
+选项写在子命令之前或之后都可以，例如 python main.py --no-fetch charts
+
+- history  克隆/更新仓库并刷新本地历史缓存
+- charts   在 history 的基础上生成统计图
+- tree     在 history 的基础上生成 git 树页面
+- all      依次生成统计图与 git 树页面；不写子命令时等同于 all，与旧版命令行兼容
+matplotlib、GitPython、页面生成等较重的模块只在对应子命令真正用到时才导入，启动耗时见 benchmark.py --startup
+"""
 import os
-import json
-import git
-from datetime import datetime
-from html_generator import generate_git_tree_html
-import analyze
+import sys
+import argparse
+import subprocess
+from history_cache import HistoryCache
+from ref_index import build_ref_index
+from selection import HistorySelection, add_selection_arguments, selection_from_args, validate_selection
+import commit_reader
+import profiling
+from acquire import CLONE_MODES, acquire_sync, origin_url
+from gitcmd import error_message
 
 GIT_URL = "https://github.com/Neutree/COMTool.git"
 REPO_PATH = "./repo"
 
-def clone_repo(url, path):
+@profiling.profiled()
+def clone_repo(url, path, mode="full", depth=None, fetch=True):
+    """
+    克隆仓库，已存在时从其 origin 增量 fetch，fetch 失败时继续使用本地数据
+    :param mode: full / bare / mirror / partial，见 acquire.py
+    :param depth: 浅克隆深度，None 表示完整历史
+    :param fetch: 仓库已存在时是否 fetch
+    """
     if not os.path.exists(path):
-        print(f"Cloning {url} to {path}...")
-        git.Repo.clone_from(url, path)
-    else:
-        print(f"Repo already exists at {path}")
+        print(f"Cloning {url} to {path} ({mode})...")
+    elif fetch and (origin := origin_url(path)):
+        print(f"Fetching origin ({origin}) into {path}...")
+    acquire_sync(url, path, mode, depth, fetch)
+    import git
     return git.Repo(path)
 
-def get_git_history(repo, limit=100):
-    commits = []
-    for commit in repo.iter_commits('--all', max_count=limit, topo_order=True):
-        commits.append({
-            "hash": commit.hexsha[:7],
-            "hashFull": commit.hexsha,
-            "author": commit.author.name,
-            "date": datetime.fromtimestamp(commit.authored_date).strftime('%Y-%m-%d %H:%M'),
-            "message": commit.message.strip().split('\n')[0],
-            "parents": [p.hexsha for p in commit.parents],
-            "refs": [ref.name for ref in repo.refs if hasattr(ref, 'commit') and ref.commit == commit]
-        })
-    return commits[::-1]
+@profiling.profiled()
+def get_git_history(repo, limit=100, cache=None, ref_index=None, selection=None, backend="catfile", workers=1):
+    """
+    :param limit: 读取最新的 limit 个提交(--all)，传入 selection 时忽略
+    :param selection: HistorySelection，指定版本范围、日期范围与提交数
+    :param backend: 不使用缓存时的读取方式，catfile 直接批量解析原始提交对象，gitpython 逐个构造 Commit 对象
+    :param workers: catfile 方式分片解析提交对象的进程数，1 表示单进程，None 表示 CPU 核数
+    """
+    # 提交表依赖 numpy，只刷新缓存(history)时不需要
+    from commit_table import CommitTableBuilder
+    if selection is None:
+        selection = HistorySelection(max_count=limit)
+    # 引用索引只构建一次，每个提交的 refs 查询为常数时间
+    if ref_index is None:
+        ref_index = build_ref_index(repo.git_dir)
+    builder = CommitTableBuilder()
+    if cache is not None:
+        # 缓存已由 refresh() 或 refresh_selection() 同步，这里只需按拓扑顺序取出选中的提交
+        shas = cache.ordered_shas(repo.git_dir, selection.max_count, selection.rev_args())
+        for sha, authored_date, author, message, parents in cache.commit_rows(shas):
+            builder.append(sha, authored_date, author, message, parents, ref_index.refs_for(sha))
+    elif backend == "catfile":
+        for sha, authored_date, author, message, parents in commit_reader.iter_commits(
+                repo.git_dir, selection.rev_args(), selection.max_count, workers):
+            builder.append(sha, authored_date, author, message, parents, ref_index.refs_for(sha))
+    else:
+        for commit in repo.iter_commits(selection.rev_args(), max_count=selection.max_count, topo_order=True):
+            builder.append(commit.hexsha, commit.authored_date, commit.author.name,
+                           commit.message.strip().split('\n')[0],
+                           [p.hexsha for p in commit.parents],
+                           ref_index.refs_for(commit.hexsha))
+    # git 从新到旧输出，提交表按从旧到新存放
+    return builder.build(reverse=True)
+
+COMMANDS = {
+    'history': '克隆/更新仓库并刷新历史缓存',
+    'charts': '生成统计图',
+    'tree': '生成 git 树页面',
+    'all': '生成统计图与 git 树页面(默认)',
+}
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--profile", choices=profiling.EXPORT_FORMATS, default=None,
+                        help="记录各阶段的耗时、CPU、子进程数、git 对象数与峰值内存，并以指定格式导出")
+    common.add_argument("--profile-output", default=None,
+                        help="性能数据输出文件，默认 table 打印到终端，json/chrome 写入当前目录")
+    common.add_argument("--clone-mode", choices=CLONE_MODES, default="mirror",
+                        help="克隆模式：分析只读取历史，默认 mirror 不检出工作区；partial 不下载文件内容")
+    common.add_argument("--depth", type=int, default=None, help="浅克隆深度，默认获取完整历史")
+    common.add_argument("--no-fetch", action="store_true",
+                        help="仓库已存在时不 fetch，直接分析本地数据(离线使用)")
+    common.add_argument("--history-workers", type=int, default=None,
+                        help="分片并行读取历史(numstat)的进程数，默认为 CPU 核数，1 表示单次遍历；结果与单次遍历相同")
+    common.add_argument("--backfill", action="store_true",
+                        help="把整个历史(--all)写入缓存；默认只补齐本次选择范围内缺失的提交，大仓库首次运行只计算选中提交的 diff")
+    add_selection_arguments(common)
+
+    charts = argparse.ArgumentParser(add_help=False)
+    charts.add_argument("--workers", type=int, default=1,
+                        help="并行渲染统计图的进程数，默认 1 表示串行渲染")
+    charts.add_argument("--streaming", action="store_true",
+                        help="按时间正序单次流式遍历历史计算统计图数据，内存占用与历史长度无关(--full-history 时默认开启)")
+    # 取值在 prepare_charts 中按 analyze.OUTPUT_FORMATS 校验，构建命令行时不导入 analyze
+    charts.add_argument("--format", default="png",
+                        help="统计图输出格式：png、png-fast(低分辨率快速编码)、svg(矢量)、json(Chart.js 配置)")
+    charts.add_argument("--force-render", action="store_true",
+                        help="忽略渲染清单重新渲染全部图表，默认跳过数据与上次相同的图表")
+    charts.add_argument("--approx", action="store_true",
+                        help="超大仓库使用内存与提交数无关的近似统计(Space-Saving/HyperLogLog/t-digest，隐含 --streaming)，"
+                             "误差范围标注在图表上；不生成分支与 ahead/behind 图")
+    charts.add_argument("--ownership", action="store_true",
+                        help="用 git blame 统计各作者存活的代码行数(结果按文件版本缓存)")
+    charts.add_argument("--ownership-samples", type=int, default=8,
+                        help="代码归属趋势在 HEAD 历史上按时间采样的版本数，默认 8")
+    charts.add_argument("--blame-workers", type=int, default=None, help="并行 blame 的线程数，默认为 CPU 核数")
+    charts.add_argument("--rules", default=None,
+                        help="提交信息分类规则集的 JSON 文件，替换同名的关键词/提交类型规则，格式见 classifier.load_rulesets")
+
+    tree = argparse.ArgumentParser(add_help=False)
+    tree.add_argument("--tree-mode", choices=["single", "scalable"], default="single",
+                      help="git 树页面模式：single 为单文件 SVG 页面，scalable 为分块加载的虚拟滚动页面")
+
+    parser = argparse.ArgumentParser(description="开源仓库提交历史分析器",
+                                     epilog="选项写在子命令之前或之后都可以；不写子命令时等同于 all")
+    commands = parser.add_subparsers(dest="command", metavar="{" + ",".join(COMMANDS) + "}")
+    parents = {'history': [common], 'charts': [common, charts], 'tree': [common, tree], 'all': [common, charts, tree]}
+    for name, description in COMMANDS.items():
+        commands.add_parser(name, parents=parents[name], help=description, description=description)
+    return parser
+
+def _value_options(parser):
+    """parser 及其子命令中需要取值的选项字符串，例如 --depth；--no-fetch 这类开关不在其中"""
+    options = set()
+    for action in parser._actions:
+        if isinstance(action, argparse._SubParsersAction):
+            for command in action.choices.values():
+                options |= _value_options(command)
+        elif action.nargs != 0:
+            options.update(action.option_strings)
+    return options
+
+def parse_args(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    if argv and argv[0] in ("-h", "--help"):
+        return parser.parse_args(argv)
+    # 子命令可以出现在选项之后，找到后移到最前面；跳过选项的取值，避免把 --since all 之类当成子命令
+    takes_value = _value_options(parser)
+    index = 0
+    while index < len(argv) and argv[index] != "--":
+        if argv[index] in COMMANDS:
+            return parser.parse_args([argv[index]] + argv[:index] + argv[index + 1:])
+        index += 2 if argv[index] in takes_value else 1
+    # 不带子命令时等同于 all
+    return parser.parse_args(["all"] + argv)
+
+def run_history(args, selection):
+    repo = clone_repo(GIT_URL, REPO_PATH, args.clone_mode, args.depth, fetch=not args.no_fetch)
+    try:
+        validate_selection(repo.git_dir, selection)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    ref_index = build_ref_index(repo.git_dir)
+    cache = HistoryCache.open_for_repo(REPO_PATH)
+    if args.backfill:
+        added = cache.refresh(repo.git_dir, ref_index, args.history_workers)
+    else:
+        added = cache.refresh_selection(repo.git_dir, selection.max_count, selection.rev_args(),
+                                        args.history_workers, ref_index)
+    print(f"历史缓存已更新: 新增 {added} 个提交 ({cache.path})")
+    return repo, ref_index, cache
+
+def prepare_charts(args):
+    # 在克隆之前检查输出格式并加载规则集，参数有误时尽早退出
+    import analyze
+    import classifier
+    if args.format not in analyze.OUTPUT_FORMATS:
+        raise SystemExit(f"未知的输出格式: {args.format}，可选 {', '.join(analyze.OUTPUT_FORMATS)}")
+    if args.rules:
+        try:
+            names = classifier.load_rulesets(args.rules)
+        except ValueError as e:
+            raise SystemExit(f"规则文件 {args.rules} 有误: {e}")
+        print(f"已加载分类规则集: {', '.join(names)}")
+
+def run_charts(args, selection, repo, ref_index, cache, commits):
+    import analyze
+    analyze.run_all_analysis(repo, commits, output_dir="reports", prefix="comtool_",
+                             cache=cache, ref_index=ref_index, workers=args.workers,
+                             streaming=args.streaming or args.full_history, selection=selection,
+                             ownership_samples=args.ownership_samples if args.ownership else 0,
+                             blame_workers=args.blame_workers, approx=args.approx,
+                             output_format=args.format, force_render=args.force_render,
+                             history_workers=args.history_workers)
+
+def run_tree(args, commits):
+    from html_generator import generate_git_tree_html, generate_scalable_git_tree_html
+    if args.tree_mode == "scalable":
+        generate_scalable_git_tree_html(commits, GIT_URL)
+    else:
+        generate_git_tree_html(commits, GIT_URL)
+
+def main(argv=None):
+    args = parse_args(argv)
+    selection = selection_from_args(args)
+    if args.command in ("charts", "all"):
+        prepare_charts(args)
+    profiler = profiling.Profiler().enable() if args.profile else None
+
+    try:
+        repo, ref_index, cache = run_history(args, selection)
+        if args.command != "history":
+            print(f"分析范围: {selection.describe()}")
+            commits = get_git_history(repo, cache=cache, ref_index=ref_index, selection=selection)
+            if args.command in ("charts", "all"):
+                run_charts(args, selection, repo, ref_index, cache, commits)
+            if args.command in ("tree", "all"):
+                run_tree(args, commits)
+    except subprocess.CalledProcessError as e:
+        # 克隆失败或读取历史时 git 出错：只输出 git 的错误信息，不打印调用栈
+        raise SystemExit(f"git 命令失败: {error_message(e)}")
+    if profiler is not None:
+        profiler.disable()
+        profiler.write(args.profile, args.profile_output)
 
 if __name__ == "__main__":
-    repo = clone_repo(GIT_URL, REPO_PATH)
-    commits = get_git_history(repo, 300)
-    analyze.run_all_analysis(repo, commits, output_dir="reports", prefix="comtool_")
-    generate_git_tree_html(commits, GIT_URL)
+    main()
@@ -0,0 +1,211 @@
+import subprocess
+from gitcmd import popen_git, close_git, write_input, iter_nul_tokens
+from profiling import count, profiled
+from shards import map_shards, parallel, rev_list
+
+# 每个提交的头部用 \x01 标记，后面紧跟 `--numstat -z` 输出的文件行
+_HEADER_MARK = b'\x01'
+
+
+class NumstatTable:
+    """
+    逐提交、逐文件的新增/删除行数表
+    文件行按提交顺序连续存放，offsets[i]:offsets[i+1] 为第 i 个提交的文件区间
+    renames 只在需要时加载：{sha: [(旧路径, 新路径), ...]}，文件行本身不做重命名检测
+    """
+
+    def __init__(self):
+        self.shas = []
+        self.authored_dates = []
+        self.offsets = [0]
+        self.paths = []
+        self.insertions = []
+        self.deletions = []
+        self.renames = {}
+
+    def __len__(self):
+        return len(self.shas)
+
+    def append_commit(self, sha, authored_date, files):
+        self.shas.append(sha)
+        self.authored_dates.append(authored_date)
+        for path, ins, dels in files:
+            self.paths.append(path)
+            self.insertions.append(ins)
+            self.deletions.append(dels)
+        self.offsets.append(len(self.paths))
+
+    def extend(self, other):
+        """把另一张表的提交依次接在后面(分片读取后按分片顺序拼接)"""
+        base = len(self.paths)
+        self.shas.extend(other.shas)
+        self.authored_dates.extend(other.authored_dates)
+        self.offsets.extend(base + offset for offset in other.offsets[1:])
+        self.paths.extend(other.paths)
+        self.insertions.extend(other.insertions)
+        self.deletions.extend(other.deletions)
+        self.renames.update(other.renames)
+
+    def files(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return list(zip(self.paths[start:end], self.insertions[start:end], self.deletions[start:end]))
+
+    def file_count(self, i):
+        return self.offsets[i + 1] - self.offsets[i]
+
+    def total(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return sum(self.insertions[start:end]), sum(self.deletions[start:end])
+
+    def head(self, n):
+        """返回只包含前 n 个提交的新表，n 为 None 时返回全部"""
+        table = NumstatTable()
+        n = len(self) if n is None else min(n, len(self))
+        end = self.offsets[n]
+        table.shas = self.shas[:n]
+        table.authored_dates = self.authored_dates[:n]
+        table.offsets = self.offsets[:n + 1]
+        table.paths = self.paths[:end]
+        table.insertions = self.insertions[:end]
+        table.deletions = self.deletions[:end]
+        if self.renames:
+            table.renames = {sha: self.renames[sha] for sha in table.shas if sha in self.renames}
+        return table
+
+
+def _parse_count(value):
+    # 二进制文件在 numstat 中显示为 "-"，与 GitPython 的 commit.stats 一致按 0 计
+    return 0 if value == b'-' else int(value)
+
+
+def iter_numstat(repo_path, revs=('--all',), max_count=None, topo_order=True, shas=None):
+    """
+    单次 `git log --numstat -z` 流式遍历，逐个产出 (sha, authored_date, files)
+    files 为 [(path, insertions, deletions), ...]
+    合并提交与 GitPython 的 commit.stats 保持一致：只和第一个父提交比较，且不做重命名检测
+    :param repo_path: 仓库路径
+    :param revs: 传给 git log 的版本范围
+    :param max_count: 最多遍历的提交数，None 表示不限制
+    :param topo_order: 是否按拓扑顺序输出
+    :param shas: 只统计这些提交(按给定顺序)，通过标准输入传给 git，此时忽略 revs
+    """
+    args = ['log', '-z', '--numstat', '--no-renames', '--diff-merges=first-parent',
+            '--format=%x01%H %at']
+    if topo_order:
+        args.append('--topo-order')
+    if max_count is not None:
+        args.append(f'--max-count={max_count}')
+    if shas is None:
+        args.extend(revs)
+        args.append('--')
+        proc = popen_git(repo_path, *args)
+    else:
+        args.extend(['--no-walk=unsorted', '--stdin'])
+        proc = popen_git(repo_path, *args, stdin=subprocess.PIPE)
+        write_input(proc, ''.join(f'{sha}\n' for sha in shas).encode('ascii'))
+    current, done = None, False
+    try:
+        for token in iter_nul_tokens(proc.stdout):
+            token = token.lstrip(b'\n')
+            if not token:
+                continue
+            if token.startswith(_HEADER_MARK):
+                if current is not None:
+                    yield current
+                count('git_objects')
+                sha, date = token[1:].split(b' ')
+                current = (sha.decode('ascii'), int(date), [])
+                continue
+            ins, dels, path = token.split(b'\t', 2)
+            current[2].append((path.decode('utf-8', 'replace'), _parse_count(ins), _parse_count(dels)))
+        if current is not None:
+            yield current
+        done = True
+    finally:
+        close_git(proc, check=done)
+
+
+def iter_renames(repo_path, shas):
+    """
+    对给定的提交做重命名检测(与第一个父提交比较)，逐个产出 (sha, [(旧路径, 新路径), ...])，没有重命名的提交不产出
+    需要额外计算一次 diff，只在需要路径连续性(path_trie)时调用
+    """
+    proc = popen_git(repo_path, 'log', '-z', '--no-walk=unsorted', '--stdin', '-M', '--diff-filter=R',
+                     '--name-status', '--diff-merges=first-parent', '--format=%x01%H', stdin=subprocess.PIPE)
+    write_input(proc, ''.join(f'{sha}\n' for sha in shas).encode('ascii'))
+    sha, renames, pending = None, [], []
+    done = False
+    try:
+        for token in iter_nul_tokens(proc.stdout):
+            token = token.lstrip(b'\n')
+            if not token:
+                continue
+            if token.startswith(_HEADER_MARK):
+                if renames:
+                    yield sha, renames
+                sha, renames, pending = token[1:].decode('ascii'), [], []
+                continue
+            # 每个重命名依次为 "R<相似度>"、旧路径、新路径三段
+            pending.append(token)
+            if len(pending) == 3:
+                renames.append((pending[1].decode('utf-8', 'replace'), pending[2].decode('utf-8', 'replace')))
+                pending = []
+        if renames:
+            yield sha, renames
+        done = True
+    finally:
+        close_git(proc, check=done)
+
+
+def _numstat_shard(repo_path, shas):
+    table = NumstatTable()
+    for sha, authored_date, files in iter_numstat(repo_path, topo_order=False, shas=shas):
+        table.append_commit(sha, authored_date, files)
+    return table
+
+
+def _renames_shard(repo_path, shas):
+    return dict(iter_renames(repo_path, shas))
+
+
+def iter_numstat_sharded(repo_path, shas, workers=None):
+    """
+    与 iter_numstat(repo_path, topo_order=False, shas=shas) 的产出相同，各分片在工作进程中读取(见 shards.py)
+    :param workers: 工作进程数，1 表示在当前进程中单次遍历，None 表示 CPU 核数
+    """
+    if not parallel(workers):
+        yield from iter_numstat(repo_path, topo_order=False, shas=shas)
+        return
+    for table in map_shards(_numstat_shard, repo_path, shas, workers):
+        for i, sha in enumerate(table.shas):
+            yield sha, table.authored_dates[i], table.files(i)
+
+
+def iter_renames_sharded(repo_path, shas, workers=None):
+    """与 iter_renames 的产出相同，各分片在工作进程中读取"""
+    if not parallel(workers):
+        yield from iter_renames(repo_path, shas)
+        return
+    for renames in map_shards(_renames_shard, repo_path, shas, workers, objects=False):
+        yield from renames.items()
+
+
+@profiled()
+def load_numstat(repo_path, revs=('--all',), max_count=None, topo_order=True, renames=False, workers=1):
+    """
+    把 iter_numstat 的结果收集为 NumstatTable，供所有基于 diff 的图表共用
+    :param renames: 是否同时加载重命名信息(额外一次 diff)
+    :param workers: 读取 numstat 的工作进程数，1 表示单次 `git log` 遍历，None 表示 CPU 核数；
+                    多进程时先由 rev-list 确定提交顺序再分片读取，结果与单次遍历相同
+    """
+    table = NumstatTable()
+    if not parallel(workers):
+        for sha, authored_date, files in iter_numstat(repo_path, revs, max_count, topo_order):
+            table.append_commit(sha, authored_date, files)
+    else:
+        shas = rev_list(repo_path, revs, max_count, topo_order)
+        for part in map_shards(_numstat_shard, repo_path, shas, workers):
+            table.extend(part)
+    if renames:
+        table.renames = dict(iter_renames_sharded(repo_path, table.shas, workers))
+    return table
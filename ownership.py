@@ -0,0 +1,126 @@
+"""
+代码归属(按人)分析：统计某个版本中每位作者仍然存活的代码行数，并在历史上按时间采样观察变化
+- 每个文件用 `git blame --incremental` 计算，只解析按行区间输出的归属记录，不逐行读取文件内容
+- 结果以 (blob sha, 路径) 为键缓存在 HistoryCache 中，文件内容与路径都未变化时不会再次 blame
+- 需要 blame 的文件在线程池中并行处理(每个线程只等待一个 git 子进程)，写缓存在主线程中完成
+"""
+import os
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from gitcmd import run_git
+from profiling import profiled
+
+
+def text_files(repo_path, rev='HEAD'):
+    """
+    列出 rev 中的文本文件，返回 [(blob sha, 路径), ...]
+    二进制文件(git grep -I 判定)与空文件没有可归属的行，直接跳过
+    """
+    out = run_git(repo_path, 'ls-tree', '-r', '-z', rev)
+    blobs = {}
+    for entry in out.split(b'\0'):
+        if not entry:
+            continue
+        meta, path = entry.split(b'\t', 1)
+        mode, kind, sha = meta.split()
+        if kind == b'blob' and mode != b'120000':
+            blobs[path.decode('utf-8', 'replace')] = sha.decode('ascii')
+    try:
+        out = run_git(repo_path, 'grep', '-I', '-l', '-z', '-e', '', rev, '--')
+    except subprocess.CalledProcessError:
+        # 没有任何文本文件时 git grep 返回 1
+        return []
+    prefix = len(rev) + 1
+    paths = [token.decode('utf-8', 'replace')[prefix:] for token in out.split(b'\0') if token]
+    return [(blobs[path], path) for path in paths if path in blobs]
+
+
+def blame_counts(repo_path, rev, path):
+    """
+    对一个文件执行 `git blame --incremental`，返回 {作者: 存活行数}
+    incremental 格式每段连续行只输出一条 "<sha> <原行号> <结果行号> <行数>" 记录，提交的作者信息只在首次出现时给出
+    """
+    out = run_git(repo_path, 'blame', '--incremental', rev, '--', path)
+    lines_by_commit = Counter()
+    authors = {}
+    current = None
+    for line in out.split(b'\n'):
+        parts = line.split(b' ')
+        if len(parts) == 4 and len(parts[0]) == 40:
+            current = parts[0]
+            lines_by_commit[current] += int(parts[3])
+        elif parts[0] == b'author' and current not in authors:
+            authors[current] = line[7:].decode('utf-8', 'replace')
+    counts = Counter()
+    for sha, n in lines_by_commit.items():
+        counts[authors.get(sha, '')] += n
+    return counts
+
+
+@profiled()
+def ownership_at(repo_path, rev='HEAD', cache=None, workers=None, memo=None):
+    """
+    统计 rev 中每位作者存活的行数
+    :param cache: HistoryCache，传入时读写其中的 blame 缓存
+    :param workers: blame 线程数，默认为 CPU 核数
+    :param memo: 同一次分析中跨多个版本共用的内存缓存 {(blob, 路径): Counter}
+    :return: Counter {作者: 行数}
+    """
+    files = text_files(repo_path, rev)
+    memo = {} if memo is None else memo
+    missing = [key for key in files if key not in memo]
+    if cache is not None and missing:
+        memo.update(cache.blame_results(missing))
+        missing = [key for key in missing if key not in memo]
+    if missing:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            futures = {pool.submit(blame_counts, repo_path, rev, path): (blob, path) for blob, path in missing}
+            for future in as_completed(futures):
+                key = futures[future]
+                memo[key] = future.result()
+                if cache is not None:
+                    cache.store_blame(*key, memo[key])
+        if cache is not None:
+            cache.conn.commit()
+    total = Counter()
+    for key in files:
+        total.update(memo[key])
+    return total
+
+
+def sample_revisions(repo_path, rev='HEAD', samples=8):
+    """
+    在 rev 的第一父提交历史上按时间等间隔选取 samples 个版本(最后一个即 rev 本身)
+    每个采样点取不晚于目标时间的最新提交，历史较短时采样点会少于 samples 个
+    :return: 从旧到新的 [(sha, 提交时间), ...]
+    """
+    out = run_git(repo_path, 'rev-list', '--first-parent', '--timestamp', '--reverse', rev, '--')
+    history = [(sha, int(ts)) for ts, sha in (line.split() for line in out.decode('ascii').splitlines())]
+    if not history:
+        return []
+    if samples <= 1 or len(history) == 1:
+        return history[-1:]
+    start, end = history[0][1], history[-1][1]
+    picked = []
+    k = 0
+    for i in range(samples):
+        target = start + (end - start) * i / (samples - 1)
+        while k + 1 < len(history) and history[k + 1][1] <= target:
+            k += 1
+        if not picked or picked[-1] != history[k]:
+            picked.append(history[k])
+    if picked[-1] != history[-1]:
+        picked.append(history[-1])
+    return picked
+
+
+@profiled()
+def ownership_history(repo_path, rev='HEAD', samples=8, cache=None, workers=None):
+    """
+    在按时间采样的各个版本上统计代码归属，相邻版本间未变化的文件直接复用 blame 结果
+    :return: 从旧到新的 [(提交时间, Counter {作者: 行数}), ...]，最后一项为 rev
+    """
+    memo = {}
+    return [(ts, ownership_at(repo_path, sha, cache, workers, memo))
+            for sha, ts in sample_revisions(repo_path, rev, samples)]
@@ -0,0 +1,265 @@
+"""
+变更路径的前缀树索引
+把 NumstatTable 中每一次文件改动挂到路径前缀树的叶子上，每个节点保存子树内的改动次数、新增/删除行数，
+因此任意深度的目录热点、最活跃的子树、后缀统计都只需遍历树节点；子树内的改动在按先序排列的数组中连续存放，
+某个子树随时间的 churn 只需切出对应区间
+传入重命名信息时，文件改名之前的改动按时间顺序归并到改名后的路径，子树的历史不会因为搬迁而中断
+
+    trie = PathTrie.from_numstat(numstat, numstat.renames)
+    trie.hotspots(depth=2)
+    trie.top_subtrees(10)
+    keys, values = trie.churn_series('src/core', bucket='month')
+"""
+import os
+from bisect import bisect_left, bisect_right
+import numpy as np
+from commit_table import local_utc_offsets
+from rollup import bucket_keys
+
+# 位于仓库根目录的文件在目录热点中的标签
+ROOT_LABEL = '根目录 (root)'
+METRICS = ('changes', 'insertions', 'deletions', 'churn')
+
+
+def file_extension(path):
+    return os.path.splitext(path)[1].lower() or '无后缀'
+
+
+class RenameMap:
+    """
+    按时间生效的重命名别名表
+    :param renames: [(位置, 旧路径, 新路径), ...]，位置为从旧到新的提交序号
+    某个路径在位置 pos 的改动，沿 pos 及之后发生的重命名依次追踪到最终的路径；
+    路径被改名后又重新创建时，重新创建之后的改动不会并入改名后的文件
+    """
+
+    def __init__(self, renames):
+        self.index = {}
+        for pos, old, new in sorted(renames, key=lambda r: r[0]):
+            positions, targets = self.index.setdefault(old, ([], []))
+            positions.append(pos)
+            targets.append(new)
+        self._memo = {}
+
+    @classmethod
+    def from_numstat(cls, numstat, renames):
+        """
+        :param numstat: NumstatTable(最新提交在前)
+        :param renames: {sha: [(旧路径, 新路径), ...]}
+        """
+        n = len(numstat)
+        return cls([(n - 1 - i, old, new)
+                    for i, sha in enumerate(numstat.shas) for old, new in renames.get(sha, ())])
+
+    def __len__(self):
+        return sum(len(positions) for positions, _ in self.index.values())
+
+    def resolve(self, path, pos):
+        # 改名提交本身的改动(--no-renames 下表现为旧路径删除、新路径新增)也归到新路径，之后只追踪更晚的改名
+        chain = []
+        search = bisect_left
+        while True:
+            entry = self.index.get(path)
+            if entry is None:
+                break
+            k = search(entry[0], pos)
+            if k == len(entry[0]):
+                break
+            key = (path, k)
+            if key in self._memo:
+                path = self._memo[key]
+                break
+            chain.append(key)
+            pos, path = entry[0][k], entry[1][k]
+            search = bisect_right
+        for key in chain:
+            self._memo[key] = path
+        return path
+
+
+class PathTrie:
+    """
+    节点 0 为仓库根目录；每个节点对应一个路径前缀，names / parents / depths / children 按节点编号存放
+    - file[指标][节点]: 恰好是该路径的文件的改动合计
+    - subtree[指标][节点]: 子树内全部文件的改动合计
+    - direct[指标][节点]: 直接位于该目录下的文件的改动合计
+    指标见 METRICS，churn 为新增与删除行数之和；*_first 为最早出现的改动序号(numstat 中越新越小)，用于并列时排序
+    """
+
+    def __init__(self):
+        self.names = ['']
+        self.parents = [-1]
+        self.depths = [0]
+        self.children = [{}]
+
+    def __len__(self):
+        return len(self.names)
+
+    def _insert(self, path):
+        node = 0
+        for name in path.split('/'):
+            child = self.children[node].get(name)
+            if child is None:
+                child = len(self.names)
+                self.names.append(name)
+                self.parents.append(node)
+                self.depths.append(self.depths[node] + 1)
+                self.children.append({})
+                self.children[node][name] = child
+            node = child
+        return node
+
+    @classmethod
+    def from_numstat(cls, numstat, renames=None):
+        """
+        :param numstat: NumstatTable(拓扑顺序，最新提交在前)，通常为 numstat.head(limit)
+        :param renames: {sha: [(旧路径, 新路径), ...]}，传入时按 RenameMap 把改动归并到改名后的路径
+        """
+        trie = cls()
+        n = len(numstat)
+        offsets = np.asarray(numstat.offsets, dtype=np.int64)
+        commit_of = np.repeat(np.arange(n, dtype=np.int64), np.diff(offsets))
+        paths = numstat.paths
+        if renames:
+            rename_map = RenameMap.from_numstat(numstat, renames)
+            paths = [rename_map.resolve(path, n - 1 - c) for path, c in zip(paths, commit_of.tolist())]
+        # 相同路径只插入一次
+        leaf_of_path = {}
+        leaf_ids = np.fromiter((leaf_of_path.setdefault(path, len(leaf_of_path)) for path in paths),
+                               dtype=np.int64, count=len(paths))
+        leaf_nodes = np.array([trie._insert(path) for path in leaf_of_path], dtype=np.int64)
+        change_nodes = leaf_nodes[leaf_ids] if len(paths) else np.zeros(0, dtype=np.int64)
+
+        size = len(trie)
+        insertions = np.asarray(numstat.insertions, dtype=np.int64)
+        deletions = np.asarray(numstat.deletions, dtype=np.int64)
+        weights = {'changes': np.ones(len(paths), dtype=np.int64), 'insertions': insertions,
+                   'deletions': deletions, 'churn': insertions + deletions}
+        trie.file = {metric: np.bincount(change_nodes, weights=w, minlength=size).astype(np.int64)
+                     for metric, w in weights.items()}
+        missing = len(paths)
+        trie.file_first = np.full(size, missing, dtype=np.int64)
+        np.minimum.at(trie.file_first, change_nodes, np.arange(len(paths), dtype=np.int64))
+
+        # 按深度从深到浅把子树合计累加到父节点
+        parents = np.array(trie.parents, dtype=np.int64)
+        depths = np.array(trie.depths, dtype=np.int64)
+        trie.subtree = {metric: values.copy() for metric, values in trie.file.items()}
+        trie.subtree_first = trie.file_first.copy()
+        for depth in range(int(depths.max()), 0, -1):
+            level = np.flatnonzero(depths == depth)
+            for values in trie.subtree.values():
+                np.add.at(values, parents[level], values[level])
+            np.minimum.at(trie.subtree_first, parents[level], trie.subtree_first[level])
+        files = np.flatnonzero(trie.file['changes'])
+        trie.direct = {}
+        for metric, values in trie.file.items():
+            trie.direct[metric] = np.zeros(size, dtype=np.int64)
+            np.add.at(trie.direct[metric], parents[files], values[files])
+        trie.direct_first = np.full(size, missing, dtype=np.int64)
+        np.minimum.at(trie.direct_first, parents[files], trie.file_first[files])
+
+        # 先序编号：子树 node 的节点编号落在 [pre[node], end[node])
+        trie.pre = np.zeros(size, dtype=np.int64)
+        trie.end = np.zeros(size, dtype=np.int64)
+        counter = 0
+        stack = [(0, False)]
+        while stack:
+            node, done = stack.pop()
+            if done:
+                trie.end[node] = counter
+                continue
+            trie.pre[node] = counter
+            counter += 1
+            stack.append((node, True))
+            stack.extend((child, False) for _, child in sorted(trie.children[node].items(), reverse=True))
+
+        # 改动按所在叶子的先序编号排序，子树的改动即为一段连续区间
+        dates = np.asarray(numstat.authored_dates, dtype=np.int64)
+        local_hours = (dates + local_utc_offsets(dates)) // 3600 if n else dates
+        order = np.argsort(trie.pre[change_nodes], kind='stable')
+        trie.change_ranks = trie.pre[change_nodes][order]
+        trie.change_hours = local_hours[commit_of][order]
+        trie.change_values = {metric: w[order] for metric, w in weights.items()}
+        return trie
+
+    def path(self, node):
+        names = []
+        while node > 0:
+            names.append(self.names[node])
+            node = self.parents[node]
+        return '/'.join(reversed(names))
+
+    def find(self, path):
+        """路径(目录或文件)对应的节点，空串为根目录，不存在时返回 None"""
+        node = 0
+        for name in path.strip('/').split('/') if path.strip('/') else ():
+            node = self.children[node].get(name)
+            if node is None:
+                return None
+        return node
+
+    def is_dir(self, node):
+        return bool(self.children[node])
+
+    @staticmethod
+    def _ranked(entries, n):
+        # entries: [(标签, 数值, 最早出现的序号)]；数值降序，并列时先出现的在前(与 Counter.most_common 一致)
+        entries = [entry for entry in entries if entry[1] > 0]
+        entries.sort(key=lambda entry: (-entry[1], entry[2]))
+        return [(label, int(value)) for label, value, _ in entries[:n]]
+
+    def hotspots(self, depth=1, n=10, metric='changes'):
+        """
+        按目录深度聚合的热点：深度为 depth 的每个目录统计其整个子树，浅于 depth 的目录只统计直接位于其下的文件，
+        标签为 "目录 (直接文件)"，根目录下的文件记为 ROOT_LABEL；depth=1 即按顶层目录统计
+        :return: [(目录, 数值), ...]
+        """
+        entries = []
+        for node in range(len(self)):
+            d = self.depths[node]
+            if d == depth and self.is_dir(node):
+                entries.append((self.path(node), self.subtree[metric][node], self.subtree_first[node]))
+            elif d < depth:
+                entries.append((f"{self.path(node)} (直接文件)" if node else ROOT_LABEL,
+                                self.direct[metric][node], self.direct_first[node]))
+        return self._ranked(entries, n)
+
+    def top_subtrees(self, n=10, metric='changes', min_depth=1):
+        """
+        任意深度中数值最大的 n 个目录子树，相互嵌套的目录会同时出现(类似 du)；
+        只有一个子目录且没有直接文件的目录与其子目录完全相同，只保留更深的那一个
+        :return: [(目录, 数值), ...]
+        """
+        entries = []
+        for node in range(1, len(self)):
+            if self.depths[node] < min_depth or not self.is_dir(node):
+                continue
+            children = self.children[node]
+            if len(children) == 1 and not self.direct['changes'][node] and self.is_dir(next(iter(children.values()))):
+                continue
+            entries.append((self.path(node), self.subtree[metric][node], self.subtree_first[node]))
+        return self._ranked(entries, n)
+
+    def extensions(self, n=10, metric='changes'):
+        """按文件后缀统计，与逐条改动调用 file_extension 计数的结果相同"""
+        totals = {}
+        for node in np.flatnonzero(self.file['changes']).tolist():
+            ext = file_extension(self.path(node))
+            value, first = totals.get(ext, (0, len(self.change_ranks)))
+            totals[ext] = (value + self.file[metric][node], min(first, self.file_first[node]))
+        return self._ranked([(ext, value, first) for ext, (value, first) in totals.items()], n)
+
+    def churn_series(self, path='', bucket='month', metric='churn'):
+        """
+        某个子树(目录或文件)随时间的变化，时间桶与 rollup.bucket_keys 相同
+        :return: (桶数组, 数值数组)，只包含有改动的桶；路径不存在时均为空
+        """
+        node = self.find(path)
+        if node is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        lo, hi = np.searchsorted(self.change_ranks, [self.pre[node], self.end[node]])
+        keys = bucket_keys(self.change_hours[lo:hi], bucket)
+        uniques, inverse = np.unique(keys, return_inverse=True)
+        values = np.bincount(inverse, weights=self.change_values[metric][lo:hi], minlength=len(uniques))
+        return uniques, values.astype(np.int64)
@@ -0,0 +1,302 @@
+"""
+分析流程的分阶段性能采集
+未启用时 stage()/count() 几乎没有开销；启用后每个阶段记录墙钟时间、CPU 时间、子进程数、读取的 git 对象数和峰值 RSS，
+可以导出为 JSON、Chrome trace(chrome://tracing / Perfetto 打开)或汇总表
+
+    with Profiler() as profiler:
+        with stage("get_git_history"):
+            ...
+    profiler.write("table")
+"""
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import contextlib
+import subprocess
+
+EXPORT_FORMATS = ("json", "chrome", "table")
+
+_active = None
+
+
+def reset_peak_rss():
+    """Linux 下向 clear_refs 写 5 可以重置 VmHWM，使每个阶段单独统计峰值；其他平台无法重置"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """当前进程的 RSS 峰值(MB)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位，Linux 以 KB 为单位
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _children_cpu():
+    t = os.times()
+    return t.children_user + t.children_system
+
+
+class _OpenStage:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.counters = {"subprocesses": 0, "git_objects": 0}
+        self.peak = 0.0
+
+
+class Profiler:
+    """
+    采集器，同一时刻只能启用一个(with 语句或 enable/disable)
+    阶段可以嵌套，计数器与峰值内存会同时计入所有外层阶段；不同线程各自维护阶段栈
+    """
+
+    def __init__(self):
+        self.records = []
+        self.pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._patches = []
+
+    # -- 启用 / 停用 ----------------------------------------------------------
+
+    def enable(self):
+        global _active
+        if _active is not None and _active.pid == os.getpid():
+            raise RuntimeError("已有启用中的 Profiler")
+        self.pid = os.getpid()
+        self._install_hooks()
+        _active = self
+        return self
+
+    def disable(self):
+        global _active
+        if _active is self:
+            _active = None
+        for owner, attr, original in reversed(self._patches):
+            setattr(owner, attr, original)
+        self._patches = []
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def _patch(self, owner, attr, make_wrapper):
+        original = getattr(owner, attr)
+        setattr(owner, attr, make_wrapper(original))
+        self._patches.append((owner, attr, original))
+
+    def _install_hooks(self):
+        # 所有子进程(包括 GitPython 内部启动的 git)最终都经过 Popen._execute_child
+        def wrap_execute_child(original):
+            @functools.wraps(original)
+            def execute_child(*args, **kwargs):
+                count("subprocesses")
+                return original(*args, **kwargs)
+            return execute_child
+        self._patch(subprocess.Popen, "_execute_child", wrap_execute_child)
+
+        # GitPython 通过 odb 按需读取提交对象(作者、提交说明等属性)
+        try:
+            from git.db import GitCmdObjectDB
+        except ImportError:
+            return
+
+        def wrap_read(original):
+            @functools.wraps(original)
+            def read(*args, **kwargs):
+                count("git_objects")
+                return original(*args, **kwargs)
+            return read
+        self._patch(GitCmdObjectDB, "stream", wrap_read)
+        self._patch(GitCmdObjectDB, "info", wrap_read)
+
+    # -- 采集 -----------------------------------------------------------------
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _fold_peak(self, stack):
+        peak = peak_rss_mb()
+        for opened in stack:
+            opened.peak = max(opened.peak, peak)
+
+    @contextlib.contextmanager
+    def stage(self, name, **args):
+        stack = self._stack()
+        self._fold_peak(stack)
+        reset_peak_rss()
+        opened = _OpenStage(name, args)
+        stack.append(opened)
+        depth = len(stack) - 1
+        start_ts = time.time()
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        start_children = _children_cpu()
+        try:
+            yield opened
+        finally:
+            wall = time.perf_counter() - start_wall
+            cpu = time.thread_time() - start_cpu
+            children = _children_cpu() - start_children
+            self._fold_peak(stack)
+            stack.pop()
+            record = {
+                "name": name,
+                "depth": depth,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "start": start_ts,
+                "wall_seconds": wall,
+                "cpu_seconds": cpu,
+                "child_cpu_seconds": children,
+                "subprocesses": opened.counters["subprocesses"],
+                "git_objects": opened.counters["git_objects"],
+                "peak_rss_mb": round(opened.peak, 1),
+            }
+            if args:
+                record["args"] = args
+            with self._lock:
+                self.records.append(record)
+
+    def count(self, counter, n=1):
+        for opened in self._stack():
+            opened.counters[counter] += n
+
+    def merge(self, records):
+        """合并其他进程(例如渲染进程池)采集到的记录"""
+        if records:
+            with self._lock:
+                self.records.extend(records)
+
+    # -- 导出 -----------------------------------------------------------------
+
+    def to_json(self):
+        records = sorted(self.records, key=lambda r: r["start"])
+        return {"records": records, "summary": self.summary()}
+
+    def to_chrome_trace(self):
+        """Chrome trace event 格式，每个阶段为一个完整事件(ph=X)，时间单位为微秒"""
+        origin = min((r["start"] for r in self.records), default=0)
+        events = []
+        for r in sorted(self.records, key=lambda r: r["start"]):
+            args = {key: r[key] for key in ("cpu_seconds", "child_cpu_seconds", "subprocesses",
+                                             "git_objects", "peak_rss_mb")}
+            args.update(r.get("args", {}))
+            events.append({
+                "name": r["name"],
+                "cat": r["name"].split(":")[0],
+                "ph": "X",
+                "ts": round((r["start"] - origin) * 1e6, 1),
+                "dur": round(r["wall_seconds"] * 1e6, 1),
+                "pid": r["pid"],
+                "tid": r["tid"],
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        """按阶段名汇总(多次调用累加，峰值取最大)，顺序为首次出现的顺序"""
+        rows = {}
+        for r in sorted(self.records, key=lambda r: r["start"]):
+            row = rows.get(r["name"])
+            if row is None:
+                row = rows[r["name"]] = {"name": r["name"], "depth": r["depth"], "calls": 0,
+                                         "wall_seconds": 0.0, "cpu_seconds": 0.0, "child_cpu_seconds": 0.0,
+                                         "subprocesses": 0, "git_objects": 0, "peak_rss_mb": 0.0}
+            row["calls"] += 1
+            for key in ("wall_seconds", "cpu_seconds", "child_cpu_seconds", "subprocesses", "git_objects"):
+                row[key] += r[key]
+            row["depth"] = min(row["depth"], r["depth"])
+            row["peak_rss_mb"] = max(row["peak_rss_mb"], r["peak_rss_mb"])
+        return list(rows.values())
+
+    def format_table(self):
+        header = f"{'阶段':<40} {'次数':>6} {'墙钟(s)':>10} {'CPU(s)':>10} {'子进程CPU(s)':>13} {'子进程':>7} {'git对象':>9} {'峰值RSS(MB)':>12}"
+        lines = [header, "-" * len(header)]
+        for row in self.summary():
+            name = "  " * row["depth"] + row["name"]
+            lines.append(f"{name:<40} {row['calls']:>6} {row['wall_seconds']:>10.3f} {row['cpu_seconds']:>10.3f} "
+                         f"{row['child_cpu_seconds']:>13.3f} {row['subprocesses']:>7} {row['git_objects']:>9} "
+                         f"{row['peak_rss_mb']:>12.1f}")
+        return "\n".join(lines)
+
+    def write(self, fmt, path=None):
+        """
+        导出采集结果
+        :param fmt: json / chrome / table
+        :param path: 输出文件，不传时 table 打印到标准输出，其余格式写到 profile.json / profile.trace.json
+        """
+        if fmt == "table":
+            text = self.format_table()
+            if path is None:
+                print(text)
+                return None
+        elif fmt == "json":
+            text = json.dumps(self.to_json(), ensure_ascii=False, indent=2)
+            path = path or "profile.json"
+        elif fmt == "chrome":
+            text = json.dumps(self.to_chrome_trace(), ensure_ascii=False)
+            path = path or "profile.trace.json"
+        else:
+            raise ValueError(f"未知的导出格式: {fmt}")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"性能数据已导出: {os.path.abspath(path)}")
+        return path
+
+
+def active():
+    """当前进程中启用的 Profiler；fork 出的子进程不会继承父进程的采集器"""
+    if _active is not None and _active.pid == os.getpid():
+        return _active
+    return None
+
+
+def stage(name, **args):
+    """记录一个阶段；未启用采集时返回空的上下文"""
+    profiler = active()
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.stage(name, **args)
+
+
+def count(counter, n=1):
+    profiler = active()
+    if profiler is not None:
+        profiler.count(counter, n)
+
+
+def profiled(name=None):
+    """函数装饰器：把整个函数调用记录为一个阶段，阶段名默认为函数名"""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if active() is None:
+                return func(*args, **kwargs)
+            with stage(stage_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,56 @@
+from gitcmd import run_git
+from profiling import profiled
+
+_FORMAT = '%(refname)%00%(objectname)%00%(objecttype)%00%(*objectname)%00%(*objecttype)%00%(authordate:unix)%00%(*authordate:unix)'
+
+
+def ref_short_name(refname):
+    """与 GitPython 的 Reference.name 一致：去掉 refs/<类型>/ 前缀，例如 refs/remotes/origin/dev -> origin/dev"""
+    tokens = refname.split('/')
+    if len(tokens) < 3:
+        return refname
+    return '/'.join(tokens[2:])
+
+
+class RefIndex:
+    """
+    提交 sha -> 引用名 的一次性索引
+    由一次 `git for-each-ref` 构建，附注标签已解引用到其指向的提交，查询为常数时间
+    """
+
+    def __init__(self):
+        self.tips = {}
+        self.by_sha = {}
+        self._tags = []
+
+    def add(self, refname, sha, authored_date):
+        self.tips[refname] = sha
+        self.by_sha.setdefault(sha, []).append(ref_short_name(refname))
+        if refname.startswith('refs/tags/'):
+            self._tags.append((ref_short_name(refname), sha, authored_date))
+
+    def refs_for(self, sha):
+        return list(self.by_sha.get(sha, ()))
+
+    def tags_by_date(self):
+        """返回按指向提交的作者时间排序的 [(标签名, sha, authored_date), ...]"""
+        return sorted(self._tags, key=lambda t: t[2])
+
+
+@profiled()
+def build_ref_index(repo_path):
+    """
+    读取仓库全部引用，构建 RefIndex
+    只收录最终指向提交对象的引用(与原先 hasattr(ref, 'commit') 的过滤一致)
+    :param repo_path: 仓库路径
+    """
+    index = RefIndex()
+    out = run_git(repo_path, 'for-each-ref', f'--format={_FORMAT}')
+    for line in out.decode('utf-8', 'replace').splitlines():
+        refname, obj, obj_type, peeled, peeled_type, date, peeled_date = line.split('\0')
+        if peeled:
+            obj, obj_type, date = peeled, peeled_type, peeled_date
+        if obj_type != 'commit':
+            continue
+        index.add(refname, obj, int(date))
+    return index
@@ -0,0 +1,323 @@
+"""
+按时间桶预聚合的提交索引
+以 (本地小时, 作者) 为最细粒度，保存每个桶内的提交数、合并提交数、新增行数与删除行数；
+天/周/月以及一天中的小时、一周中的星期等更粗的桶在查询时由小时桶归并得到，查询代价只与桶数有关，与提交数无关
+
+    rollup = TimeRollup.from_commits(commits, numstat)
+    keys, values = rollup.select(authors=['Alice'], since=datetime(2023, 1, 1)).series('month')
+    rollup.labels('month', keys)
+
+流式计算(--streaming)不保留作者维度，由 RollupCollector 直接按月/周等有界的时间桶累加，得到只读的 BucketRollup
+"""
+from datetime import datetime
+import numpy as np
+from commit_table import local_utc_offsets
+from dag import rows_for_shas
+
+BUCKETS = ('hour', 'day', 'week', 'month', 'hour_of_day', 'day_of_week')
+FIELDS = ('commits', 'merges', 'insertions', 'deletions')
+
+
+def week_keys(days):
+    """
+    把本地日期序号(自 1970-01-01 起的天数)换算为 year * 100 + 周序号，与 strftime('%Y-W%W') 相同：
+    以周一为一周起点，年内第一个周一之前为第 00 周
+    """
+    days = np.asarray(days, dtype=np.int64).astype('datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    yday = (days - years.astype('datetime64[D]')).astype(np.int64)
+    weekday = (days.astype(np.int64) + 3) % 7
+    return (years.astype(np.int64) + 1970) * 100 + (yday + 7 - weekday) // 7
+
+
+def bucket_keys(hours, bucket):
+    """
+    把本地小时序号换算为时间桶：hour / day 为序号，week 为 year * 100 + 周序号，month 为自 1970-01 起的月序号，
+    hour_of_day 为 0-23，day_of_week 为 0-6(周一为 0)
+    """
+    hours = np.asarray(hours, dtype=np.int64)
+    if bucket == 'hour':
+        return hours
+    if bucket == 'hour_of_day':
+        return hours % 24
+    days = hours // 24
+    if bucket == 'day':
+        return days
+    if bucket == 'day_of_week':
+        # 1970-01-01 是周四
+        return (days + 3) % 7
+    if bucket == 'week':
+        return week_keys(days)
+    if bucket == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"未知的时间桶: {bucket}，可选 {', '.join(BUCKETS)}")
+
+
+def bucket_labels(bucket, keys):
+    """把 bucket_keys 得到的桶转换为图表标签：'2024-03-05 14:00'、'2024-03-05'、'2024-W09'、'2024-03'，循环桶原样返回"""
+    keys = np.asarray(keys, dtype=np.int64)
+    if bucket == 'hour':
+        return [s.replace('T', ' ') + ':00' for s in np.datetime_as_string(keys.astype('datetime64[h]'), unit='h')]
+    if bucket == 'day':
+        return np.datetime_as_string(keys.astype('datetime64[D]'), unit='D').tolist()
+    if bucket == 'week':
+        return [f"{k // 100}-W{k % 100:02d}" for k in keys.tolist()]
+    if bucket == 'month':
+        return np.datetime_as_string(keys.astype('datetime64[M]'), unit='M').tolist()
+    return keys.tolist()
+
+
+def _local_hour(value):
+    # datetime 按本机时区的墙上时间解释，整数按 epoch 秒解释
+    if isinstance(value, datetime):
+        value = int(value.timestamp())
+    value = np.array([value], dtype=np.int64)
+    return int((value + local_utc_offsets(value))[0] // 3600)
+
+
+def commit_totals(commits, numstat):
+    """每个提交的 (新增行数, 删除行数)，下标与 commits 的行对应；numstat 中没有的提交记为 0"""
+    insertions = np.zeros(len(commits), dtype=np.int64)
+    deletions = np.zeros(len(commits), dtype=np.int64)
+    if numstat is None or not len(numstat):
+        return insertions, deletions
+    offsets = np.asarray(numstat.offsets, dtype=np.int64)
+    rows = rows_for_shas(commits, numstat.shas)
+    found = rows >= 0
+    for source, target in ((numstat.insertions, insertions), (numstat.deletions, deletions)):
+        cumulative = np.zeros(len(source) + 1, dtype=np.int64)
+        np.cumsum(source, out=cumulative[1:])
+        target[rows[found]] = (cumulative[offsets[1:]] - cumulative[offsets[:-1]])[found]
+    return insertions, deletions
+
+
+class TimeRollup:
+    """
+    :param hours: 本地时间的小时序号(本地 epoch 秒 // 3600)
+    :param author_ids: 作者编号，下标对应 authors
+    :param authors: 作者名列表
+    :param counts: {字段名: 与 hours 等长的计数数组}，字段见 FIELDS
+    各行按 (hours, author_ids) 排序且唯一
+    """
+
+    def __init__(self, hours, author_ids, authors, counts):
+        self.hours = hours
+        self.author_ids = author_ids
+        self.authors = authors
+        self.counts = counts
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32), [],
+                   {field: np.zeros(0, dtype=np.int64) for field in FIELDS})
+
+    @classmethod
+    def from_commits(cls, commits, numstat=None):
+        """
+        :param commits: CommitTable
+        :param numstat: NumstatTable，不传时新增/删除行数均为 0
+        """
+        insertions, deletions = commit_totals(commits, numstat)
+        counts = {
+            'commits': np.ones(len(commits), dtype=np.int64),
+            'merges': commits.is_merge().astype(np.int64),
+            'insertions': insertions,
+            'deletions': deletions,
+        }
+        return cls._reduce(commits.local_times() // 3600, commits.author_ids, list(commits.authors), counts)
+
+    @classmethod
+    def _reduce(cls, hours, author_ids, authors, counts):
+        # 按 (小时, 作者) 排序后把相同的键合并为一行
+        hours = np.asarray(hours, dtype=np.int64)
+        author_ids = np.asarray(author_ids, dtype=np.int32)
+        if not len(hours):
+            rollup = cls.empty()
+            rollup.authors = authors
+            return rollup
+        order = np.lexsort((author_ids, hours))
+        hours, author_ids = hours[order], author_ids[order]
+        starts = np.flatnonzero(np.r_[True, (hours[1:] != hours[:-1]) | (author_ids[1:] != author_ids[:-1])])
+        return cls(hours[starts], author_ids[starts], authors,
+                   {field: np.add.reduceat(np.asarray(values, dtype=np.int64)[order], starts)
+                    for field, values in counts.items()})
+
+    def __len__(self):
+        return len(self.hours)
+
+    def append(self, commits, numstat=None):
+        """
+        追加新的提交(例如 HistoryCache.refresh 之后新出现的提交)，与已有的桶合并，代价与已有桶数 + 新提交数成正比
+        调用方需保证这些提交没有被统计过
+        :return: self
+        """
+        new = TimeRollup.from_commits(commits, numstat)
+        index = {name: i for i, name in enumerate(self.authors)}
+        authors = list(self.authors)
+        for name in new.authors:
+            if name not in index:
+                index[name] = len(authors)
+                authors.append(name)
+        remap = np.array([index[name] for name in new.authors], dtype=np.int32)
+        merged = TimeRollup._reduce(
+            np.concatenate([self.hours, new.hours]),
+            np.concatenate([self.author_ids, remap[new.author_ids] if len(new) else new.author_ids]),
+            authors,
+            {field: np.concatenate([self.counts[field], new.counts[field]]) for field in FIELDS})
+        self.hours, self.author_ids, self.authors, self.counts = merged.hours, merged.author_ids, authors, merged.counts
+        return self
+
+    def select(self, authors=None, since=None, until=None):
+        """
+        切片：只保留指定作者与时间范围 [since, until) 内的桶，返回新的 TimeRollup(共用作者列表)
+        :param authors: 作者名列表，None 表示全部
+        :param since / until: datetime(本地时间)或 epoch 秒，按小时桶截取
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if authors is not None:
+            authors = set(authors)
+            wanted = [i for i, name in enumerate(self.authors) if name in authors]
+            mask &= np.isin(self.author_ids, wanted)
+        if since is not None:
+            mask &= self.hours >= _local_hour(since)
+        if until is not None:
+            mask &= self.hours < _local_hour(until)
+        return TimeRollup(self.hours[mask], self.author_ids[mask], self.authors,
+                          {field: values[mask] for field, values in self.counts.items()})
+
+    def total(self, field='commits'):
+        return int(self.counts[field].sum())
+
+    def author_totals(self, field='commits'):
+        """每个作者的合计，下标与 authors 对应"""
+        return np.bincount(self.author_ids, weights=self.counts[field], minlength=len(self.authors)).astype(np.int64)
+
+    def bucket_keys(self, bucket):
+        """每一行所在的桶，见 bucket_keys"""
+        return bucket_keys(self.hours, bucket)
+
+    def series(self, bucket='month', field='commits'):
+        """
+        按时间桶汇总某个字段
+        :return: (桶数组, 合计数组)，桶按从小到大排列；hour_of_day / day_of_week 总是返回全部 24 / 7 个桶，
+                 其余只返回出现过提交的桶
+        """
+        keys = self.bucket_keys(bucket)
+        values = self.counts[field]
+        if bucket in ('hour_of_day', 'day_of_week'):
+            size = 24 if bucket == 'hour_of_day' else 7
+            return np.arange(size), np.bincount(keys, weights=values, minlength=size).astype(np.int64)
+        uniques, inverse = np.unique(keys, return_inverse=True)
+        return uniques, np.bincount(inverse, weights=values, minlength=len(uniques)).astype(np.int64)
+
+    @staticmethod
+    def labels(bucket, keys):
+        return bucket_labels(bucket, keys)
+
+
+class BucketRollup:
+    """
+    流式计算得到的有界时间桶汇总，提供与 TimeRollup 相同的 series / labels / total 查询，没有作者维度
+    :param buckets: {桶名: (桶数组, {字段名: 计数数组})}，桶见 RollupCollector
+    :param granularity: hour 桶实际的粒度(hour / day / month)，hour 的桶数组为每个桶起点的本地小时序号
+    """
+
+    def __init__(self, buckets, granularity='hour'):
+        self.buckets = buckets
+        self.granularity = granularity
+
+    def total(self, field='commits'):
+        return int(self.buckets['hour_of_day'][1][field].sum())
+
+    def series(self, bucket='month', field='commits'):
+        if bucket not in self.buckets:
+            raise ValueError(f"流式汇总不支持时间桶: {bucket}，可选 {', '.join(self.buckets)}")
+        keys, counts = self.buckets[bucket]
+        return keys, counts[field]
+
+    @staticmethod
+    def labels(bucket, keys):
+        return bucket_labels(bucket, keys)
+
+
+class RollupCollector:
+    """
+    流式计算时的聚合器：按月、周、一天中的小时与一周中的星期分别累加，内存只与历史跨越的月/周数有关，与提交数无关；
+    累计增长曲线所用的 hour 桶最多保留 capacity 个，超出后依次放宽为按天、按月分桶。
+    桶数未超出 capacity 时，遍历结束后的 series 与 TimeRollup.from_commits 的结果相同
+    """
+
+    LEVELS = ('hour', 'day', 'month')
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.level = 0
+        self.coarse = {}
+        self.month = {}
+        self.week = {}
+        self.hour_of_day = np.zeros((24, len(FIELDS)), dtype=np.int64)
+        self.day_of_week = np.zeros((7, len(FIELDS)), dtype=np.int64)
+
+    @staticmethod
+    def _add(buckets, key, values):
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                bucket[i] += value
+
+    def update(self, commit):
+        local = commit.local
+        hour = (commit.authored_date + local.tm_gmtoff) // 3600
+        values = (1, int(len(commit.parents) > 1),
+                  sum(f[1] for f in commit.files), sum(f[2] for f in commit.files))
+        month = (local.tm_year - 1970) * 12 + local.tm_mon - 1
+        # 与 week_keys 相同：以周一为一周起点，年内第一个周一之前为第 00 周
+        week = local.tm_year * 100 + (local.tm_yday - 1 + 7 - local.tm_wday) // 7
+        self._add(self.month, month, values)
+        self._add(self.week, week, values)
+        self.hour_of_day[hour % 24] += values
+        self.day_of_week[(hour // 24 + 3) % 7] += values
+        self._add(self.coarse, (hour, hour // 24, month)[self.level], values)
+        if len(self.coarse) > self.capacity and self.level < len(self.LEVELS) - 1:
+            self._coarsen()
+
+    def _coarsen(self):
+        # 把已有的桶合并到下一级粒度
+        keys = np.fromiter(self.coarse, dtype=np.int64, count=len(self.coarse))
+        if self.LEVELS[self.level] == 'hour':
+            keys = keys // 24
+        else:
+            keys = bucket_keys(keys * 24, 'month')
+        coarse = {}
+        for key, values in zip(keys.tolist(), self.coarse.values()):
+            self._add(coarse, key, values)
+        self.coarse = coarse
+        self.level += 1
+
+    def _start_hours(self, keys):
+        granularity = self.LEVELS[self.level]
+        if granularity == 'day':
+            return keys * 24
+        if granularity == 'month':
+            return keys.astype('datetime64[M]').astype('datetime64[h]').astype(np.int64)
+        return keys
+
+    @staticmethod
+    def _sorted(buckets):
+        keys = np.fromiter(buckets, dtype=np.int64, count=len(buckets))
+        values = np.array(list(buckets.values()), dtype=np.int64).reshape(-1, len(FIELDS))
+        order = np.argsort(keys)
+        return keys[order], values[order]
+
+    def result(self):
+        buckets = {}
+        for name, source in (('month', self.month), ('week', self.week), ('hour', self.coarse)):
+            keys, values = self._sorted(source)
+            if name == 'hour':
+                keys = self._start_hours(keys)
+            buckets[name] = (keys, {field: values[:, i] for i, field in enumerate(FIELDS)})
+        for name, values in (('hour_of_day', self.hour_of_day), ('day_of_week', self.day_of_week)):
+            buckets[name] = (np.arange(len(values)), {field: values[:, i].copy() for i, field in enumerate(FIELDS)})
+        return BucketRollup(buckets, self.LEVELS[self.level])
@@ -0,0 +1,78 @@
+"""
+提交集合的选择条件
+同一次分析中提交表、numstat 与全部图表都使用同一个 HistorySelection，保证每张图描述的是同一批提交
+"""
+from gitcmd import GitError, error_message, run_git
+
+
+class HistorySelection:
+    """
+    :param revs: 版本范围列表，例如 ['main']、['v1.0..v2.0']，默认 --all
+    :param since: 起始日期，原样传给 git --since(按提交时间过滤，支持 "2020-01-01"、"2 years ago" 等写法)
+    :param until: 截止日期，原样传给 git --until
+    :param max_count: 只取拓扑顺序中最新的 max_count 个提交，None 表示不限制
+    """
+
+    def __init__(self, revs=None, since=None, until=None, max_count=None):
+        self.revs = list(revs) if revs else ['--all']
+        self.since = since
+        self.until = until
+        self.max_count = max_count
+
+    def rev_args(self):
+        """传给 git log / rev-list 的过滤条件与版本范围(不含 --max-count)"""
+        args = []
+        if self.since:
+            args.append(f'--since={self.since}')
+        if self.until:
+            args.append(f'--until={self.until}')
+        return args + self.revs
+
+    def describe(self):
+        parts = [' '.join(self.revs)]
+        if self.since:
+            parts.append(f'since {self.since}')
+        if self.until:
+            parts.append(f'until {self.until}')
+        parts.append(f'最新 {self.max_count} 个提交' if self.max_count is not None else '全部提交')
+        return ', '.join(parts)
+
+
+def validate_selection(repo_path, selection):
+    """
+    在读取历史之前检查版本范围与日期，有误时抛出 ValueError(带 git 的错误信息)
+    git log 遇到无法识别的日期不会报错，而是按当前时间处理：不含数字且不是 now/today 的日期被解析为当前时间时视为有误
+    """
+    try:
+        run_git(repo_path, 'rev-list', '--max-count=0', *selection.revs, '--')
+    except GitError as e:
+        raise ValueError(f"无效的版本范围 {' '.join(selection.revs)}: {error_message(e)}") from None
+    for option, value in (('since', selection.since), ('until', selection.until)):
+        if not value or any(c.isdigit() for c in value) or value.strip().lower() in ('now', 'today'):
+            continue
+        parsed, now = run_git(repo_path, 'rev-parse', f'--{option}={value}', f'--{option}=now').decode('ascii').split()
+        if parsed == now:
+            raise ValueError(f"无法识别的日期: --{option} {value}")
+
+
+def add_selection_arguments(parser, default_max_count=300):
+    """为命令行加入统一的提交选择参数"""
+    group = parser.add_argument_group("提交选择(所有图表与 git 树共用)")
+    group.add_argument("--rev", action="append", default=None,
+                       help="版本范围，可重复指定，例如 --rev main 或 --rev v1.0..v2.0，默认 --all")
+    group.add_argument("--since", default=None, help="只分析该日期之后的提交，例如 2020-01-01")
+    group.add_argument("--until", default=None, help="只分析该日期之前的提交")
+    group.add_argument("--max-count", type=int, default=default_max_count,
+                       help=f"最多分析的提交数(取最新的)，默认 {default_max_count}")
+    group.add_argument("--full-history", action="store_true",
+                       help="不限制提交数，分析选择范围内的全部历史")
+    return group
+
+
+def selection_from_args(args):
+    return HistorySelection(
+        revs=args.rev,
+        since=args.since,
+        until=args.until,
+        max_count=None if args.full_history else args.max_count,
+    )
@@ -0,0 +1,412 @@
+"""
+本地交互式报告服务：打开页面时不预先生成任何图表，每张图表滚动到可见区域时才请求并计算其数据
+用法: python server.py ./repo --port 8000   然后访问 http://127.0.0.1:8000/
+
+- GET /                     报告页面(Chart.js 在浏览器端绘制)
+- GET /api/charts           可用图表列表
+- GET /api/charts/<图表名>   单张图表的数据(JSON)，查询参数 rev(可重复)/since/until/max_count/full 与命令行的提交选择一致
+- GET /api/paths            路径前缀树查询：depth/n/metric/bucket 以及可重复的 path(子树)，改名前的改动归并到改名后的路径
+- GET /tree                 按同样的提交选择生成的 git 树页面
+计算结果与中间输入(提交表、numstat、提交图、时间桶汇总、路径前缀树)放在 LRU 缓存中，键为 (仓库, HEAD sha, 引用状态, 图表, 参数)；
+仓库有新提交或引用变化后键随之改变，旧条目自然被淘汰
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from contextlib import closing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import git
+import analyze
+import classifier
+from dag import CommitDag
+from gitcmd import error_message, run_git
+from history_cache import HistoryCache
+from html_generator import generate_git_tree_html
+from main import REPO_PATH, get_git_history
+from ownership import ownership_history
+from ref_index import build_ref_index
+from path_trie import PathTrie, METRICS
+from rollup import TimeRollup, BUCKETS, bucket_labels
+from selection import HistorySelection, validate_selection
+from chart_views import chart_view, json_default
+
+class LRUCache:
+    """
+    线程安全的 LRU 缓存
+    同一个键正在计算时，其余请求等待该次计算完成后直接复用结果，不会重复计算
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_or_compute(self, key, compute):
+        """
+        :return: (值, 是否命中缓存)
+        """
+        while True:
+            with self._lock:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return self._data[key], True
+                event = self._pending.get(key)
+                if event is None:
+                    event = self._pending[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # 其他线程正在计算，完成(或失败)后重新检查
+            event.wait()
+        try:
+            value = compute()
+            with self._lock:
+                self._data[key] = value
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+            return value, False
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+
+
+def selection_from_query(query, default_max_count=300):
+    """把查询参数解析为 HistorySelection，含义与命令行的 --rev/--since/--until/--max-count/--full-history 相同"""
+    first = lambda name: (query.get(name) or [None])[0]
+    max_count = first('max_count')
+    if first('full') in ('1', 'true'):
+        max_count = None
+    elif max_count is None:
+        max_count = default_max_count
+    else:
+        max_count = int(max_count)
+    return HistorySelection(query.get('rev'), first('since'), first('until'), max_count)
+
+
+# ---------------------------------------------------------------------------
+# 按需计算
+# ---------------------------------------------------------------------------
+
+class ReportService:
+    """
+    :param repo_path: 仓库路径
+    :param cache_size: LRU 缓存的条目数(图表与中间输入共用)
+    :param ownership_samples: 代码归属趋势的采样版本数
+    :param blame_workers: 并行 blame 的线程数
+    """
+
+    def __init__(self, repo_path, cache_size=128, ownership_samples=8, blame_workers=None):
+        self.repo_path = os.path.abspath(repo_path)
+        self.repo = git.Repo(self.repo_path)
+        self.cache = LRUCache(cache_size)
+        self.ownership_samples = ownership_samples
+        self.blame_workers = blame_workers
+        self.computations = {name: (compute, needs, extra)
+                             for name, compute, needs, extra in analyze.chart_computations(analyze.FULL_CHART_LIMITS)}
+        self.computations['ownership'] = (analyze.compute_ownership_stats, ('ownership',), ())
+        self.computations['ownership_trend'] = (analyze.compute_ownership_trend, ('ownership',), ())
+
+    def chart_names(self):
+        return list(analyze.CHARTS)
+
+    def selection(self, query):
+        """解析并检查查询参数中的提交选择，版本范围或日期有误时抛出 ValueError(返回 400)"""
+        selection = selection_from_query(query)
+        validate_selection(self.repo.git_dir, selection)
+        return selection
+
+    def state(self):
+        """当前的 (HEAD sha, 引用状态摘要, RefIndex)；每次请求只需一次 rev-parse 与一次 for-each-ref"""
+        try:
+            head = run_git(self.repo.git_dir, 'rev-parse', '--verify', '-q', 'HEAD').decode('ascii').strip()
+        except Exception:
+            head = ''
+        ref_index = build_ref_index(self.repo.git_dir)
+        digest = hashlib.sha1(json.dumps(sorted(ref_index.tips.items())).encode('utf-8')).hexdigest()
+        return head, digest, ref_index
+
+    def _key(self, state, what, selection):
+        params = (tuple(selection.revs), selection.since, selection.until, selection.max_count)
+        return self.repo_path, state[0], state[1], what, params
+
+    def _history_cache(self, state, selection=None):
+        """
+        每个调用方使用自己的 SQLite 连接
+        :param selection: 传入时先补齐这个提交选择中缺失的提交(refresh_selection)，同一引用状态与选择只补齐一次；
+                          只读取 blame 结果时不传
+        """
+        def refresh():
+            with closing(HistoryCache.open_for_repo(self.repo_path)) as cache:
+                cache.refresh_selection(self.repo.git_dir, selection.max_count, selection.rev_args(),
+                                        ref_index=state[2])
+            return True
+        if selection is not None:
+            self.cache.get_or_compute(self._key(state, 'refresh', selection), refresh)
+        return closing(HistoryCache.open_for_repo(self.repo_path))
+
+    def _input(self, name, state, selection):
+        def compute():
+            if name == 'ref_index':
+                return state[2]
+            if name == 'dag':
+                return CommitDag.from_table(self._input('commits', state, selection))
+            if name == 'rollup':
+                return TimeRollup.from_commits(self._input('commits', state, selection),
+                                               self._input('numstat', state, selection))
+            if name in ('hotspot_paths', 'file_type_paths'):
+                # 报告服务使用 FULL_CHART_LIMITS，两张图都统计 numstat 中的全部提交，共用一棵树
+                return self._input('path_trie', state, selection)
+            if name == 'path_trie':
+                return PathTrie.from_numstat(self._input('numstat', state, selection))
+            if name == 'renamed_paths':
+                # 重命名只在查询路径时才计算(结果写入缓存)，图表的前缀树不需要
+                numstat = self._input('numstat', state, selection)
+                with self._history_cache(state, selection) as cache:
+                    renames = cache.load_renames(self.repo.git_dir, numstat.shas)
+                return PathTrie.from_numstat(numstat, renames)
+            if name == 'ownership':
+                with self._history_cache(state) as cache:
+                    return ownership_history(self.repo.git_dir, 'HEAD', self.ownership_samples, cache, self.blame_workers)
+            with self._history_cache(state, selection) as cache:
+                if name == 'commits':
+                    return get_git_history(self.repo, cache=cache, ref_index=state[2], selection=selection)
+                if name == 'numstat':
+                    return cache.load_numstat(self.repo.git_dir, selection.max_count, selection.rev_args())
+            raise KeyError(name)
+        # 代码归属只与 HEAD 的历史有关，不随提交选择变化
+        key_selection = HistorySelection() if name == 'ownership' else selection
+        return self.cache.get_or_compute(self._key(state, f'input:{name}', key_selection), compute)[0]
+
+    def chart(self, name, selection):
+        """
+        计算(或从缓存取出)一张图表
+        :return: {'chart', 'head', 'cached', 'seconds', 'view'}，view 为 None 表示该图表没有数据
+        """
+        if name not in self.computations:
+            raise KeyError(name)
+        start = time.perf_counter()
+        state = self.state()
+        compute, needs, extra = self.computations[name]
+
+        def build():
+            data = compute(*(self._input(key, state, selection) for key in needs), *extra)
+            return chart_view(name, data)
+        view, cached = self.cache.get_or_compute(self._key(state, f'chart:{name}', selection), build)
+        return {'chart': name, 'head': state[0], 'cached': cached,
+                'seconds': round(time.perf_counter() - start, 4), 'view': view}
+
+    def paths(self, selection, query):
+        """
+        路径前缀树查询，查询参数：depth(默认 1)、n(默认 10)、metric(changes/insertions/deletions/churn)、
+        bucket(时间桶，默认 month)、path(可重复，按时间桶查看指标变化的子树，默认取前 5 个子树)
+        """
+        first = lambda name, default: (query.get(name) or [default])[0]
+        depth, n = int(first('depth', 1)), int(first('n', 10))
+        metric, bucket = first('metric', 'changes'), first('bucket', 'month')
+        if metric not in METRICS:
+            raise ValueError(f"未知的指标: {metric}，可选 {', '.join(METRICS)}")
+        if bucket not in BUCKETS:
+            raise ValueError(f"未知的时间桶: {bucket}，可选 {', '.join(BUCKETS)}")
+        state = self.state()
+        trie = self._input('renamed_paths', state, selection)
+        subtrees = trie.top_subtrees(n, metric)
+        series = {}
+        for path in query.get('path') or [path for path, _ in subtrees[:5]]:
+            keys, values = trie.churn_series(path, bucket, metric)
+            series[path] = {'labels': bucket_labels(bucket, keys), 'values': values.tolist()}
+        return {'head': state[0], 'hotspots': trie.hotspots(depth, n, metric), 'subtrees': subtrees,
+                'extensions': trie.extensions(n, metric), 'series': series}
+
+    def tree(self, selection):
+        """git 树页面(HTML 文本)"""
+        state = self.state()
+
+        def build():
+            commits = self._input('commits', state, selection)
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'git_tree.html')
+                generate_git_tree_html(commits, self.repo_path, output_path=path)
+                with open(path, encoding='utf-8') as f:
+                    return f.read()
+        return self.cache.get_or_compute(self._key(state, 'tree', selection), build)[0]
+
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+PAGE = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<title>仓库分析报告</title>
+<script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js"></script>
+<style>
+body { font-family: sans-serif; margin: 0; background: #f5f6fa; }
+header { background: #2d3436; color: #fff; padding: 12px 20px; }
+header form { display: inline-block; margin-left: 20px; }
+header input { width: 110px; }
+main { display: grid; grid-template-columns: repeat(auto-fill, minmax(560px, 1fr)); gap: 16px; padding: 16px; }
+.card { background: #fff; border-radius: 6px; padding: 12px; min-height: 360px; box-shadow: 0 1px 3px rgba(0,0,0,.15); }
+.card .meta { color: #888; font-size: 12px; }
+</style>
+</head>
+<body>
+<header>
+  <b>仓库分析报告</b> <span id="head"></span>
+  <form id="params">
+    rev <input name="rev" placeholder="--all">
+    since <input name="since" placeholder="2020-01-01">
+    until <input name="until">
+    max_count <input name="max_count" placeholder="300">
+    <label><input type="checkbox" name="full" value="1" style="width:auto"> 全部历史</label>
+    <button>应用</button>
+    <a id="tree" href="/tree" style="color:#74b9ff">git 树</a>
+  </form>
+</header>
+<main id="charts"></main>
+<script>
+const query = new URLSearchParams(location.search);
+const form = document.getElementById('params');
+for (const [k, v] of query) if (form.elements[k]) {
+  if (form.elements[k].type === 'checkbox') form.elements[k].checked = true; else form.elements[k].value = v;
+}
+form.addEventListener('submit', e => {
+  e.preventDefault();
+  const q = new URLSearchParams();
+  for (const el of form.elements) if (el.name && el.value && (el.type !== 'checkbox' || el.checked)) q.append(el.name, el.value);
+  location.search = q.toString();
+});
+document.getElementById('tree').href = '/tree?' + query.toString();
+
+// 卡片进入可见区域时才请求该图表，首屏只计算看得见的几张
+const observer = new IntersectionObserver(entries => {
+  for (const entry of entries) {
+    if (!entry.isIntersecting) continue;
+    observer.unobserve(entry.target);
+    load(entry.target);
+  }
+}, {rootMargin: '200px'});
+
+async function load(card) {
+  const name = card.dataset.chart;
+  const meta = card.querySelector('.meta');
+  meta.textContent = '计算中...';
+  const resp = await fetch('/api/charts/' + name + '?' + query.toString());
+  const result = await resp.json();
+  if (!resp.ok) { meta.textContent = '失败: ' + result.error; return; }
+  document.getElementById('head').textContent = 'HEAD ' + result.head.slice(0, 7);
+  meta.textContent = name + (result.cached ? ' (缓存)' : '') + ' ' + result.seconds + 's';
+  if (!result.view) { card.querySelector('h3').textContent = name + ': 无数据'; return; }
+  card.querySelector('h3').textContent = result.view.title;
+  const legend = {display: result.view.data.datasets.length > 1 || result.view.type === 'pie'};
+  const options = Object.assign({responsive: true, animation: false}, result.view.options);
+  options.plugins = Object.assign({legend: legend}, result.view.options.plugins);
+  new Chart(card.querySelector('canvas'), {type: result.view.type, data: result.view.data, options: options});
+}
+
+fetch('/api/charts').then(r => r.json()).then(names => {
+  const main = document.getElementById('charts');
+  for (const name of names) {
+    const card = document.createElement('div');
+    card.className = 'card';
+    card.dataset.chart = name;
+    card.innerHTML = '<h3>' + name + '</h3><div class="meta"></div><canvas></canvas>';
+    main.appendChild(card);
+    observer.observe(card);
+  }
+});
+</script>
+</body>
+</html>
+"""
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == '/':
+                self._send(200, PAGE, 'text/html; charset=utf-8')
+            elif url.path == '/api/charts':
+                self._send_json(200, self.service.chart_names())
+            elif url.path.startswith('/api/charts/'):
+                name = url.path[len('/api/charts/'):]
+                if name not in self.service.computations:
+                    self._send_json(404, {'error': f'未知的图表: {name}'})
+                    return
+                self._send_json(200, self.service.chart(name, self.service.selection(query)))
+            elif url.path == '/api/paths':
+                self._send_json(200, self.service.paths(self.service.selection(query), query))
+            elif url.path == '/tree':
+                self._send(200, self.service.tree(self.service.selection(query)), 'text/html; charset=utf-8')
+            else:
+                self._send_json(404, {'error': f'未知的路径: {url.path}'})
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        except subprocess.CalledProcessError as e:
+            self._send_json(500, {'error': f'git 命令失败: {error_message(e)}'})
+        except Exception as e:
+            self._send_json(500, {'error': repr(e)})
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=json_default), 'application/json; charset=utf-8')
+
+    def _send(self, status, text, content_type):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        print(f"[{self.log_date_time_string()}] {fmt % args}")
+
+
+def make_server(service, host='127.0.0.1', port=8000):
+    handler = type('BoundReportHandler', (ReportHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地交互式报告服务，按需计算图表数据")
+    parser.add_argument("repo", nargs="?", default=REPO_PATH, help="仓库路径(工作区或裸仓库)")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，默认只允许本机访问")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cache-size", type=int, default=128, help="LRU 缓存的条目数")
+    parser.add_argument("--ownership-samples", type=int, default=8, help="代码归属趋势的采样版本数")
+    parser.add_argument("--blame-workers", type=int, default=None, help="并行 blame 的线程数")
+    parser.add_argument("--rules", default=None, help="提交信息分类规则集的 JSON 文件，格式见 classifier.load_rulesets")
+    args = parser.parse_args()
+    if args.rules:
+        classifier.load_rulesets(args.rules)
+
+    service = ReportService(args.repo, args.cache_size, args.ownership_samples, args.blame_workers)
+    server = make_server(service, args.host, args.port)
+    print(f"报告服务已启动: http://{args.host}:{server.server_address[1]}/  (Ctrl+C 退出)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
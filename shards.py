@@ -0,0 +1,90 @@
+"""
+分片并行读取历史
+先用 `git rev-list` 只读提交图得到完整的提交顺序(不解析 diff，很快)，再把这个序列切成若干段连续的分片，
+每个分片在独立的工作进程中通过 `--no-walk=unsorted --stdin` 按给定顺序读取 numstat / 提交对象；
+分片按原顺序拼接，结果与单进程遍历逐项相同。diff 计算由各分片各自的 git 子进程完成，解析也在各自的进程中，
+因此读取速度随核数增长
+
+    for shard_result in map_shards(read_shard, repo_path, shas, workers=8):
+        ...
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from gitcmd import run_git
+from profiling import count
+
+# 提交数少于 MIN_SHARD_SIZE 的分片不值得启动一个 git 子进程与一次进程间传输
+MIN_SHARD_SIZE = 2000
+# 每个工作进程平均分到的分片数，分片更小时各分片 diff 代价不均的影响更小
+SHARDS_PER_WORKER = 4
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def parallel(workers):
+    """workers 为 None 时取 CPU 核数；只有一个进程时调用方直接单次遍历，省去 rev-list 与分片的开销"""
+    return (workers or default_workers()) > 1
+
+
+def rev_list(repo_path, revs=('--all',), max_count=None, topo_order=True, reverse=False):
+    """
+    返回提交 sha，顺序与同样参数的 `git log` 一致
+    :param reverse: 从旧到新；与 git 相同，先按 max_count 选出最新的提交再反转
+    """
+    args = ['rev-list']
+    if topo_order:
+        args.append('--topo-order')
+    if reverse:
+        args.append('--reverse')
+    if max_count is not None:
+        args.append(f'--max-count={max_count}')
+    return run_git(repo_path, *args, *revs, '--').decode('ascii').split()
+
+
+def split(shas, workers, min_size=None):
+    """
+    把提交序列切成连续的分片，分片数约为 workers * SHARDS_PER_WORKER，每片不少于 min_size 个提交
+    :return: [shas 的切片, ...]，依次拼接即为原序列；shas 为空时没有分片
+    """
+    if not len(shas):
+        return []
+    count = max(1, min(workers * SHARDS_PER_WORKER, len(shas) // (min_size or MIN_SHARD_SIZE)))
+    bounds = [len(shas) * i // count for i in range(count + 1)]
+    return [shas[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def map_shards(func, repo_path, shas, workers=None, window=None, objects=True):
+    """
+    对每个分片调用 func(repo_path, 分片)，按分片顺序产出结果
+    workers 为 1 或只有一个分片时直接在当前进程执行，不启动进程池
+    :param func: 模块级函数(需要能被 pickle)
+    :param workers: 工作进程数，None 表示 CPU 核数
+    :param window: 最多同时在途(已提交但尚未被取走)的分片数，默认为 2 * workers；
+                   只有最早的分片被取走后才提交新的分片，内存只与 window 和分片大小有关
+    :param objects: func 是否逐个读取分片中的提交对象；工作进程中的 git_objects 计数传不回来，由这里按分片大小补记
+    """
+    workers = workers or default_workers()
+    chunks = split(shas, workers)
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield func(repo_path, chunk)
+        return
+    window = window or 2 * workers
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= window:
+                yield _collect(*pending.popleft(), objects)
+            pending.append((len(chunk), pool.submit(func, repo_path, chunk)))
+        while pending:
+            yield _collect(*pending.popleft(), objects)
+
+
+def _collect(size, future, objects):
+    result = future.result()
+    if objects:
+        count('git_objects', size)
+    return result
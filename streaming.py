@@ -0,0 +1,228 @@
+"""
+按时间正序流式读取提交历史，并把每个提交推送给订阅的增量聚合器
+整段历史只遍历一次，内存占用只取决于聚合器自身(窗口大小、降采样容量、分类数)，与提交总数无关
+
+    stream = HistoryStream(repo_path)
+    authors = stream.subscribe(CountBy(lambda c: c.author))
+    stream.run()
+    authors.result()
+"""
+import time
+import functools
+import subprocess
+from collections import Counter, deque, namedtuple
+from gitcmd import popen_git, close_git, write_input, iter_nul_tokens
+from numstat import _HEADER_MARK, _parse_count
+from profiling import count, profiled
+from shards import map_shards, parallel, rev_list
+
+# local 为作者时间在本机时区下的 time.struct_time，files 为 [(path, insertions, deletions), ...]
+CommitEvent = namedtuple('CommitEvent', ['sha', 'authored_date', 'local', 'author', 'message', 'parents', 'files'])
+
+
+_FORMAT = '--format=%x01%H%x1f%at%x1f%an%x1f%P%x1f%B'
+_NUMSTAT_ARGS = ['--numstat', '--no-renames', '--diff-merges=first-parent']
+
+
+def _iter_events(proc):
+    # 解析 `git log -z` 的输出，逐个产出 CommitEvent；git 失败时抛出 GitError
+    current, done = None, False
+    try:
+        for token in iter_nul_tokens(proc.stdout):
+            token = token.lstrip(b'\n')
+            if not token:
+                continue
+            if token.startswith(_HEADER_MARK):
+                if current is not None:
+                    yield current
+                count('git_objects')
+                sha, date, author, parents, body = token[1:].decode('utf-8', 'replace').split('\x1f', 4)
+                date = int(date)
+                current = CommitEvent(sha, date, time.localtime(date), author,
+                                      body.strip().split('\n')[0], parents.split(), [])
+                continue
+            ins, dels, path = token.split(b'\t', 2)
+            current.files.append((path.decode('utf-8', 'replace'), _parse_count(ins), _parse_count(dels)))
+        if current is not None:
+            yield current
+        done = True
+    finally:
+        close_git(proc, check=done)
+
+
+def _history_shard(repo_path, shas, numstat=True):
+    # 按给定顺序读取一个分片的提交
+    args = ['log', '-z', '--no-walk=unsorted', '--stdin', _FORMAT] + (_NUMSTAT_ARGS if numstat else [])
+    proc = popen_git(repo_path, *args, stdin=subprocess.PIPE)
+    write_input(proc, ''.join(f'{sha}\n' for sha in shas).encode('ascii'))
+    return list(_iter_events(proc))
+
+
+def iter_history(repo_path, revs=('--all',), max_count=None, numstat=True, workers=1):
+    """
+    单次 `git log --reverse --topo-order -z` 遍历，按从旧到新的顺序逐个产出 CommitEvent
+    max_count 先选出最新的 max_count 个提交再反转，窗口与 get_git_history / load_numstat 一致
+    :param repo_path: 仓库路径
+    :param revs: 传给 git log 的版本范围
+    :param max_count: 最多读取的提交数，None 表示整个历史
+    :param numstat: 是否同时读取逐文件的新增/删除行数(与 numstat.iter_numstat 的口径一致)
+    :param workers: 读取历史的工作进程数，1 表示单次遍历，None 表示 CPU 核数；多进程时按 rev-list 的顺序分片读取，
+                    产出的顺序与内容与单次遍历相同，同时在途的分片数有上限，内存仍与历史长度无关
+    """
+    if parallel(workers):
+        shas = rev_list(repo_path, revs, max_count, reverse=True)
+        for events in map_shards(functools.partial(_history_shard, numstat=numstat), repo_path, shas, workers):
+            yield from events
+        return
+    args = ['log', '-z', '--reverse', '--topo-order', _FORMAT] + (_NUMSTAT_ARGS if numstat else [])
+    if max_count is not None:
+        args.append(f'--max-count={max_count}')
+    yield from _iter_events(popen_git(repo_path, *args, *revs, '--'))
+
+
+class HistoryStream:
+    """一次遍历，多个订阅者：每读到一个提交就依次调用所有聚合器的 update"""
+
+    def __init__(self, repo_path, revs=('--all',), max_count=None, numstat=True, workers=1):
+        self.repo_path = repo_path
+        self.revs = revs
+        self.max_count = max_count
+        self.numstat = numstat
+        self.workers = workers
+        self.subscribers = []
+
+    def subscribe(self, aggregator):
+        self.subscribers.append(aggregator)
+        return aggregator
+
+    @profiled('history_stream')
+    def run(self):
+        """
+        :return: 读取的提交数
+        """
+        updates = [aggregator.update for aggregator in self.subscribers]
+        n = 0
+        for commit in iter_history(self.repo_path, self.revs, self.max_count, self.numstat, self.workers):
+            for update in updates:
+                update(commit)
+            n += 1
+        return n
+
+
+# ---------------------------------------------------------------------------
+# 通用增量聚合器：update(commit) 逐个接收提交，result() 返回当前结果
+# ---------------------------------------------------------------------------
+
+class CountBy:
+    """按 key_func(commit) 计数，key 为 None 的提交不计入；Counter 保留首次出现的顺序"""
+
+    def __init__(self, key_func):
+        self.key_func = key_func
+        self.counter = Counter()
+        self.total = 0
+
+    def update(self, commit):
+        self.total += 1
+        key = self.key_func(commit)
+        if key is not None:
+            self.counter[key] += 1
+
+    def result(self):
+        return self.counter
+
+
+class Histogram(CountBy):
+    """数值直方图：只保存 值 -> 出现次数，结果为 (升序的取值, 对应次数)，可直接作为 hist 的 weights"""
+
+    def result(self):
+        values = sorted(self.counter)
+        return values, [self.counter[v] for v in values]
+
+
+class RunningSum:
+    """累加 value_func(commit)"""
+
+    def __init__(self, value_func):
+        self.value_func = value_func
+        self.total = 0
+
+    def update(self, commit):
+        self.total += self.value_func(commit)
+
+    def result(self):
+        return self.total
+
+
+class SlidingWindow:
+    """只保留最近 size 个提交的 value_func(commit)，用于“最近 N 个提交”口径的统计"""
+
+    def __init__(self, size, value_func):
+        self.items = deque(maxlen=size)
+        self.value_func = value_func
+
+    def update(self, commit):
+        self.items.append(self.value_func(commit))
+
+    def result(self):
+        """按从旧到新的顺序返回窗口内的值"""
+        return list(self.items)
+
+
+class DecimatingSeries:
+    """
+    有界的逐提交序列：最多保存 capacity 个点，存满后丢弃一半(保留偶数位)并把采样间隔加倍，
+    之后每 stride 个提交才保存一个点。提交数不超过 capacity 时结果与完整序列完全相同
+    """
+
+    def __init__(self, value_func, capacity=4096):
+        self.value_func = value_func
+        self.capacity = max(2, capacity - capacity % 2)
+        self.stride = 1
+        self.seen = 0
+        self.points = []
+
+    def update(self, commit):
+        if self.seen % self.stride == 0:
+            if len(self.points) == self.capacity:
+                del self.points[1::2]
+                self.stride *= 2
+            if self.seen % self.stride == 0:
+                self.points.append(self.value_func(commit))
+        self.seen += 1
+
+    @property
+    def decimated(self):
+        return self.stride > 1
+
+    def result(self):
+        return list(self.points)
+
+
+class RecencyCounter:
+    """
+    对 keys_func(commit) 返回的多个 key 计数，用于不设窗口的全量统计
+    most_common 的并列顺序与“从最新提交往回遍历、按首次出现顺序插入 Counter”相同，
+    因此与基于 NumstatTable(最新提交在前)的批量计算结果一致；内存只与 key 的种类数有关
+    """
+
+    def __init__(self, keys_func):
+        self.keys_func = keys_func
+        self.counter = Counter()
+        self.last_seen = {}  # key -> (最近一次出现的提交序号, 在该提交中的首个位置)
+        self.seq = 0
+
+    def update(self, commit):
+        self.seq += 1
+        for pos, key in enumerate(self.keys_func(commit)):
+            self.counter[key] += 1
+            if self.last_seen.get(key, (0,))[0] != self.seq:
+                self.last_seen[key] = (self.seq, pos)
+
+    def most_common(self, n=None):
+        def rank(key):
+            seq, pos = self.last_seen[key]
+            return -self.counter[key], -seq, pos
+        return [(key, self.counter[key]) for key in sorted(self.counter, key=rank)[:n]]
+
+    def result(self):
+        return self.most_common()
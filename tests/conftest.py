@@ -0,0 +1,97 @@
+import os
+import sys
+import subprocess
+import pytest
+
+# 各模块位于仓库根目录，测试直接按模块名导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+AUTHORS = [('Alice', 'alice@example.com'), ('Bob', 'bob@example.com'), ('张三', 'zhangsan@example.com')]
+# 作者时间跨越多个月份，时区各不相同，覆盖本地时间换算
+START = 1_600_000_000
+ZONES = ['+0800', '-0500', '+0000', '+0530']
+
+
+class RepoBuilder:
+    """按固定的作者、时间与时区逐个提交，同样的步骤总是得到同样的 sha"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.count = 0
+        os.makedirs(self.path, exist_ok=True)
+        self.git('init', '-q', '-b', 'main')
+
+    def git(self, *args, env=None):
+        return subprocess.run(['git', '-C', self.path, *args], check=True, env=env or self._env(),
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode().strip()
+
+    def _env(self):
+        name, email = AUTHORS[self.count % len(AUTHORS)]
+        date = f'{START + self.count * 86400 * 9 + self.count * 3671} {ZONES[self.count % len(ZONES)]}'
+        return dict(os.environ, GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=email, GIT_AUTHOR_DATE=date,
+                    GIT_COMMITTER_NAME=name, GIT_COMMITTER_EMAIL=email, GIT_COMMITTER_DATE=date)
+
+    def write(self, name, content):
+        full = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, 'wb') as f:
+            f.write(content if isinstance(content, bytes) else content.encode('utf-8'))
+        self.git('add', name)
+
+    def move(self, old, new):
+        os.makedirs(os.path.dirname(os.path.join(self.path, new)), exist_ok=True)
+        self.git('mv', old, new)
+
+    def commit(self, message, files=None):
+        for name, content in (files or {}).items():
+            self.write(name, content)
+        self.git('commit', '-q', '--allow-empty', '-m', message, env=self._env())
+        self.count += 1
+        return self.git('rev-parse', 'HEAD')
+
+    def merge(self, branch, message):
+        self.git('merge', '-q', '--no-ff', '-m', message, branch, env=self._env())
+        self.count += 1
+        return self.git('rev-parse', 'HEAD')
+
+
+def build_history_repo(path):
+    """
+    带合并、重命名、二进制文件、标签与未合并分支的小仓库：
+    main 上的 src/parser.py 先被改名为 src/core/parser.py 再改名为 lib/parser.py，topic 分支合并回 main，
+    feature 分支保持未合并
+    """
+    repo = RepoBuilder(path)
+    lines = [f'line {i}\n' for i in range(40)]
+    repo.commit('feat: initial import', {'README.md': '# demo\n', 'src/parser.py': ''.join(lines),
+                                          'src/util.py': 'x = 1\n', 'docs/guide.md': 'guide\n'})
+    for i in range(6):
+        lines[i] = f'changed {i}\n'
+        repo.commit(f'fix: parser edge case {i}', {'src/parser.py': ''.join(lines), 'src/util.py': f'x = {i}\n'})
+    repo.commit('docs: update guide\n\n正文第二行', {'docs/guide.md': 'guide v2\n', 'assets/logo.bin': bytes(range(256)) * 4})
+    repo.move('src/parser.py', 'src/core/parser.py')
+    repo.commit('refactor: move parser into core')
+    repo.git('tag', 'v1.0')
+    repo.git('checkout', '-q', '-b', 'topic')
+    for i in range(3):
+        repo.commit(f'feat(topic): step {i}', {f'topic/file{i}.txt': f'{i}\n' * (i + 1)})
+    repo.git('checkout', '-q', 'main')
+    repo.commit('修复 主线上的问题', {'src/util.py': 'x = 42\n'})
+    repo.merge('topic', 'Merge branch topic')
+    repo.move('src/core/parser.py', 'lib/parser.py')
+    lines[10] = 'after rename\n'
+    repo.write('lib/parser.py', ''.join(lines))
+    repo.commit('refactor: move parser to lib')
+    repo.commit('chore: binary update', {'assets/logo.bin': bytes(range(255, -1, -1)) * 4})
+    repo.git('checkout', '-q', '-b', 'feature')
+    repo.commit('feat: unmerged work', {'feature.txt': 'wip\n'})
+    repo.git('checkout', '-q', 'main')
+    for i in range(4):
+        repo.commit(f'update readme {i}', {'README.md': f'# demo {i}\n'})
+    return repo
+
+
+@pytest.fixture(scope='session')
+def history_repo(tmp_path_factory):
+    """只读使用的示例仓库路径，见 build_history_repo"""
+    return build_history_repo(tmp_path_factory.mktemp('history') / 'repo').path
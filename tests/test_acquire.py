@@ -0,0 +1,126 @@
+import os
+import asyncio
+import subprocess
+import pytest
+from acquire import acquire, acquire_all, acquire_sync, default_path
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='t', GIT_AUTHOR_EMAIL='t@example.com',
+               GIT_COMMITTER_NAME='t', GIT_COMMITTER_EMAIL='t@example.com')
+
+
+def git(path, *args):
+    return subprocess.run(['git', '-C', str(path), *args], check=True, env=GIT_ENV,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout.decode().strip()
+
+
+def commit(path, name, content):
+    (path / name).write_text(content)
+    git(path, 'add', name)
+    git(path, 'commit', '-q', '-m', f'update {name}')
+    return git(path, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """带两个分支和一个标签的源仓库，返回 (目录, file:// 地址)"""
+    path = tmp_path / 'source'
+    path.mkdir()
+    git(path, 'init', '-q', '-b', 'main')
+    for i in range(5):
+        commit(path, 'a.txt', f'{i}\n')
+    git(path, 'tag', 'v1')
+    git(path, 'checkout', '-q', '-b', 'topic')
+    commit(path, 'b.txt', 'topic\n')
+    git(path, 'checkout', '-q', 'main')
+    return path, path.as_uri()
+
+
+def count(path, *revs):
+    return int(git(path, 'rev-list', '--count', *revs))
+
+
+@pytest.mark.parametrize('mode', ['full', 'bare', 'mirror', 'partial'])
+def test_clone_modes(remote, tmp_path, mode):
+    _, url = remote
+    path = str(tmp_path / f'clone-{mode}')
+    assert acquire_sync(url, path, mode) == 'clone'
+    is_bare = git(path, 'rev-parse', '--is-bare-repository') == 'true'
+    assert is_bare == (mode != 'full')
+    assert count(path, '--all') == 6
+    assert git(path, 'rev-parse', 'v1') == git(remote[0], 'rev-parse', 'v1')
+    if mode in ('bare', 'mirror', 'partial'):
+        assert git(path, 'rev-parse', 'refs/heads/topic') == git(remote[0], 'rev-parse', 'topic')
+    if mode == 'partial':
+        assert git(path, 'config', 'remote.origin.partialclonefilter') == 'blob:none'
+
+
+@pytest.mark.parametrize('mode', ['full', 'bare', 'mirror'])
+def test_fetch_existing(remote, tmp_path, mode):
+    source, url = remote
+    path = str(tmp_path / f'clone-{mode}')
+    acquire_sync(url, path, mode)
+    head = commit(source, 'a.txt', 'new\n')
+    git(source, 'branch', '-D', 'topic')
+    assert acquire_sync(url, path, mode) == 'fetch'
+    ref = 'refs/remotes/origin/main' if mode == 'full' else 'refs/heads/main'
+    assert git(path, 'rev-parse', ref) == head
+    if mode == 'mirror':
+        # --prune 同步删除远端已删除的分支
+        assert git(path, 'for-each-ref', 'refs/heads/topic') == ''
+
+
+def test_shallow_clone(remote, tmp_path):
+    _, url = remote
+    path = str(tmp_path / 'shallow.git')
+    acquire_sync(url, path, 'mirror', depth=2)
+    assert count(path, 'refs/heads/main') == 2
+    # topic 从 main 的最新提交分出，两个分支各取 2 个提交，合计 3 个
+    assert count(path, '--all') == 3
+
+
+def test_unreachable_origin_uses_local_data(remote, tmp_path, capsys):
+    _, url = remote
+    path = str(tmp_path / 'offline.git')
+    acquire_sync(url, path, 'mirror')
+    git(path, 'remote', 'set-url', 'origin', (tmp_path / 'nonexistent').as_uri())
+    assert acquire_sync(url, path, 'mirror') == 'local'
+    assert 'fetch 失败' in capsys.readouterr().err
+    assert count(path, '--all') == 6
+
+
+def test_existing_repo_without_origin(remote, tmp_path, capsys):
+    source, url = remote
+    assert acquire_sync(url, str(source), 'full') == 'local'
+    assert '没有配置 origin' in capsys.readouterr().err
+
+
+def test_no_fetch(remote, tmp_path):
+    source, url = remote
+    path = str(tmp_path / 'nofetch.git')
+    acquire_sync(url, path, 'mirror')
+    commit(source, 'a.txt', 'new\n')
+    assert acquire_sync(url, path, 'mirror', fetch=False) == 'local'
+    assert count(path, 'refs/heads/main') == 5
+
+
+def test_missing_remote_fails_on_clone(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError):
+        acquire_sync((tmp_path / 'nonexistent').as_uri(), str(tmp_path / 'x.git'), 'mirror')
+
+
+def test_acquire_all(remote, tmp_path):
+    _, url = remote
+    workdir = tmp_path / 'repos'
+    requests = [(url, default_path(url, str(workdir / mode), mode), mode, None) for mode in ('full', 'mirror', 'partial')]
+    requests.append(((tmp_path / 'nonexistent.git').as_uri(), str(workdir / 'missing.git'), 'mirror', None))
+    done = []
+    results = asyncio.run(acquire_all(requests, concurrency=2, on_done=done.append))
+    assert [r.action for r in results] == ['clone', 'clone', 'clone', None]
+    assert isinstance(results[-1].error, subprocess.CalledProcessError)
+    assert sorted(r.path for r in done) == sorted(r.path for r in results)
+    results = asyncio.run(acquire_all(requests[:3], concurrency=2))
+    assert [r.action for r in results] == ['fetch', 'fetch', 'fetch']
+
+
+def test_local_path_without_url(tmp_path):
+    assert asyncio.run(acquire(None, str(tmp_path))) == 'local'
@@ -0,0 +1,31 @@
+import json
+import subprocess
+import git
+import pytest
+from batch import load_manifest, stage_history
+
+
+@pytest.mark.parametrize('backfill, expected', [(False, 5), (True, None)])
+def test_stage_history_fills_selection_unless_backfill(tmp_path, history_repo, backfill, expected):
+    # 缓存文件与仓库并列存放，先复制一份，不影响其他测试共用的仓库
+    path = str(tmp_path / 'demo.git')
+    subprocess.run(['git', 'clone', '-q', '--mirror', history_repo, path], check=True)
+    manifest = tmp_path / 'repos.json'
+    manifest.write_text(json.dumps([{'name': 'demo', 'path': path, 'limit': 5}]), encoding='utf-8')
+    job, = load_manifest(str(manifest), backfill=backfill)
+    job.repo = git.Repo(path)
+    try:
+        stage_history(job)
+        cached = job.cache.conn.execute('SELECT COUNT(*) FROM commits').fetchone()[0]
+        total = len(list(job.repo.iter_commits('--all')))
+        assert cached == (total if expected is None else expected)
+        assert len(job.commits) == 5
+    finally:
+        job.release()
+
+
+def test_manifest_backfill_overrides_default(tmp_path):
+    manifest = tmp_path / 'repos.json'
+    manifest.write_text(json.dumps([{'path': '/srv/a.git', 'backfill': True}, {'path': '/srv/b.git'}]),
+                        encoding='utf-8')
+    assert [job.backfill for job in load_manifest(str(manifest))] == [True, False]
@@ -0,0 +1,48 @@
+import json
+import pytest
+import classifier
+from classifier import Ruleset
+
+
+def labels(ruleset, messages):
+    return [ruleset.labels[i] for i in ruleset.classify(messages)]
+
+
+def test_pattern_does_not_match_across_messages():
+    ruleset = Ruleset.from_dict({'rules': [{'label': 'both', 'patterns': ['fix.*\n.*feat']},
+                                           {'label': 'space', 'patterns': [r'a\sb']}]})
+    assert labels(ruleset, ['fix parser', 'feat: cache', 'a', 'b', 'x a b']) == ['其他', '其他', '其他', '其他', 'space']
+
+
+def test_crossing_match_does_not_hide_later_match():
+    # ^\W 在空提交信息处会吞掉下一条提交信息前的换行，下一条仍需单独判断
+    ruleset = Ruleset.from_dict({'rules': [{'label': 'symbol', 'patterns': [r'^\W']}]})
+    assert labels(ruleset, ['', ' leading space', 'word', '-dash']) == ['其他', 'symbol', '其他', 'symbol']
+
+
+def test_end_anchor_per_message():
+    ruleset = Ruleset.from_dict({'rules': [{'label': 'wip', 'patterns': [r'wip\s*$'], 'ignore_case': True}]})
+    assert labels(ruleset, ['add WIP', 'wip: not at end', 'fix wip  ']) == ['wip', '其他', 'wip']
+
+
+@pytest.mark.parametrize('data, message', [
+    ({'rule': []}, 'rules'),
+    ({'rules': [{'keywords': ['fix']}]}, '第 1 条规则缺少 label'),
+    ({'rules': [{'label': 'a', 'keywords': ['a']}, {'label': 'b'}]}, '第 2 条规则 (b)'),
+    ({'rules': [{'label': 'c', 'patterns': ['(']}]}, "第 1 条规则 (c) 的正则 '('"),
+    ({'rules': [{'label': 'd', 'keywords': 'fix'}]}, '第 1 条规则 (d) 的 keywords'),
+])
+def test_from_dict_rejects_malformed_rules(data, message):
+    with pytest.raises(ValueError, match=message.replace('(', r'\(').replace(')', r'\)')):
+        Ruleset.from_dict(data)
+
+
+def test_load_rulesets_names_the_ruleset(tmp_path, monkeypatch):
+    monkeypatch.setattr(classifier, 'RULESETS', dict(classifier.RULESETS))
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'keywords': {'rules': [{'label': 'ok', 'keywords': ['ok']}]},
+                                'commit_types': {'rules': [{'keywords': ['x']}]}}), encoding='utf-8')
+    with pytest.raises(ValueError, match='规则集 commit_types: 第 1 条规则缺少 label'):
+        classifier.load_rulesets(str(path))
+    # 任何一个规则集有误时都不替换
+    assert classifier.RULESETS['keywords'] is classifier.KEYWORDS
@@ -0,0 +1,67 @@
+import pytest
+from gitcmd import GitError, run_git
+from history_cache import HistoryCache, _iter_commit_meta
+from numstat import iter_numstat
+from selection import HistorySelection, validate_selection
+from streaming import iter_history
+
+
+@pytest.mark.parametrize('read', [
+    lambda path: list(iter_numstat(path, revs=['nope'])),
+    lambda path: list(iter_history(path, revs=['nope'])),
+    lambda path: list(iter_numstat(path, shas=['0' * 40])),
+    lambda path: list(_iter_commit_meta(path, shas=['0' * 40])),
+])
+def test_failed_git_log_raises_with_stderr(history_repo, read):
+    with pytest.raises(GitError) as info:
+        read(history_repo)
+    assert info.value.returncode != 0
+    assert 'fatal' in str(info.value) or 'bad' in str(info.value)
+
+
+def test_stopping_early_is_not_an_error(history_repo):
+    stream = iter_numstat(history_repo)
+    next(stream)
+    stream.close()
+    assert len(list(iter_history(history_repo, max_count=3))) == 3
+
+
+def test_run_git_error_message(history_repo):
+    with pytest.raises(GitError, match="bad revision 'nope'"):
+        run_git(history_repo, 'rev-list', 'nope', '--')
+
+
+@pytest.mark.parametrize('selection, message', [
+    (HistorySelection(revs=['nope']), '无效的版本范围 nope'),
+    (HistorySelection(revs=['main..nope']), '无效的版本范围 main..nope'),
+    (HistorySelection(since='nope'), '无法识别的日期: --since nope'),
+    (HistorySelection(until='someday'), '无法识别的日期: --until someday'),
+])
+def test_validate_selection_rejects(history_repo, selection, message):
+    with pytest.raises(ValueError, match=message):
+        validate_selection(history_repo, selection)
+
+
+@pytest.mark.parametrize('selection', [
+    HistorySelection(),
+    HistorySelection(revs=['v1.0..main', '^feature']),
+    HistorySelection(since='2020-10-01', until='now'),
+    HistorySelection(since='2 years ago', until='yesterday'),
+])
+def test_validate_selection_accepts(history_repo, selection):
+    validate_selection(history_repo, selection)
+
+
+def test_failed_numstat_leaves_no_commits_behind(history_repo, tmp_path, monkeypatch):
+    import history_cache
+
+    def failing(repo_path, shas, workers=None):
+        yield from ()
+        raise GitError(128, ['git', '-C', repo_path, 'log'], stderr=b'fatal: simulated')
+    monkeypatch.setattr(history_cache, 'iter_numstat_sharded', failing)
+    cache = HistoryCache(str(tmp_path / 'cache.sqlite'))
+    with pytest.raises(GitError, match='simulated'):
+        cache.refresh_selection(history_repo, 5)
+    cache.conn.commit()
+    assert cache.conn.execute('SELECT COUNT(*) FROM commits').fetchone()[0] == 0
+    cache.close()
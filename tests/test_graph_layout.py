@@ -0,0 +1,166 @@
+import random
+import numpy as np
+from commit_table import CommitTableBuilder
+from graph_layout import compute_layout
+
+
+def _sha(i):
+    return f'{i:040x}'
+
+
+def _table(history):
+    """
+    :param history: [(提交编号, [父提交编号, ...]), ...]，按时间从旧到新，父提交总在子提交之前出现
+    """
+    builder = CommitTableBuilder()
+    for i, parents in reversed(history):
+        builder.append(_sha(i), 1_500_000_000 + i, 'a', f'c{i}', [_sha(p) for p in parents])
+    return builder.build(reverse=True)
+
+
+def _reference_layout(commits):
+    # 改为字典 + 最小堆之前逐条扫描泳道的实现，作为小规模图上的对照
+    n = len(commits)
+    offsets, parent_ids = commits.parent_offsets, commits.parent_ids
+    lane_targets = []
+    lanes = np.zeros(n, dtype=np.int32)
+    edges = []
+
+    def free_lane():
+        for lane, target in enumerate(lane_targets):
+            if target < 0:
+                return lane
+        lane_targets.append(-1)
+        return len(lane_targets) - 1
+
+    for row in range(n):
+        i = n - 1 - row
+        lane = -1
+        for l, target in enumerate(lane_targets):
+            if target == row:
+                if lane < 0:
+                    lane = l
+                lane_targets[l] = -1
+        if lane < 0:
+            lane = free_lane()
+        lanes[row] = lane
+        for k in range(offsets[i], offsets[i + 1]):
+            pid = parent_ids[k]
+            if pid < 0:
+                edges.append((row, lane, lane, -1, lane))
+                continue
+            parent_row = n - 1 - pid
+            carry = lane_targets.index(parent_row) if parent_row in lane_targets else -1
+            if carry < 0:
+                carry = lane if k == offsets[i] else free_lane()
+                lane_targets[carry] = parent_row
+            edges.append((row, lane, carry, parent_row, -1))
+    edges = np.array(edges, dtype=np.int64).reshape(-1, 5)
+    has_parent = edges[:, 3] >= 0
+    edges[has_parent, 4] = lanes[edges[has_parent, 3]]
+    return lanes, edges, len(lane_targets)
+
+
+def _assert_no_collisions(layout):
+    """同一泳道上，等待不同父提交的竖直线段之间、线段与提交节点之间都不重叠"""
+    spans = {}
+    for child_row, _, carry, parent_row, _, _ in layout.edges.tolist():
+        if parent_row > child_row + 1:
+            lo, hi = spans.get((carry, parent_row), (child_row + 1, parent_row - 1))
+            spans[(carry, parent_row)] = (min(lo, child_row + 1), hi)
+    occupied = {}
+    for (lane, _), (lo, hi) in spans.items():
+        occupied.setdefault(lane, []).append((lo, hi))
+    for lane, intervals in occupied.items():
+        intervals.sort()
+        for (_, hi), (lo, _) in zip(intervals, intervals[1:]):
+            assert hi < lo, f'泳道 {lane} 上的线段重叠'
+    for row, lane in enumerate(layout.lanes.tolist()):
+        for lo, hi in occupied.get(lane, ()):
+            assert not lo <= row <= hi, f'提交 {row} 落在泳道 {lane} 的线段上'
+
+
+def _wide_history(branches, length, rounds=2):
+    """
+    主线上每一轮同时分出 branches 条分支，各分支交错提交 length 次后依次合并回主线
+    :return: (history, 每轮合并结束时主线提交的编号)
+    """
+    history = [(0, [])]
+    main, next_id, round_ends = 0, 1, []
+    for _ in range(rounds):
+        tips = [main] * branches
+        for _ in range(length):
+            for b in range(branches):
+                history.append((next_id, [tips[b]]))
+                tips[b] = next_id
+                next_id += 1
+        for tip in tips:
+            history.append((next_id, [main, tip]))
+            main = next_id
+            next_id += 1
+        round_ends.append(main)
+    return history, round_ends
+
+
+def _random_history(n, rnd):
+    history = []
+    for i in range(n):
+        if i == 0 or rnd.random() < 0.05:
+            parents = []
+        else:
+            parents = [rnd.randrange(max(0, i - 8), i)]
+            while rnd.random() < 0.3:
+                parents.append(rnd.randrange(0, i))
+            parents = list(dict.fromkeys(parents))
+        if rnd.random() < 0.05:
+            # 不在表内的父提交(浅克隆或只取最新的部分历史)
+            parents.append(10 ** 9 + i)
+        history.append((i, parents))
+    return history
+
+
+def test_matches_reference_on_small_graphs():
+    rnd = random.Random(0)
+    for _ in range(200):
+        commits = _table(_random_history(rnd.randrange(1, 60), rnd))
+        layout = compute_layout(commits)
+        lanes, edges, lane_count = _reference_layout(commits)
+        assert layout.lanes.tolist() == lanes.tolist()
+        assert layout.edges[:, :5].tolist() == edges.tolist()
+        assert layout.lane_count == lane_count
+        _assert_no_collisions(layout)
+
+
+def test_thousands_of_concurrent_branches():
+    history, _ = _wide_history(branches=2000, length=3)
+    commits = _table(history)
+    layout = compute_layout(commits)
+    assert len(layout) == len(history)
+    _assert_no_collisions(layout)
+    # 同时存在 2000 条分支，加上主线；第二轮复用第一轮合并后释放的泳道
+    assert layout.lane_count <= 2001
+
+
+def test_lanes_reused_after_merges():
+    history, round_ends = _wide_history(branches=3, length=2, rounds=4)
+    layout = compute_layout(_table(history))
+    _assert_no_collisions(layout)
+    assert layout.lane_count == 4
+    # 每一轮合并完成后只剩主线，下一轮的分支重新使用相同的泳道
+    rows = {i: len(history) - 1 - i for i, _ in history}
+    per_round = [sorted({int(layout.lanes[rows[i]]) for i, parents in history
+                         if len(parents) == 1 and start < i < end})
+                 for start, end in zip([0] + round_ends, round_ends)]
+    assert all(lanes == per_round[0] for lanes in per_round)
+
+
+def test_side_branch_color_and_first_parent_lane():
+    # 0 - 1 - 3 (合并 2)，2 从 0 分出；行号 0 为最新提交，依次为 3、2、1、0
+    history = [(0, []), (1, [0]), (2, [0]), (3, [1, 2])]
+    layout = compute_layout(_table(history))
+    # 第一个父提交 1 沿用 3 的泳道和颜色，第二个父提交 2 开启新泳道和新颜色；
+    # 2 先到达并开始等待 0，1 的边汇入同一条泳道，不再另占泳道
+    assert layout.lanes.tolist() == [0, 1, 0, 1]
+    assert layout.colors[2] == layout.colors[0]
+    assert layout.colors[1] != layout.colors[0]
+    assert layout.edges[:, 2].tolist() == [0, 1, 1, 1]
@@ -0,0 +1,52 @@
+import pytest
+from conftest import RepoBuilder
+from history_cache import HistoryCache
+
+
+def cached_shas(cache):
+    return {row[0] for row in cache.conn.execute('SELECT sha FROM commits')}
+
+
+def numstat_shas(cache):
+    return {row[0] for row in cache.conn.execute('SELECT DISTINCT sha FROM numstat')}
+
+
+@pytest.fixture
+def branchy_repo(tmp_path):
+    repo = RepoBuilder(tmp_path / 'repo')
+    repo.commit('feat: initial', {'a.txt': 'a\n'})
+    base = repo.commit('fix: a', {'a.txt': 'a2\n'})
+    repo.git('checkout', '-q', '-b', 'feature')
+    dropped = [repo.commit(f'feat: step {i}', {'b.txt': f'{i}\n'}) for i in range(2)]
+    repo.git('checkout', '-q', 'main')
+    return repo, base, dropped
+
+
+@pytest.mark.parametrize('rewrite', [
+    lambda repo, base: repo.git('branch', '-f', 'feature', base),
+    lambda repo, base: repo.git('branch', '-D', 'feature'),
+])
+def test_refresh_selection_prunes_after_rewritten_refs(tmp_path, branchy_repo, rewrite):
+    repo, base, dropped = branchy_repo
+    cache = HistoryCache(str(tmp_path / 'cache.sqlite'))
+    assert cache.refresh_selection(repo.path) == 4
+    assert set(dropped) <= cached_shas(cache)
+
+    rewrite(repo, base)
+    assert cache.refresh_selection(repo.path) == 0
+    assert cached_shas(cache).isdisjoint(dropped)
+    assert numstat_shas(cache).isdisjoint(dropped)
+    assert len(cached_shas(cache)) == 2
+
+
+def test_refresh_selection_keeps_commits_on_fast_forward(tmp_path, branchy_repo):
+    repo, _, dropped = branchy_repo
+    cache = HistoryCache(str(tmp_path / 'cache.sqlite'))
+    cache.refresh_selection(repo.path, revs=['main'])
+    repo.git('merge', '-q', '--ff-only', 'feature')
+    # 只选 main 的前两个提交时，之前缓存的提交仍然可达，不应被清理
+    assert cache.refresh_selection(repo.path, max_count=2, revs=['main']) == 2
+    assert len(cached_shas(cache)) == 4
+    # 之后的完整 refresh() 只补齐剩下的提交
+    assert cache.refresh(repo.path) == 0
+    assert set(dropped) <= cached_shas(cache)
@@ -0,0 +1,59 @@
+import os
+import sys
+import subprocess
+import pytest
+import main
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ['matplotlib', 'git', 'numpy', 'analyze']
+
+# 在子进程中执行代码后把导入过的模块列到 stderr(stdout 上是帮助文本)，不受测试进程已导入模块的影响
+LIST_MODULES = "\nimport sys\nprint('\\n'.join(sys.modules), file=sys.stderr)"
+RUN_MAIN = """
+import runpy, sys
+sys.argv = ['main.py'] + {argv!r}
+try:
+    runpy.run_path('main.py', run_name='__main__')
+except SystemExit:
+    pass
+"""
+
+
+def imported_modules(code):
+    result = subprocess.run([sys.executable, '-c', code + LIST_MODULES], cwd=ROOT,
+                            capture_output=True, check=True, text=True)
+    return set(result.stderr.split())
+
+
+@pytest.mark.parametrize('code, forbidden', [
+    ('import main', HEAVY + ['html_generator']),
+    (RUN_MAIN.format(argv=['--help']), HEAVY),
+    (RUN_MAIN.format(argv=['history', '--help']), HEAVY),
+    (RUN_MAIN.format(argv=['tree', '--help']), HEAVY),
+    ('import analyze', ['matplotlib']),
+], ids=['import main', 'main.py --help', 'main.py history --help', 'main.py tree --help', 'import analyze'])
+def test_startup_does_not_import_heavy_modules(code, forbidden):
+    modules = imported_modules(code)
+    # 子模块(如 matplotlib.pyplot)同样算作导入了顶层包
+    imported = [m for m in forbidden if m in modules or any(x.startswith(m + '.') for x in modules)]
+    assert imported == []
+
+
+@pytest.mark.parametrize('argv, command', [
+    ([], 'all'),
+    (['--no-fetch'], 'all'),
+    (['charts'], 'charts'),
+    (['--no-fetch', 'charts'], 'charts'),
+    (['--depth', '5', 'tree', '--tree-mode', 'scalable'], 'tree'),
+    (['--since', 'all', 'history'], 'history'),
+    (['--since', 'all'], 'all'),
+])
+def test_options_before_or_after_command(argv, command):
+    args = main.parse_args(argv)
+    assert args.command == command
+    assert args.no_fetch == ('--no-fetch' in argv)
+
+
+def test_option_values_are_not_commands():
+    args = main.parse_args(['--rev', 'tree', 'charts', '--since', 'all'])
+    assert (args.command, args.rev, args.since) == ('charts', ['tree'], 'all')
@@ -0,0 +1,65 @@
+from collections import Counter
+import pytest
+from numstat import load_numstat
+from path_trie import ROOT_LABEL, PathTrie, RenameMap
+
+PARSER_NAMES = ('src/parser.py', 'src/core/parser.py', 'lib/parser.py')
+
+
+@pytest.fixture(scope='module')
+def numstat(history_repo):
+    return load_numstat(history_repo, renames=True)
+
+
+def resolved_paths(numstat):
+    """逐条改动从其所在提交起按时间顺序应用之后的重命名，得到最终路径(RenameMap 的朴素实现)"""
+    n = len(numstat)
+    renames = [numstat.renames.get(sha, ()) for sha in reversed(numstat.shas)]
+    paths = []
+    for i in range(n):
+        for path, _, _ in numstat.files(i):
+            for pos in range(n - 1 - i, n):
+                path = dict(renames[pos]).get(path, path)
+            paths.append(path)
+    return paths
+
+
+def counter_hotspots(paths, depth):
+    counts = Counter()
+    for path in paths:
+        dirs = path.split('/')[:-1]
+        if len(dirs) >= depth:
+            counts['/'.join(dirs[:depth])] += 1
+        else:
+            counts[f"{'/'.join(dirs)} (直接文件)" if dirs else ROOT_LABEL] += 1
+    return dict(counts)
+
+
+def test_rename_map_follows_chain(numstat):
+    rename_map = RenameMap.from_numstat(numstat, numstat.renames)
+    assert len(rename_map) == 2
+    assert rename_map.resolve('src/parser.py', 0) == 'lib/parser.py'
+    assert rename_map.resolve('src/core/parser.py', 0) == 'lib/parser.py'
+    # 最后一次改名之后不再有别名
+    assert rename_map.resolve('lib/parser.py', 0) == 'lib/parser.py'
+    assert rename_map.resolve('src/core/parser.py', len(numstat) - 1) == 'src/core/parser.py'
+
+
+@pytest.mark.parametrize('depth', [1, 2, 3])
+def test_hotspots_across_renames_match_counter(numstat, depth):
+    trie = PathTrie.from_numstat(numstat, numstat.renames)
+    expected = counter_hotspots(resolved_paths(numstat), depth)
+    top = trie.hotspots(depth=depth, n=len(expected))
+    assert dict(top) == expected
+    assert [value for _, value in top] == sorted(expected.values(), reverse=True)
+
+
+def test_rename_chain_merges_into_final_path(numstat):
+    parser_changes = sum(1 for i in range(len(numstat)) for path, _, _ in numstat.files(i) if path in PARSER_NAMES)
+    merged = PathTrie.from_numstat(numstat, numstat.renames)
+    assert merged.find('src/parser.py') is None and merged.find('src/core') is None
+    assert merged.file['changes'][merged.find('lib/parser.py')] == parser_changes
+    assert dict(merged.hotspots(depth=1))['lib'] == parser_changes
+    # 不传重命名时改动分散在三个路径上
+    plain = PathTrie.from_numstat(numstat)
+    assert sum(plain.file['changes'][plain.find(path)] for path in PARSER_NAMES) == parser_changes
@@ -0,0 +1,62 @@
+import os
+import git
+import pytest
+import analyze
+from main import get_git_history
+from ref_index import build_ref_index
+from selection import HistorySelection
+
+
+@pytest.fixture(scope='module')
+def chart_data(history_repo):
+    repo = git.Repo(history_repo)
+    ref_index = build_ref_index(repo.git_dir)
+    selection = HistorySelection(max_count=None)
+    commits = get_git_history(repo, ref_index=ref_index, selection=selection)
+    return [(name, data) for name, data in analyze.compute_report(repo, commits, None, ref_index, selection)
+            if data is not None]
+
+
+def render(capsys, chart_data, output_dir, **kwargs):
+    """渲染为 json，返回 (本次生成的文件名, 跳过的文件名)"""
+    analyze.render_charts(chart_data, str(output_dir), output_format='json', **kwargs)
+    lines = capsys.readouterr().out.splitlines()
+    pick = lambda marker: sorted(os.path.basename(line.split(marker)[1]) for line in lines if marker in line)
+    return pick('已生成统计图: '), pick('图表数据未变化，跳过渲染: ')
+
+
+def test_unchanged_data_skips_rendering(tmp_path, capsys, chart_data):
+    rendered, skipped = render(capsys, chart_data, tmp_path)
+    assert len(rendered) == len(chart_data) and skipped == []
+    rendered, skipped = render(capsys, chart_data, tmp_path)
+    assert rendered == [] and len(skipped) == len(chart_data)
+
+
+def test_changed_data_rerenders_only_that_chart(tmp_path, capsys, chart_data):
+    render(capsys, chart_data, tmp_path)
+    name, data = chart_data[0]
+    changed = [(name, {**data, 'title_suffix': 'changed'})] + chart_data[1:]
+    rendered, skipped = render(capsys, changed, tmp_path)
+    assert rendered == [analyze.chart_filename(name, 'json')]
+    assert len(skipped) == len(chart_data) - 1
+
+
+def test_missing_output_file_is_rendered_again(tmp_path, capsys, chart_data):
+    render(capsys, chart_data, tmp_path)
+    filename = analyze.chart_filename(chart_data[-1][0], 'json')
+    os.remove(tmp_path / filename)
+    rendered, _ = render(capsys, chart_data, tmp_path)
+    assert rendered == [filename]
+
+
+def test_force_rerenders_everything(tmp_path, capsys, chart_data):
+    render(capsys, chart_data, tmp_path)
+    rendered, skipped = render(capsys, chart_data, tmp_path, force=True)
+    assert len(rendered) == len(chart_data) and skipped == []
+
+
+def test_render_version_bump_invalidates_manifest(tmp_path, capsys, chart_data, monkeypatch):
+    render(capsys, chart_data, tmp_path)
+    monkeypatch.setattr(analyze, 'RENDER_VERSION', analyze.RENDER_VERSION + 1)
+    rendered, skipped = render(capsys, chart_data, tmp_path)
+    assert len(rendered) == len(chart_data) and skipped == []
@@ -0,0 +1,92 @@
+from collections import Counter
+from datetime import datetime
+import git
+import pytest
+from main import get_git_history
+from numstat import load_numstat
+from rollup import FIELDS, RollupCollector, TimeRollup
+from selection import HistorySelection
+from streaming import iter_history
+
+BUCKET_FORMATS = {'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d', 'week': '%Y-W%W', 'month': '%Y-%m',
+                  'hour_of_day': None, 'day_of_week': None}
+
+
+def bucket_of(timestamp, bucket):
+    local = datetime.fromtimestamp(timestamp)
+    if bucket == 'hour_of_day':
+        return local.hour
+    if bucket == 'day_of_week':
+        return local.weekday()
+    return local.strftime(BUCKET_FORMATS[bucket])
+
+
+def counter_series(events, bucket, field):
+    """逐个提交用 datetime 分桶、用 Counter 累加，作为预聚合结果的参照"""
+    counts = Counter()
+    for event in events:
+        value = {'commits': 1, 'merges': int(len(event.parents) > 1),
+                 'insertions': sum(f[1] for f in event.files), 'deletions': sum(f[2] for f in event.files)}[field]
+        counts[bucket_of(event.authored_date, bucket)] += value
+    return {key: value for key, value in counts.items() if value}
+
+
+def rollup_series(rollup, bucket, field):
+    keys, values = rollup.series(bucket, field)
+    return {key: int(value) for key, value in zip(rollup.labels(bucket, keys), values) if value}
+
+
+@pytest.fixture(scope='module')
+def events(history_repo):
+    return list(iter_history(history_repo))
+
+
+@pytest.fixture(scope='module')
+def time_rollup(history_repo):
+    commits = get_git_history(git.Repo(history_repo), selection=HistorySelection(max_count=None))
+    return TimeRollup.from_commits(commits, load_numstat(history_repo))
+
+
+@pytest.mark.parametrize('field', FIELDS)
+@pytest.mark.parametrize('bucket', list(BUCKET_FORMATS))
+def test_time_rollup_matches_counter(events, time_rollup, bucket, field):
+    assert rollup_series(time_rollup, bucket, field) == counter_series(events, bucket, field)
+
+
+def test_time_rollup_select_matches_counter(events, time_rollup):
+    since = datetime(2020, 11, 1)
+    selected = time_rollup.select(authors=['Alice'], since=since)
+    wanted = [e for e in events if e.author == 'Alice' and datetime.fromtimestamp(e.authored_date) >= since]
+    assert wanted
+    assert rollup_series(selected, 'month', 'commits') == counter_series(wanted, 'month', 'commits')
+    assert selected.total('insertions') == sum(f[1] for e in wanted for f in e.files)
+
+
+def collect(events, capacity=4096):
+    collector = RollupCollector(capacity)
+    for event in events:
+        collector.update(event)
+    return collector.result()
+
+
+@pytest.mark.parametrize('field', FIELDS)
+@pytest.mark.parametrize('bucket', ['hour', 'week', 'month', 'hour_of_day', 'day_of_week'])
+def test_bucket_rollup_matches_counter(events, bucket, field):
+    rollup = collect(events)
+    assert rollup.granularity == 'hour'
+    assert rollup_series(rollup, bucket, field) == counter_series(events, bucket, field)
+
+
+def test_bucket_rollup_rejects_unknown_bucket(events):
+    with pytest.raises(ValueError, match='day'):
+        collect(events).series('day')
+
+
+def test_bucket_rollup_coarsens_hour_series(events):
+    rollup = collect(events, capacity=4)
+    # 小时桶超出容量后依次放宽为天、月，月桶以该月第一个小时为起点
+    assert rollup.granularity == 'month'
+    keys, values = rollup.series('hour', 'commits')
+    labels = [label[:7] for label in rollup.labels('hour', keys)]
+    assert dict(zip(labels, values.tolist())) == counter_series(events, 'month', 'commits')
+    assert rollup.total() == len(events)
@@ -0,0 +1,41 @@
+import pytest
+import shards
+import commit_reader
+from numstat import iter_numstat, iter_numstat_sharded, iter_renames, iter_renames_sharded, load_numstat
+
+
+@pytest.fixture(autouse=True)
+def small_shards(monkeypatch):
+    # 测试仓库只有二十多个提交，调小分片下限才能真正切成多个分片交给工作进程
+    monkeypatch.setattr(shards, 'MIN_SHARD_SIZE', 3)
+
+
+def test_fixture_is_split_into_several_shards(history_repo):
+    assert len(shards.split(shards.rev_list(history_repo), 2)) > 1
+
+
+@pytest.mark.parametrize('revs, max_count', [(('--all',), None), (('main',), 10), (('feature', '^v1.0'), None)])
+def test_numstat_sharded_matches_serial(history_repo, revs, max_count):
+    shas = shards.rev_list(history_repo, revs, max_count, topo_order=False)
+    serial = list(iter_numstat(history_repo, topo_order=False, shas=shas))
+    assert list(iter_numstat_sharded(history_repo, shas, workers=2)) == serial
+    assert [sha for sha, _, _ in serial] == shas
+
+
+def test_renames_sharded_matches_serial(history_repo):
+    shas = shards.rev_list(history_repo)
+    serial = list(iter_renames(history_repo, shas))
+    assert list(iter_renames_sharded(history_repo, shas, workers=2)) == serial
+    assert ('src/parser.py', 'src/core/parser.py') in [pair for _, renames in serial for pair in renames]
+
+
+def test_load_numstat_sharded_matches_serial(history_repo):
+    serial = load_numstat(history_repo, renames=True)
+    assert vars(load_numstat(history_repo, renames=True, workers=2)) == vars(serial)
+
+
+@pytest.mark.parametrize('revs, max_count', [(('--all',), None), (('main',), 10), (('--all', '--since=2020-10-01'), None)])
+def test_commit_reader_parallel_matches_serial(history_repo, revs, max_count):
+    serial = list(commit_reader.iter_commits(history_repo, revs, max_count))
+    assert serial
+    assert list(commit_reader.iter_commits(history_repo, revs, max_count, workers=2)) == serial
@@ -0,0 +1,76 @@
+import math
+import random
+from collections import Counter
+import numpy as np
+import pytest
+from sketches import HyperLogLog, SpaceSaving, TDigest
+
+
+def zipf_stream(seed, n, kinds):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(kinds)]
+    return [f'author-{i}' for i in rng.choices(range(kinds), weights=weights, k=n)]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_space_saving_error_bound(seed):
+    stream = zipf_stream(seed, 20000, 2000)
+    exact = Counter(stream)
+    sketch = SpaceSaving(None, capacity=50)
+    for key in stream:
+        sketch.add(key)
+    bound = len(stream) / sketch.capacity
+    result = sketch.most_common()
+    assert len(result) == sketch.capacity and sketch.total == len(stream)
+    for key, count, error in result:
+        assert count - error <= exact[key] <= count
+        assert count - exact[key] <= error <= bound
+    # 真实次数超过 N / capacity 的 key 一定在监控之中
+    monitored = {key for key, _, _ in result}
+    assert {key for key, value in exact.items() if value > bound} <= monitored
+
+
+def test_space_saving_is_exact_within_capacity():
+    stream = zipf_stream(0, 5000, 40)
+    sketch = SpaceSaving(None, capacity=50)
+    for key in stream:
+        sketch.add(key)
+    assert {key: count for key, count, _ in sketch.most_common()} == Counter(stream)
+    assert all(error == 0 for _, _, error in sketch.most_common())
+
+
+@pytest.mark.parametrize('precision', [10, 12])
+@pytest.mark.parametrize('cardinality', [100, 5000, 50000])
+def test_hyperloglog_relative_error(precision, cardinality):
+    sketch = HyperLogLog(None, precision=precision)
+    for i in range(cardinality):
+        key = f'src/module{i % 97}/file{i}.py'
+        # 重复出现的 key 不影响估计
+        sketch.add(key)
+        sketch.add(key)
+    assert sketch.relative_error == pytest.approx(1.04 / math.sqrt(2 ** precision))
+    assert abs(sketch.estimate() - cardinality) <= 3 * sketch.relative_error * cardinality
+
+
+@pytest.mark.parametrize('distribution', ['normal', 'lognormal', 'integers'])
+def test_tdigest_quantiles_within_rank_error(distribution):
+    rng = np.random.default_rng(0)
+    values = {'normal': lambda: rng.normal(50, 10, 50000),
+              'lognormal': lambda: rng.lognormal(3, 1, 50000),
+              # 单次提交改动的文件数：大量重复的小整数
+              'integers': lambda: rng.geometric(0.3, 50000).astype(np.float64)}[distribution]()
+    sketch = TDigest(None, compression=100, buffer_size=1000)
+    for value in values.tolist():
+        sketch.add(value)
+    assert sketch.count == len(values)
+    assert len(sketch.means) <= 2 * sketch.compression
+    ordered = np.sort(values)
+    exact = lambda q: ordered[min(len(ordered) - 1, max(0, int(q * len(ordered))))]
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        estimate = sketch.quantile(q)
+        if distribution == 'integers':
+            # 相邻两个整数的质心之间按线性插值，取整后再比较
+            estimate = round(estimate)
+        # 估计值落在真实的 q ± rank_error 分位数之间
+        assert exact(q - sketch.rank_error) <= estimate <= exact(q + sketch.rank_error), q
+    assert sketch.quantile(0) == ordered[0] and sketch.quantile(1) == ordered[-1]
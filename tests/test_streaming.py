@@ -0,0 +1,51 @@
+import numpy as np
+import git
+import pytest
+import analyze
+from main import get_git_history
+from ref_index import build_ref_index
+from selection import HistorySelection
+
+# 直方图类数据只有取值的多重集合有意义：流式版本按时间正序累加，顺序与 compute_report 不同
+HISTOGRAMS = {'msg_lengths': 'lengths', 'modify_file_count': 'counts'}
+
+
+def expand(data, key):
+    if 'weights' in data:
+        return sorted(np.repeat(data[key], data['weights']).tolist())
+    return sorted(data[key])
+
+
+def as_comparable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [as_comparable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: as_comparable(item) for key, item in value.items()}
+    return value
+
+
+def assert_same_report(expected, actual):
+    assert [name for name, _ in expected] == [name for name, _ in actual]
+    for (name, a), (_, b) in zip(expected, actual):
+        if name in HISTOGRAMS:
+            assert expand(a, HISTOGRAMS[name]) == expand(b, HISTOGRAMS[name]), name
+        elif a is None or b is None:
+            assert a is b, name
+        else:
+            assert as_comparable(a) == as_comparable(b), name
+
+
+@pytest.mark.parametrize('selection', [
+    HistorySelection(max_count=None),
+    HistorySelection(max_count=12),
+    HistorySelection(revs=['main'], since='2020-11-01', max_count=None),
+], ids=['full history', 'max_count', 'rev+since'])
+def test_streaming_report_matches_compute_report(history_repo, selection):
+    repo = git.Repo(history_repo)
+    ref_index = build_ref_index(repo.git_dir)
+    commits = get_git_history(repo, ref_index=ref_index, selection=selection)
+    assert len(commits)
+    expected = analyze.compute_report(repo, commits, None, ref_index, selection)
+    assert_same_report(expected, analyze.compute_report_streaming(repo, selection, ref_index))